@@ -0,0 +1,58 @@
+"""Benchmark of converting documents to dataclasses with dacite and from_document.
+
+Run with `python3 -m benchmarks.converters` from the root folder.
+"""
+import timeit
+
+from bson import ObjectId
+from dacite import Config, from_dict
+
+from mundobot.clash.clash import Clash, RegularPlayer
+from mundobot.clash.position import ClashPositions, Position
+
+DOCUMENT_COUNT = 100000
+
+
+def main() -> None:
+    dacite_position_config = Config(type_hooks={Position: lambda x: Position[x]})
+    clash_document = Clash(
+        "Clash Cup", "20.01.2024", 1, 2, 3, 4, 5, 6, [7, 8], 9
+    ).as_dict()
+    positions_document = {
+        "clash_id": ObjectId(),
+        "players": [
+            {"player_id": i, "player_name": f"player {i}", "position": str(position)}
+            for i, position in enumerate(Position)
+        ],
+    }
+    regular_document = RegularPlayer(1, 2, True).as_dict()
+    benchmarks = [
+        (
+            "Clash",
+            lambda: from_dict(Clash, clash_document),
+            lambda: Clash.from_document(clash_document),
+        ),
+        (
+            "ClashPositions",
+            lambda: from_dict(
+                ClashPositions, positions_document, dacite_position_config
+            ),
+            lambda: ClashPositions.from_document(positions_document),
+        ),
+        (
+            "RegularPlayer",
+            lambda: from_dict(RegularPlayer, regular_document),
+            lambda: RegularPlayer.from_document(regular_document),
+        ),
+    ]
+    for name, with_dacite, with_converter in benchmarks:
+        dacite_seconds = timeit.timeit(with_dacite, number=DOCUMENT_COUNT)
+        converter_seconds = timeit.timeit(with_converter, number=DOCUMENT_COUNT)
+        print(
+            f"{name} x {DOCUMENT_COUNT}: dacite {dacite_seconds * 1e3:.0f} ms,"
+            f" from_document {converter_seconds * 1e3:.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark of event loop lag caused by database calls of player registrations.
+
+Compares blocking ClashManager calls made on the loop with calls made through
+AsyncClashRepository. Database round trips are simulated on an in-memory
+mongomock client, so no database is touched.
+
+Run with `python3 -m benchmarks.loop_lag` from the root folder.
+"""
+import asyncio
+import time
+
+import mongomock
+
+from mundobot.clash.clash import Clash
+from mundobot.clash.clash_repository import AsyncClashRepository
+from mundobot.clash.clashmanager import ClashManager
+from mundobot.clash.position import ClashPositions, Position
+from mundobot.helpers import LoopLagMonitor
+
+DB_LATENCY = 0.02  # seconds of a simulated database round trip
+REGISTRATIONS = 200
+
+
+class SlowClashManager(ClashManager):
+    """ClashManager whose registrations take as long as a remote database."""
+
+    def register_player(self, *args, **kwargs) -> ClashPositions:
+        time.sleep(DB_LATENCY)
+        return super().register_player(*args, **kwargs)
+
+
+async def measure(through_repository: bool) -> str:
+    manager = SlowClashManager(mongomock.MongoClient())
+    repository = AsyncClashRepository(manager)
+    clash_ids = [
+        manager.add_clash(Clash(f"clash {i}", "20.01.2024", 1, 2, 3, 4, 5, 6))
+        for i in range(10)
+    ]
+    monitor = LoopLagMonitor(interval=0.01)
+    monitor_task = asyncio.create_task(monitor.run())
+
+    async def register(i: int) -> None:
+        arguments = (clash_ids[i % 10], i, f"player {i}", Position.MID)
+        if through_repository:
+            await repository.register_player(*arguments)
+        else:
+            manager.register_player(*arguments)
+        await asyncio.sleep(0)
+
+    await asyncio.gather(*(register(i) for i in range(REGISTRATIONS)))
+    await asyncio.sleep(0.05)
+    monitor_task.cancel()
+    repository.close()
+    return monitor.summary()
+
+
+def main() -> None:
+    print("Calls on the loop:", asyncio.run(measure(False)))
+    print("AsyncClashRepository:", asyncio.run(measure(True)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""Benchmark of computing waveform peaks of a minute of decoded samples.
+
+Run with `python3 -m benchmarks.peaks` from the root folder.
+"""
+import timeit
+
+import numpy as np
+
+from mundobot.peaks import DECODE_SAMPLE_RATE, compute_peaks
+
+RUNS = 1000
+
+
+def main() -> None:
+    minute = np.random.default_rng(0).integers(
+        -32768, 32768, 60 * DECODE_SAMPLE_RATE, dtype=np.int16
+    )
+    seconds = timeit.timeit(lambda: compute_peaks(minute), number=RUNS)
+    print(f"Peaks of a minute of samples: {seconds / RUNS * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark of reconciling clashes of all guilds with the confirmed clashes.
+
+Compares a query and diff per guild with the single query and set diff of
+ClashManager.get_all_needed_changes. It runs on an in-memory mongomock client,
+so no database is touched.
+
+Run with `python3 -m benchmarks.reconciliation` from the root folder.
+"""
+import time
+
+import mongomock
+
+from mundobot.clash.clash import Clash
+from mundobot.clash.clash_api_service import DEFAULT_REGION, ApiClash
+from mundobot.clash.clashmanager import ClashManager
+
+GUILD_COUNT = 200
+
+
+def needed_changes_per_guild(manager, guild_id, confirmed_clashes):
+    """Reconciliation of one guild as it was done before the bulk diff."""
+    missing_names = [c.name for c in confirmed_clashes]
+    surplus_clashes = []
+    for document in manager.clashes.find({"guild_id": guild_id}):
+        if document["name"] in missing_names:
+            missing_names.remove(document["name"])
+        else:
+            surplus_clashes.append(Clash.from_document(document))
+    missing = [c for c in confirmed_clashes if c.name in missing_names]
+    return (missing, surplus_clashes)
+
+
+def main() -> None:
+    snapshot = [
+        ApiClash(riot_id, f"clash {riot_id}", f"2024-01-{riot_id:02}")
+        for riot_id in range(1, 9)
+    ]
+    manager = ClashManager(mongomock.MongoClient())
+    # Every guild has a stale clash to remove and misses the last confirmed one
+    manager.clashes.insert_many(
+        [
+            Clash(c.name, c.date, guild_id, 0, 0, 0, 0, 0, riot_id=c.id).as_dict()
+            for guild_id in range(GUILD_COUNT)
+            for c in snapshot[:-1] + [ApiClash(0, "stale", "01.01.2023")]
+        ]
+    )
+    manager.clashes.create_index("guild_id")
+    servers = {guild_id: DEFAULT_REGION for guild_id in range(GUILD_COUNT)}
+
+    start = time.perf_counter()
+    for guild_id in servers:
+        needed_changes_per_guild(manager, guild_id, snapshot)
+    per_guild = time.perf_counter() - start
+
+    start = time.perf_counter()
+    manager.get_all_needed_changes(servers, {DEFAULT_REGION: snapshot})
+    bulk = time.perf_counter() - start
+    print(f"Query and diff per guild for {GUILD_COUNT} guilds: {per_guild * 1e3:.0f} ms")
+    print(f"One query and set diff for {GUILD_COUNT} guilds: {bulk * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
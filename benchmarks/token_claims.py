@@ -0,0 +1,34 @@
+"""Benchmark of verifying an access token with and without the claims cache.
+
+Run with `python3 -m benchmarks.token_claims` from the root folder.
+"""
+from datetime import timedelta
+import os
+import timeit
+
+from jose import jwt
+
+from mundobot.api.api_login import (
+    ACCESS_TOKEN_EXPIRE_DAYS,
+    ALGORITHM,
+    create_access_token,
+    verify_token,
+)
+
+RUNS = 10000
+
+
+def main() -> None:
+    os.environ.setdefault("API_JWT_SECRET_KEY", "benchmark")
+    token = create_access_token({"sub": "1"}, timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS))
+    secret = os.environ.get("API_JWT_SECRET_KEY")
+    uncached = timeit.timeit(
+        lambda: jwt.decode(token, secret, algorithms=[ALGORITHM]), number=RUNS
+    )
+    cached = timeit.timeit(lambda: verify_token(token), number=RUNS)
+    print(f"Without cache: {uncached / RUNS * 1e6:.1f} us per request")
+    print(f"With cache: {cached / RUNS * 1e6:.1f} us per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,18 +2,26 @@ import asyncio
 import os
 from typing import List
 
-from fastapi import FastAPI
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from jose import JWTError
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from fastapi.routing import APIRoute
 
-from mundobot.mundobot import MundoBot
-from .api_login import LoginRouter, get_current_user_depends
+from .api_clash import ClashRouter
+from .backend import Backend, create_remote_backend
+from .api_login import LoginRouter, get_current_user_depends, verify_token
 from .api_sounds import SoundsRouter
 from .dependencies import get_selected_guild_depends
 from .dtos.GuildDto import GuildDto
 
 
+# Seconds without events after which a ping is sent, it also detects closed connections
+EVENTS_PING_INTERVAL = 30
+# Close code of a rejected WebSocket connection
+POLICY_VIOLATION = 1008
+
+
 def get_origins() -> List[str]:
     origins = [
         "http://localhost:3000",
@@ -35,15 +43,20 @@ def use_route_names_as_operation_ids(application: FastAPI) -> None:
 
 
 class MundoBotApi:
-    def __init__(self, bot: MundoBot):
-        self.bot = bot
+    def __init__(self, backend: Backend):
+        self.backend = backend
         self.app = FastAPI()
+        self.app.add_event_handler('startup', self.backend.start)
+        self.app.add_event_handler('shutdown', self.backend.close)
         self.app.add_middleware(CORSMiddleware, allow_origins=get_origins(), allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 
         self.app_login = LoginRouter()
         self.app.include_router(self.app_login.router)
-        self.app_sounds = SoundsRouter(bot)
+        self.app.add_event_handler('shutdown', self.app_login.close)
+        self.app_sounds = SoundsRouter(backend)
         self.app.include_router(self.app_sounds.router)
+        self.app_clash = ClashRouter(backend)
+        self.app.include_router(self.app_clash.router)
 
         self.add_endpoints()
 
@@ -58,7 +71,36 @@ In guild with id: {guild_id}"""
 
         @self.app.get('/available-guilds', tags=['guilds'])
         async def available_guilds(user: get_current_user_depends) -> List[GuildDto]:
-            return [GuildDto(id=str(guild.id), name=guild.name) for guild in self.bot.guilds if guild.get_member(user.discord_user_id) is not None]
+            return [GuildDto(**guild) for guild in await self.backend.guilds_of(user.discord_user_id)]
+
+        # Browsers cannot set headers of a WebSocket, so the token and guild come in the query
+        @self.app.websocket('/events')
+        async def events(websocket: WebSocket, token: str, guild_id: int):
+            try:
+                user_id = int(verify_token(token)['sub'])
+            except (JWTError, KeyError, ValueError):
+                await websocket.close(code=POLICY_VIOLATION)
+                return
+            if not await self.backend.is_member(user_id, guild_id):
+                await websocket.close(code=POLICY_VIOLATION)
+                return
+
+            await websocket.accept()
+            subscription = self.backend.event_hub.subscribe(guild_id)
+            try:
+                while True:
+                    try:
+                        event = await asyncio.wait_for(subscription.get(), EVENTS_PING_INTERVAL)
+                    except asyncio.TimeoutError:
+                        event = {'type': 'ping'}
+                    if subscription.dropped:
+                        event = {**event, 'dropped': subscription.dropped}
+                        subscription.dropped = 0
+                    await websocket.send_json(event)
+            except WebSocketDisconnect:
+                pass
+            finally:
+                subscription.close()
 
 
 def start_server(app: FastAPI, loop: asyncio.AbstractEventLoop):
@@ -66,3 +108,7 @@ def start_server(app: FastAPI, loop: asyncio.AbstractEventLoop):
     server = uvicorn.Server(config)
     loop.run_until_complete(server.serve())
 
+
+def create_remote_app() -> FastAPI:
+    """Factory of the app of an API worker process talking to the bot over IPC."""
+    return MundoBotApi(create_remote_backend()).app
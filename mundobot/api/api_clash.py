@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException
+from starlette import status
+
+from .api_login import get_current_user_depends
+from .backend import Backend
+from .dependencies import get_selected_guild_depends, guild_access_verifier
+from .dtos.AttendanceDto import AttendanceDto
+
+
+class ClashRouter:
+    def __init__(self, backend: Backend):
+        self.backend = backend
+        # Attendance is scoped to the selected guild, so every route checks membership in it
+        self.router = APIRouter(prefix='/clash', tags=['clash'], dependencies=[Depends(guild_access_verifier(backend))])
+        self.add_endpoints()
+
+    async def get_attendance_dto(self, guild_id: int, player_id: int) -> AttendanceDto:
+        stats = await self.backend.get_attendance(guild_id, player_id)
+        if stats is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Player has no attendance')
+        return AttendanceDto(player_id=str(stats.player_id), player_name=stats.player_name, positions=stats.positions,
+                             clashes=stats.clashes, noob_clashes=stats.noob_clashes)
+
+    def add_endpoints(self):
+        @self.router.get('/attendance')
+        async def my_attendance(user: get_current_user_depends, guild_id: get_selected_guild_depends) -> AttendanceDto:
+            return await self.get_attendance_dto(guild_id, user.discord_user_id)
+
+        @self.router.get('/attendance/{player_id}')
+        async def player_attendance(player_id: int, guild_id: get_selected_guild_depends) -> AttendanceDto:
+            return await self.get_attendance_dto(guild_id, player_id)
@@ -1,8 +1,9 @@
 import os
 import sys
 from datetime import timedelta, datetime, timezone
-from typing import Annotated
-import requests
+from typing import Annotated, Optional
+
+import aiohttp
 
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
@@ -11,11 +12,19 @@ from jose import jwt, JWTError
 from pydantic import BaseModel
 from starlette import status
 
+from .cache import SingleFlight, TtlLruCache, token_key
+
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_DAYS = 30
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/login')
 
 DISCORD_AUTH_URL = 'https://discord.com/api/v10/oauth2/@me'
+DISCORD_AUTH_TIMEOUT = 10  # seconds
+LOGIN_CACHE_SIZE = 10000
+CLAIMS_CACHE_SIZE = 1000
+CLAIMS_CACHE_TTL = 60 * 60  # seconds, entries never outlive exp of their token
+# Cached tokens are issued again only while they stay valid at least this long
+LOGIN_CACHE_MARGIN = timedelta(days=1)
 
 
 class Token(BaseModel):
@@ -27,6 +36,20 @@ class UserData(BaseModel):
     discord_user_id: int
 
 
+# Claims of already verified access tokens by hash of the token
+verified_claims: TtlLruCache[dict] = TtlLruCache(CLAIMS_CACHE_SIZE, CLAIMS_CACHE_TTL)
+
+
+def verify_token(token: str) -> dict:
+    """Gets claims of access token, verifying its signature only if it was not verified before."""
+    key = token_key(token)
+    payload = verified_claims.get(key)
+    if payload is None:
+        payload = jwt.decode(token, os.environ.get('API_JWT_SECRET_KEY'), algorithms=[ALGORITHM])
+        verified_claims.set(key, payload, payload['exp'] - datetime.now(timezone.utc).timestamp())
+    return payload
+
+
 async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> UserData:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -35,11 +58,11 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> Use
     )
 
     try:
-        payload = jwt.decode(token, os.environ.get('API_JWT_SECRET_KEY'), algorithms=[ALGORITHM])
+        payload = verify_token(token)
         user_id: str = payload.get('sub')
         if user_id is None:
             raise credentials_exception
-    except JWTError as e:
+    except (JWTError, KeyError) as e:
         print(e, file=sys.stderr)
         raise credentials_exception
     return UserData(discord_user_id=user_id)
@@ -66,26 +89,42 @@ class LoginRouter:
             tags=["login"],
         )
         self.setup_routes()
-        self.active_users = {}
+        # Issued access tokens by hash of the discord token, entries expire with the access token
+        self.active_users: TtlLruCache[str] = TtlLruCache(
+            LOGIN_CACHE_SIZE, (timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS) - LOGIN_CACHE_MARGIN).total_seconds())
+        self.logins: SingleFlight[str] = SingleFlight()
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=DISCORD_AUTH_TIMEOUT))
+        return self.session
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+
+    async def exchange_token(self, discord_token: str) -> str:
+        """Verifies discord token at discord and issues access token for its user."""
+        async with self.get_session().get(DISCORD_AUTH_URL, headers={'Authorization': f'Bearer {discord_token}'}) as resp:
+            if resp.status != 200:
+                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                                    detail='Access token not authorized in discord')
+            user_id = (await resp.json())['user']['id']
+
+        access_token_expires = timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
+        access_token = create_access_token(data={'sub': user_id}, expires_delta=access_token_expires)
+        self.active_users.set(token_key(discord_token), access_token)
+        return access_token
 
     def setup_routes(self):
         @self.router.post('')
         async def login(discord_token: str) -> Token:
+            key = token_key(discord_token)
             # Find if user already is logged in
-            if discord_token in self.active_users:
-                access_token = self.active_users[discord_token]
-                return Token(access_token=access_token, token_type="Bearer")
-            else:
-                # Not logged in -> get login session from discord
-                resp = requests.get(DISCORD_AUTH_URL, headers={'Authorization': f'Bearer {discord_token}'})
-                if resp.status_code != 200:
-                    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
-                                        detail='Access token not authorized in discord')
-                user_id = resp.json()['user']['id']
-
-                access_token_expires = timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
-                access_token = create_access_token(data={'sub': user_id}, expires_delta=access_token_expires)
-                self.active_users[discord_token] = access_token
-
-                return Token(access_token=access_token, token_type='bearer')
+            access_token = self.active_users.get(key)
+            if access_token is None:
+                # Not logged in -> get login session from discord, once for concurrent logins
+                access_token = await self.logins.run(key, lambda: self.exchange_token(discord_token))
+            return Token(access_token=access_token, token_type='bearer')
 
@@ -1,49 +1,104 @@
-from typing import List
+import asyncio
+from pathlib import Path
+from typing import List, Optional
 
-from fastapi import APIRouter, UploadFile, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, HTTPException, Request
 from starlette import status
-from starlette.responses import FileResponse
+from starlette.responses import Response
 
-from .dependencies import get_selected_guild_depends
+from .api_login import get_current_user_depends
+from .backend import Backend
+from .cache import SingleFlight
+from .dependencies import get_selected_guild_depends, guild_access_verifier
+from .dtos.PlayDto import PlayDto
 from .dtos.SoundDto import SoundDto
-from ..mundobot import MundoBot
-from ..playback import MAX_LENGTH
+from .file_serving import ContentEtags, serve_bytes, serve_file
+from .previews import PreviewRenderer
+from ..playback import MAX_LENGTH, is_valid_sound_name
 
 
 class SoundsRouter:
-    def __init__(self, bot: MundoBot):
-        self.bot = bot
-        self.router = APIRouter(prefix='/sounds', tags=['sounds'])
+    def __init__(self, backend: Backend):
+        self.backend = backend
+        # Every sound is scoped to the selected guild, so every route checks membership in it
+        self.router = APIRouter(prefix='/sounds', tags=['sounds'], dependencies=[Depends(guild_access_verifier(backend))])
+        self.etags = ContentEtags()
+        # Concurrent requests of a sound missing in local cache transfer it only once
+        self.fills: SingleFlight[Optional[Path]] = SingleFlight()
+        self.previews = PreviewRenderer()
         self.add_endpoints()
 
-    # TODO: Apply
-    def verify_guild_access(self, guild_id: int, user_id: int) -> None:
-        guild = self.bot.get_guild(guild_id)
-        if guild is None or guild.get_member(user_id) is None:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='User does not have access to this guild')
+    async def local_sound(self, name: str, guild_id: int) -> Optional[Path]:
+        file_path = self.backend.playback_manager.find_sound(name, guild_id, False)
+        if file_path is None:
+            # Cache miss, the sound is transferred from database without blocking the loop
+            file_path = await self.fills.run((guild_id, name), lambda: asyncio.to_thread(
+                self.backend.playback_manager.find_sound, name, guild_id))
+        return file_path
 
     def add_endpoints(self):
         @self.router.get('/list')
         async def list_sounds(guild_id: get_selected_guild_depends) -> List[SoundDto]:
-            default_sounds, guild_sounds = self.bot.playback_manager.list_sounds_for_guild(guild_id)
+            default_sounds, guild_sounds = await asyncio.to_thread(
+                self.backend.playback_manager.list_sounds_for_guild, guild_id)
             return [SoundDto(name=sound, default=True) for sound in default_sounds] + [SoundDto(name=sound, default=False) for sound in guild_sounds]
 
-        @self.router.get('/{name}', responses={200: {'content': {'audio/mp3': {}}, 'description': 'Requested audio file'}})
-        async def get_sound(name: str, guild_id: get_selected_guild_depends) -> FileResponse:
-            file_path = self.bot.playback_manager.find_sound(name, guild_id)
+        @self.router.get('/{name}', responses={200: {'content': {'audio/mp3': {}}, 'description': 'Requested audio file'},
+                                               206: {'description': 'Requested range of the audio file'},
+                                               304: {'description': 'Audio file did not change'}})
+        async def get_sound(name: str, request: Request, guild_id: get_selected_guild_depends) -> Response:
+            file_path = await self.local_sound(name, guild_id)
             if file_path is None:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Sound not found')
-            return FileResponse(file_path, media_type='audio/mp3', filename=name)
+            return await serve_file(request, file_path, 'audio/mp3', self.etags, filename=name)
+
+        @self.router.get('/{name}/preview', responses={200: {'content': {'audio/webm': {}},
+                                                             'description': 'Short low bitrate preview of the sound'}})
+        async def get_sound_preview(name: str, request: Request, guild_id: get_selected_guild_depends) -> Response:
+            file_path = await self.local_sound(name, guild_id)
+            if file_path is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Sound not found')
+            preview_path = await self.previews.preview(
+                file_path, self.backend.playback_manager.preview_cache_path(name, guild_id))
+            if preview_path is None:
+                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail='Preview not available')
+            return await serve_file(request, preview_path, 'audio/webm', self.etags)
+
+        @self.router.get('/{name}/peaks', responses={200: {'content': {'application/octet-stream': {}},
+                                                           'description': 'Interleaved int8 min/max waveform peaks'},
+                                                     304: {'description': 'Peaks did not change'}})
+        async def get_sound_peaks(name: str, request: Request, guild_id: get_selected_guild_depends) -> Response:
+            peaks = await asyncio.to_thread(self.backend.playback_manager.get_peaks, name, guild_id)
+            if peaks is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Sound not found')
+            return serve_bytes(request, peaks, 'application/octet-stream')
+
+        @self.router.post('/{name}/play', responses={429: {'description': 'Too many plays, retry after Retry-After seconds'}})
+        async def play_sound(name: str, user: get_current_user_depends, guild_id: get_selected_guild_depends) -> PlayDto:
+            return PlayDto(**await self.backend.play(user.discord_user_id, guild_id, name))
 
         @self.router.post('/create')
         async def create_sound(name: str, file: UploadFile, guild_id: get_selected_guild_depends) -> SoundDto:
-            if file.size > MAX_LENGTH:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='File too large')
+            if not is_valid_sound_name(name):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Invalid sound name')
+            if file.size is not None and file.size > MAX_LENGTH:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail='File too large')
+            if await asyncio.to_thread(self.backend.playback_manager.sound_exists, name, guild_id):
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='Sound already exists')
 
-            self.bot.playback_manager.save_to_local_cache(name, guild_id, await file.read())
-            self.bot.playback_manager.save_to_database(name, guild_id, await file.read())
+            try:
+                # Spooled upload is copied once, in chunks, off the event loop
+                saved = await asyncio.to_thread(self.backend.playback_manager.save_upload, name, guild_id, file.file)
+            except ValueError:
+                raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail='File too large')
+            if not saved:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='Sound already exists')
             return SoundDto(name=name, default=False)
 
         @self.router.delete('/{name}')
         async def delete_sound(name: str, guild_id: get_selected_guild_depends) -> None:
-            self.bot.playback_manager.delete_sound(name, guild_id)
+            file_path = self.backend.playback_manager.find_sound(name, guild_id, False)
+            await asyncio.to_thread(self.backend.playback_manager.delete_sound, name, guild_id)
+            if file_path is not None:
+                self.etags.forget(file_path)
+            self.etags.forget(self.backend.playback_manager.preview_cache_path(name, guild_id))
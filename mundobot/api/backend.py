@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import math
+import os
+from typing import Any, Dict, List, Optional, Set, Union
+
+import certifi
+from fastapi import HTTPException
+from pymongo import MongoClient
+from starlette import status
+
+from .cache import TtlLruCache
+from .. import helpers
+from ..clash.attendance import Attendance, AttendanceManager
+from ..events import EventHub
+from ..ipc import Handler, IpcClient, IpcError
+from ..mundobot import MundoBot
+from ..playback import PlaybackManager
+from ..rate_limit import TokenBucket
+
+PLAY_USER_LIMIT = (5, 10)  # plays per seconds for one user
+PLAY_GUILD_LIMIT = (20, 60)  # plays per seconds for one guild
+MAX_QUEUE_DEPTH = 30
+PLAY_BUCKETS_SIZE = 10000
+
+
+class LocalBackend:
+    """Access of the API to the bot running in the same process.
+
+    In split-process mode it also answers IPC calls of API workers, so admission control
+    of playback stays in one place for all of them.
+    """
+
+    def __init__(self, bot: MundoBot):
+        self.bot = bot
+        self.playback_manager: PlaybackManager = bot.playback_manager
+        self.event_hub: EventHub = bot.event_hub
+        # Idle buckets are full again after their period, so they can be forgotten
+        self.user_buckets: TtlLruCache[TokenBucket] = TtlLruCache(PLAY_BUCKETS_SIZE, PLAY_USER_LIMIT[1])
+        self.guild_buckets: TtlLruCache[TokenBucket] = TtlLruCache(PLAY_BUCKETS_SIZE, PLAY_GUILD_LIMIT[1])
+        self.playback_tasks: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def guilds_of(self, user_id: int) -> List[Dict[str, str]]:
+        guilds = (self.bot.get_guild(guild_id) for guild_id in self.bot.membership_index.guilds_of(user_id))
+        return [{'id': str(guild.id), 'name': guild.name} for guild in guilds if guild is not None]
+
+    async def is_member(self, user_id: int, guild_id: int) -> bool:
+        return self.bot.membership_index.is_member(user_id, guild_id)
+
+    async def get_attendance(self, guild_id: int, player_id: int) -> Optional[Attendance]:
+        return await self.bot.clash_repository.get_attendance(guild_id, player_id)
+
+    @staticmethod
+    def bucket(buckets: TtlLruCache[TokenBucket], key: int, limit) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(*limit)
+        # Every use extends the entry so a partially drained bucket is not reset
+        buckets.set(key, bucket)
+        return bucket
+
+    def admit(self, user_id: int, guild_id: int) -> float:
+        """Takes a play token of the user and of the guild.
+
+        Returns 0 if the play is admitted, else seconds after which it may be retried.
+        """
+        user_bucket = self.bucket(self.user_buckets, user_id, PLAY_USER_LIMIT)
+        guild_bucket = self.bucket(self.guild_buckets, guild_id, PLAY_GUILD_LIMIT)
+        wait = max(user_bucket.wait_time(), guild_bucket.wait_time())
+        if wait > 0:
+            return wait
+        user_bucket.try_acquire()
+        guild_bucket.try_acquire()
+        return 0
+
+    async def play(self, user_id: int, guild_id: int, name: str) -> Dict[str, Any]:
+        """Queues sound in the voice channel of the user.
+
+        Returns queue position and estimated seconds until the sound plays.
+        """
+        guild = self.bot.get_guild(guild_id)
+        member = guild.get_member(user_id) if guild is not None else None
+        if member is None or member.voice is None or member.voice.channel is None:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='User is not in a voice channel')
+        if self.playback_manager.find_sound(name, guild_id, False) is None \
+                and not await asyncio.to_thread(self.playback_manager.sound_exists, name, guild_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Sound not found')
+
+        length, eta = self.playback_manager.queue_status(guild_id)
+        if length >= MAX_QUEUE_DEPTH:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail='Playback queue is full',
+                                headers={'Retry-After': str(max(1, math.ceil(eta / length)))})
+        retry_after = self.admit(user_id, guild_id)
+        if retry_after > 0:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail='Too many plays',
+                                headers={'Retry-After': str(math.ceil(retry_after))})
+
+        # add_to_queue keeps playing until the queue is empty, so it runs after the response
+        task = asyncio.create_task(self.playback_manager.add_to_queue(guild_id, member.voice.channel, name))
+        self.playback_tasks.add(task)
+        task.add_done_callback(self.playback_tasks.discard)
+        return {'position': length + 1, 'eta_seconds': eta}
+
+    def ipc_handlers(self) -> Dict[str, Handler]:
+        return {
+            'guilds_of': self.guilds_of,
+            'is_member': self.is_member,
+            'play': self.play,
+        }
+
+
+def http_error(error: Exception) -> Optional[Dict[str, Any]]:
+    """Passes HTTP errors of handlers to API workers, they raise them again."""
+    if isinstance(error, HTTPException):
+        return {'status_code': error.status_code, 'detail': error.detail, 'headers': error.headers}
+    return None
+
+
+class RemoteBackend:
+    """Access of an API worker process to the bot running in another process.
+
+    Guild membership and playback go to the bot over IPC, reads of sounds and statistics
+    go straight to the database. Events of the bot are forwarded to the local event hub.
+    """
+
+    def __init__(self, socket_path: str, client: MongoClient, path: str):
+        self.event_hub = EventHub()
+        self.ipc = IpcClient(socket_path, self.event_hub.dispatch)
+        self.playback_manager = PlaybackManager(client, path, [])
+        self.attendance = AttendanceManager(client)
+        self.logger = helpers.prepare_logging('api', logging.WARNING)
+
+    async def start(self) -> None:
+        try:
+            await self.ipc.connect()
+        except OSError as error:
+            # Connection is retried on first call, the bot may start later
+            self.logger.warning('Bot is not reachable yet: %s', error)
+
+    async def close(self) -> None:
+        await self.ipc.close()
+
+    async def call(self, method: str, **params: Any) -> Any:
+        try:
+            return await self.ipc.call(method, **params)
+        except IpcError as error:
+            if 'status_code' in error.data:
+                raise HTTPException(**error.data)
+            raise
+        except (OSError, asyncio.TimeoutError):
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='Bot is not available')
+
+    async def guilds_of(self, user_id: int) -> List[Dict[str, str]]:
+        return await self.call('guilds_of', user_id=user_id)
+
+    async def is_member(self, user_id: int, guild_id: int) -> bool:
+        return await self.call('is_member', user_id=user_id, guild_id=guild_id)
+
+    async def get_attendance(self, guild_id: int, player_id: int) -> Optional[Attendance]:
+        return await asyncio.to_thread(self.attendance.get_attendance, guild_id, player_id)
+
+    async def play(self, user_id: int, guild_id: int, name: str) -> Dict[str, Any]:
+        return await self.call('play', user_id=user_id, guild_id=guild_id, name=name)
+
+
+# Routers work with both, depending on whether the API runs in the bot process
+Backend = Union[LocalBackend, RemoteBackend]
+
+
+def create_remote_backend() -> RemoteBackend:
+    client = MongoClient(helpers.get_connection_string(), uuidRepresentation='standard', tlsCAFile=certifi.where())
+    return RemoteBackend(os.environ['BOT_IPC_SOCKET'], client,
+                         os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,63 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+def token_key(token: str) -> str:
+    """Key of a secret token in caches, so raw tokens are not kept in memory."""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TtlLruCache(Generic[T]):
+    """LRU cache bounded by number of entries where every entry also has its own expiry."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: OrderedDict[Hashable, Tuple[float, T]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> Optional[T]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: T, ttl: Optional[float] = None) -> None:
+        """Stores value for at most `ttl` seconds, defaults to ttl of the cache."""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self.entries.pop(key, None)
+
+
+class SingleFlight(Generic[T]):
+    """Runs at most one call per key at once, concurrent callers with the same key share its result."""
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        if key not in self.calls:
+            future = asyncio.ensure_future(function())
+            self.calls[key] = future
+            future.add_done_callback(lambda _: self.calls.pop(key, None))
+        # Cancelling one caller must not cancel the call the others wait for
+        return await asyncio.shield(self.calls[key])
@@ -1,10 +1,24 @@
-from typing import Annotated, Optional
-from fastapi import Header, Depends
+from typing import Annotated, Awaitable, Callable, Optional
+from fastapi import Header, Depends, HTTPException
+from starlette import status
+
+from .api_login import get_current_user_depends
 
 
 # Not the cleanest but since openapi-generator does not support not including it, then I have to do this
-def __get_selected_guild(guild_id: Annotated[Optional[str], Header(include_in_schema=False)]):
+def __get_selected_guild(guild_id: Annotated[Optional[str], Header(include_in_schema=False)] = None):
     return int(guild_id) if guild_id else None
 
 
 get_selected_guild_depends = Annotated[Optional[int], Depends(__get_selected_guild)]
+
+
+def guild_access_verifier(backend) -> Callable[..., Awaitable[None]]:
+    """Creates router dependency allowing only members of the selected guild."""
+    async def verify_guild_access(user: get_current_user_depends, guild_id: get_selected_guild_depends) -> None:
+        if guild_id is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='No guild selected')
+        if not await backend.is_member(user.discord_user_id, guild_id):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='User does not have access to this guild')
+
+    return verify_guild_access
@@ -0,0 +1,11 @@
+from typing import Dict
+
+from pydantic import BaseModel
+
+
+class AttendanceDto(BaseModel):
+    player_id: str
+    player_name: str
+    positions: Dict[str, int]
+    clashes: int
+    noob_clashes: int
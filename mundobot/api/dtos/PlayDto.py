@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class PlayDto(BaseModel):
+    position: int
+    eta_seconds: float
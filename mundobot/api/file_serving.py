@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import AsyncIterator, Optional, Tuple
+
+import anyio
+from starlette import status
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+from .cache import TtlLruCache
+
+CHUNK_SIZE = 64 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+# Clients may keep a versioned sound forever, its content never changes under the same version
+IMMUTABLE_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+# Unversioned URL may get other content when the sound is recreated, so it is always revalidated
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+RANGE_REGEX = re.compile(r'bytes=(\d*)-(\d*)$')
+ETAGS_CACHE_SIZE = 10000
+ETAGS_CACHE_TTL = 24 * 60 * 60  # seconds, entries are also checked against size and mtime
+
+
+class ContentEtags:
+    """Strong ETags of files based on their content hash, recomputed only when size or mtime changes."""
+
+    def __init__(self, max_size: int = ETAGS_CACHE_SIZE):
+        self.etags: TtlLruCache[Tuple[int, int, str]] = TtlLruCache(max_size, ETAGS_CACHE_TTL)
+
+    @staticmethod
+    def hash_file(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            while chunk := file.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        return f'"{digest.hexdigest()[:32]}"'
+
+    async def etag(self, path: Path, stat_result: os.stat_result) -> str:
+        known = self.etags.get(str(path))
+        if known is not None and known[:2] == (stat_result.st_mtime_ns, stat_result.st_size):
+            return known[2]
+        etag = await asyncio.to_thread(self.hash_file, path)
+        self.etags.set(str(path), (stat_result.st_mtime_ns, stat_result.st_size, etag))
+        return etag
+
+    def forget(self, path: Path) -> None:
+        self.etags.pop(str(path))
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parses single byte range to inclusive bounds.
+
+    Returns None if the whole file should be sent, which includes invalid ranges as RFC 9110 has them ignored,
+    raises ValueError if the range is valid but not satisfiable.
+    """
+    if not header or size == 0:
+        # Empty file has no byte to range over, it is sent whole
+        return None
+    match = RANGE_REGEX.match(header.strip())
+    if match is None:
+        # Multiple or malformed ranges may be ignored and the whole file sent
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if first and last and int(last) < int(first):
+        return None
+    if not first:
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+async def read_range(path: Path, start: int, end: int) -> AsyncIterator[bytes]:
+    async with await anyio.open_file(path, 'rb') as file:
+        await file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+
+async def serve_file(request: Request, path: Path, media_type: str, etags: ContentEtags,
+                     filename: Optional[str] = None) -> Response:
+    """Serves file with strong ETag, conditional GET and single range requests.
+
+    Whole files are sent by FileResponse, which uses zero-copy pathsend where the server supports it.
+    """
+    stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    size = stat_result.st_size
+    etag = await etags.etag(path, stat_result)
+    cache_control = IMMUTABLE_CACHE_CONTROL if request.query_params.get('v') == etag.strip('"') \
+        else REVALIDATE_CACHE_CONTROL
+    headers = {'ETag': etag, 'Cache-Control': cache_control, 'Accept-Ranges': 'bytes'}
+
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    range_header = request.headers.get('range')
+    if_range = request.headers.get('if-range')
+    if if_range is not None and if_range.strip() != etag:
+        # Client holds other version of the file, it gets the whole new one
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                        headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, headers=headers, filename=filename, stat_result=stat_result)
+    start, end = byte_range
+    headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    headers['Content-Length'] = str(end - start + 1)
+    return StreamingResponse(read_range(path, start, end), status_code=status.HTTP_206_PARTIAL_CONTENT,
+                             media_type=media_type, headers=headers)
+
+
+def serve_bytes(request: Request, content: bytes, media_type: str) -> Response:
+    """Serves small in-memory content with strong ETag and conditional GET."""
+    etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+    cache_control = IMMUTABLE_CACHE_CONTROL if request.query_params.get('v') == etag.strip('"') \
+        else REVALIDATE_CACHE_CONTROL
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content, media_type=media_type, headers=headers)
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .cache import SingleFlight
+from .. import helpers
+
+PREVIEW_SECONDS = 15
+PREVIEW_BITRATE = '48k'
+# Number of ffmpeg processes transcoding at once
+TRANSCODE_CONCURRENCY = 2
+TRANSCODE_TIMEOUT = 60  # seconds
+
+
+class PreviewRenderer:
+    """Renders short low bitrate Opus/WebM previews of sounds with a bounded pool of ffmpeg processes.
+
+    Previews are rendered on first request and cached on disk, concurrent requests of one preview
+    share a single transcoding. A preview whose source was deleted or replaced during transcoding
+    is dropped, so it never outlives the invalidation by delete or upload of the sound.
+    """
+
+    def __init__(self, concurrency: int = TRANSCODE_CONCURRENCY):
+        self.pool = asyncio.Semaphore(concurrency)
+        self.renders: SingleFlight[Optional[Path]] = SingleFlight()
+        self.logger = helpers.prepare_logging('prv', logging.WARNING)
+
+    @staticmethod
+    def version(path: Path) -> Optional[Tuple[int, int]]:
+        """Gets mtime and size of a file, None if it does not exist."""
+        try:
+            stat_result = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat_result.st_mtime_ns, stat_result.st_size
+
+    async def preview(self, source: Path, target: Path) -> Optional[Path]:
+        """Gets cached preview of source, rendering it if it is missing or older than the source.
+
+        Returns None if the source could not be transcoded or changed meanwhile.
+        """
+        target_version, source_version = self.version(target), self.version(source)
+        if target_version is not None and source_version is not None and target_version[0] >= source_version[0]:
+            return target
+        return await self.renders.run(str(target), lambda: self.render(source, target))
+
+    async def render(self, source: Path, target: Path) -> Optional[Path]:
+        source_version = self.version(source)
+        if source_version is None:
+            return None
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temporary = target.with_name(f'{target.name}.{os.getpid()}.tmp')
+        async with self.pool:
+            process = await asyncio.create_subprocess_exec(
+                'ffmpeg', '-y', '-v', 'error', '-i', str(source), '-t', str(PREVIEW_SECONDS), '-vn', '-ac', '1',
+                '-c:a', 'libopus', '-b:a', PREVIEW_BITRATE, '-f', 'webm', str(temporary),
+                stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE)
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), TRANSCODE_TIMEOUT)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                stderr = b'timeout'
+        if process.returncode != 0:
+            temporary.unlink(missing_ok=True)
+            self.logger.error('Preview of %s failed: %s', source, stderr.decode(errors='replace'))
+            return None
+        if self.version(source) != source_version:
+            temporary.unlink(missing_ok=True)
+            return None
+        os.replace(temporary, target)
+        # Sound may have been deleted or replaced right before the preview was put in place
+        if self.version(source) != source_version:
+            target.unlink(missing_ok=True)
+            return None
+        return target
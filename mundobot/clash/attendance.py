@@ -0,0 +1,212 @@
+"""Module providing incrementally maintained clash attendance statistics of players."""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import dotenv
+from bson import ObjectId
+from pymongo import MongoClient, UpdateOne, collection
+
+from mundobot.clash.position import ClashPositions, Position, PositionRecord
+from mundobot import helpers
+
+
+@dataclass(slots=True)
+class Attendance:
+    """Attendance statistics of a player in a guild."""
+
+    guild_id: int
+    player_id: int
+    player_name: str = ""
+    # Current registrations to each position summed over all clashes
+    positions: Dict[str, int] = field(default_factory=lambda: {})
+    # Completed clashes the player was registered to as a player
+    clashes: int = 0
+    # Completed clashes the player only answered NOOB to
+    noob_clashes: int = 0
+
+    @property
+    def registrations(self) -> int:
+        """Number of registrations to all positions."""
+        return sum(self.positions.values())
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> Attendance:
+        """Convertor from DB document.
+
+        Args:
+            document (Dict[str, Any]): Attendance document.
+
+        Returns:
+            Attendance: Deserialized Attendance.
+        """
+        return cls(
+            document["guild_id"],
+            document["player_id"],
+            document.get("player_name", ""),
+            dict(document.get("positions", {})),
+            document.get("clashes", 0),
+            document.get("noob_clashes", 0),
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Convertor to serialized format.
+
+        Returns:
+            Dict[str, Any]: Serialized Attendance.
+        """
+        return {
+            "guild_id": self.guild_id,
+            "player_id": self.player_id,
+            "player_name": self.player_name,
+            "positions": self.positions,
+            "clashes": self.clashes,
+            "noob_clashes": self.noob_clashes,
+        }
+
+
+class AttendanceManager:
+    """Maintains attendance rollups of players per guild.
+
+    Rollups are updated with $inc on every registration change and when a clash
+    is completed, so reading statistics of a player is a single indexed lookup.
+    """
+
+    def __init__(self, client: MongoClient) -> None:
+        self.client = client
+        self.attendance: collection.Collection = client.clash.attendance
+        self.clashes: collection.Collection = client.clash.clashes
+        self.positions: collection.Collection = client.clash.positions
+
+    def record_registration(
+        self, guild_id: int, record: PositionRecord, change: int
+    ) -> None:
+        """Counts registration or unregistration of a player to a position.
+
+        Args:
+            guild_id (int): Id of the guild of the clash.
+            record (PositionRecord): Registered or unregistered position.
+            change (int): 1 for registration, -1 for unregistration.
+        """
+        self.attendance.update_one(
+            {"guild_id": guild_id, "player_id": record.player_id},
+            {
+                "$inc": {f"positions.{record.position}": change},
+                "$set": {"player_name": record.player_name},
+            },
+            upsert=True,
+        )
+
+    @staticmethod
+    def completion_changes(
+        players: List[PositionRecord],
+    ) -> Dict[int, Dict[str, int]]:
+        """Calculates increments of completed clash counters of a clash roster.
+
+        Args:
+            players (List[PositionRecord]): Players registered to the clash.
+
+        Returns:
+            Dict[int, Dict[str, int]]: Increments of counters for each player id.
+        """
+        playing = {r.player_id for r in players if r.position != Position.NOOB}
+        noob = {r.player_id for r in players if r.position == Position.NOOB} - playing
+        changes: Dict[int, Dict[str, int]] = {}
+        for player_id in playing:
+            changes[player_id] = {"clashes": 1}
+        for player_id in noob:
+            changes[player_id] = {"noob_clashes": 1}
+        return changes
+
+    def record_completion(self, guild_id: int, positions: ClashPositions) -> None:
+        """Counts a completed clash to the attendance of its registered players.
+
+        Args:
+            guild_id (int): Id of the guild of the clash.
+            positions (ClashPositions): Final positions of the clash.
+        """
+        changes = self.completion_changes(positions.players)
+        if not changes:
+            return
+        self.attendance.bulk_write(
+            [
+                UpdateOne(
+                    {"guild_id": guild_id, "player_id": player_id},
+                    {"$inc": increments},
+                    upsert=True,
+                )
+                for player_id, increments in changes.items()
+            ],
+            ordered=False,
+        )
+
+    def get_attendance(self, guild_id: int, player_id: int) -> Optional[Attendance]:
+        """Gets attendance statistics of a player.
+
+        Args:
+            guild_id (int): Id of the guild.
+            player_id (int): Id of the player.
+
+        Returns:
+            Optional[Attendance]: Statistics or None if player never registered.
+        """
+        document = self.attendance.find_one(
+            {"guild_id": guild_id, "player_id": player_id}, {"_id": 0}
+        )
+        return Attendance.from_document(document) if document is not None else None
+
+    def backfill(self) -> int:
+        """Recomputes registrations of all rollups from stored positions.
+        Positions of removed clashes are deleted with them, so this is meant
+        to be run once when rollups are introduced. Completion of stored clashes
+        is counted when they are removed, so it is not counted here, and counters
+        of completed clashes are left as they are.
+
+        Returns:
+            int: Number of rollups written.
+        """
+        guilds: Dict[ObjectId, int] = {
+            document["_id"]: document["guild_id"]
+            for document in self.clashes.find({}, {"guild_id": 1})
+        }
+        rollups: Dict[tuple, Attendance] = {}
+
+        for document in self.positions.find({}, {"_id": 0}):
+            guild_id = guilds.get(document["clash_id"])
+            if guild_id is None:
+                continue
+            for record in ClashPositions.from_document(document).players:
+                key = (guild_id, record.player_id)
+                if key not in rollups:
+                    rollups[key] = Attendance(guild_id, record.player_id)
+                attendance = rollups[key]
+                attendance.player_name = record.player_name
+                position = str(record.position)
+                attendance.positions[position] = (
+                    attendance.positions.get(position, 0) + 1
+                )
+
+        if rollups:
+            self.attendance.bulk_write(
+                [
+                    UpdateOne(
+                        {"guild_id": a.guild_id, "player_id": a.player_id},
+                        {
+                            "$set": {
+                                "player_name": a.player_name,
+                                "positions": a.positions,
+                            }
+                        },
+                        upsert=True,
+                    )
+                    for a in rollups.values()
+                ],
+                ordered=False,
+            )
+        return len(rollups)
+
+
+if __name__ == "__main__":
+    dotenv.load_dotenv()
+    mongo_client = MongoClient(helpers.get_connection_string())
+    print(AttendanceManager(mongo_client).backfill(), "rollups written")
@@ -1,10 +1,14 @@
 """Module providing Clash dataclass for storing League clash data."""
+from __future__ import annotations
 from dataclasses import dataclass, field
 import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
+# Projection of clash documents leaving out the growing list of notification ids
+CLASH_PROJECTION = {"notification_message_ids": 0}
 
-@dataclass
+
+@dataclass(slots=True)
 class Clash:
     """Class for storing clash data."""
 
@@ -29,8 +33,53 @@ class Clash:
                     hour=0, minute=0, second=0
                 )
 
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> Clash:
+        """Convertor from DB document.
+
+        Args:
+            document (Dict[str, Any]): Clash document, may come from a projection
+            without notification_message_ids.
+
+        Returns:
+            Clash: Deserialized Clash.
+        """
+        return cls(
+            document["name"],
+            document["date_string"],
+            document["guild_id"],
+            document["clash_channel_id"],
+            document["channel_id"],
+            document["message_id"],
+            document["role_id"],
+            document["status_id"],
+            list(document.get("notification_message_ids", ())),
+            document.get("riot_id"),
+            document.get("date"),
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Convertor to serialized format.
+
+        Returns:
+            Dict[str, Any]: Serialized Clash.
+        """
+        return {
+            "name": self.name,
+            "date_string": self.date_string,
+            "guild_id": self.guild_id,
+            "clash_channel_id": self.clash_channel_id,
+            "channel_id": self.channel_id,
+            "message_id": self.message_id,
+            "role_id": self.role_id,
+            "status_id": self.status_id,
+            "notification_message_ids": list(self.notification_message_ids),
+            "riot_id": self.riot_id,
+            "date": self.date,
+        }
+
 
-@dataclass
+@dataclass(slots=True)
 class RegularPlayer:
     """Class used for storing regular players in the DB."""
 
@@ -45,3 +94,36 @@ class RegularPlayer:
     overruled: str = "none"
     # Signals who activated this last
     last_activated: str = "none"
+
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> RegularPlayer:
+        """Convertor from DB document.
+
+        Args:
+            document (Dict[str, Any]): Regular player document.
+
+        Returns:
+            RegularPlayer: Deserialized RegularPlayer.
+        """
+        return cls(
+            document["player_id"],
+            document["guild_id"],
+            document["active"],
+            document.get("overruled", "none"),
+            document.get("last_activated", "none"),
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Convertor to serialized format.
+
+        Returns:
+            Dict[str, Any]: Serialized RegularPlayer.
+        """
+        return {
+            "player_id": self.player_id,
+            "guild_id": self.guild_id,
+            "active": self.active,
+            "overruled": self.overruled,
+            "last_activated": self.last_activated,
+        }
+
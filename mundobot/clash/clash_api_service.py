@@ -1,25 +1,108 @@
 """Module for managing connection to Riot API."""
+import asyncio
 from collections import namedtuple
 import datetime
+import logging
 import os
-from typing import Any, Dict, List
+import random
+from typing import Any, Dict, Iterable, List, Optional
 
+import aiohttp
 import dotenv
-from riotwatcher import LolWatcher
+
+from mundobot.rate_limit import RateLimiter
+from mundobot import helpers
 
 ApiClash = namedtuple("ApiClash", "id name date")
 
+RIOT_API_URL = "https://{region}.api.riotgames.com"
+TOURNAMENTS_PATH = "/lol/clash/v1/tournaments"
+DEFAULT_REGION = "eun1"
+REGIONS = [
+    "br1",
+    "eun1",
+    "euw1",
+    "jp1",
+    "kr",
+    "la1",
+    "la2",
+    "na1",
+    "oc1",
+    "ph2",
+    "ru",
+    "sg2",
+    "th2",
+    "tr1",
+    "tw2",
+    "vn2",
+]
+# Limits of a development key used until Riot sends its own in headers
+DEFAULT_APP_LIMITS = [(20, 1), (100, 120)]
+MAX_CONNECTIONS = 10
+MAX_RETRIES = 3
+# Server errors are retried after exponentially growing delay, half of it random jitter
+SERVER_ERROR_BACKOFF = 0.5  # seconds before the first retry
+
+
+class RiotApiError(Exception):
+    """Raised when Riot API does not return a successful response."""
+
+    def __init__(self, status: int, region: str) -> None:
+        super().__init__(f"Riot API returned {status} for region {region}.")
+        self.status = status
+        self.region = region
+
 
 class ClashApiService:
-    """Manages methods for connection to Riot API."""
+    """Manages methods for connection to Riot API.
 
-    def __init__(self, api_key: str = "") -> None:
-        api_key: str
+    Requests share one pooled session and every region has its own rate limiter,
+    since Riot applies limits per routing value.
+    """
+
+    def __init__(self, api_key: str = "", base_url: str = RIOT_API_URL) -> None:
         if not api_key:
             self.api_key = os.environ.get("RIOT_API_KEY")
         else:
             self.api_key = api_key
-        self.lol_watcher_clash = LolWatcher(api_key=self.api_key).clash
+        self.base_url = base_url
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.app_limiters: Dict[str, RateLimiter] = {}
+        self.method_limiters: Dict[str, RateLimiter] = {}
+        self.logger = helpers.prepare_logging("riot", logging.WARNING)
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Gets pooled HTTP session, creating it on first use inside running loop.
+
+        Returns:
+            aiohttp.ClientSession: Shared session.
+        """
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                headers={"X-Riot-Token": self.api_key or ""},
+                connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS),
+                timeout=aiohttp.ClientTimeout(total=30),
+            )
+        return self.session
+
+    async def close(self) -> None:
+        """Closes the pooled HTTP session."""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    def limiters_for(self, region: str) -> List[RateLimiter]:
+        """Gets application and method rate limiters for a region.
+
+        Args:
+            region (str): Riot platform routing value.
+
+        Returns:
+            List[RateLimiter]: Limiters which all have to be acquired.
+        """
+        if region not in self.app_limiters:
+            self.app_limiters[region] = RateLimiter(DEFAULT_APP_LIMITS)
+            self.method_limiters[region] = RateLimiter()
+        return [self.app_limiters[region], self.method_limiters[region]]
 
     @staticmethod
     def map_clash_dto_to_clash(dto: Dict[str, Any]) -> ApiClash:
@@ -39,18 +122,104 @@ class ClashApiService:
         ).isoformat()
         return ApiClash(dto["id"], name_full, date)
 
-    def get_clashes(self) -> List[ApiClash]:
+    async def request(self, region: str, path: str) -> Any:
+        """Sends rate limited GET request to Riot API of a region.
+
+        Args:
+            region (str): Riot platform routing value.
+            path (str): Path of the endpoint.
+
+        Raises:
+            RiotApiError: If the request does not succeed even after retries,
+                with status of the last response.
+
+        Returns:
+            Any: Decoded JSON response.
+        """
+        session = await self.get_session()
+        app_limiter, method_limiter = self.limiters_for(region)
+        url = self.base_url.format(region=region) + path
+
+        status = 0
+        for attempt in range(MAX_RETRIES):
+            await app_limiter.acquire()
+            await method_limiter.acquire()
+            async with session.get(url) as response:
+                app_limiter.update_limits(response.headers.get("X-App-Rate-Limit"))
+                method_limiter.update_limits(
+                    response.headers.get("X-Method-Rate-Limit")
+                )
+                status = response.status
+                if status == 429:
+                    retry_after = float(response.headers.get("Retry-After", 1))
+                    self.logger.warning(
+                        "Rate limited in %s, retrying in %.1f s.", region, retry_after
+                    )
+                    limited = (
+                        method_limiter
+                        if response.headers.get("X-Rate-Limit-Type") == "method"
+                        else app_limiter
+                    )
+                    limited.penalize(retry_after)
+                    continue
+                if status < 500:
+                    if status != 200:
+                        raise RiotApiError(status, region)
+                    return await response.json()
+            if attempt + 1 < MAX_RETRIES:
+                backoff = SERVER_ERROR_BACKOFF * 2**attempt
+                delay = backoff / 2 + random.uniform(0, backoff / 2)
+                self.logger.warning(
+                    "Server error %d in %s, retrying in %.1f s.", status, region, delay
+                )
+                await asyncio.sleep(delay)
+        raise RiotApiError(status, region)
+
+    async def get_clashes(self, region: str = DEFAULT_REGION) -> List[ApiClash]:
         """Gets all clashes from Riot Api in form of (id, name, date).
 
+        Args:
+            region (str, optional): Riot platform routing value. Defaults to DEFAULT_REGION.
+
         Returns:
             List[ApiClash]: Clashes in form of (id, name, date).
         """
-        response = self.lol_watcher_clash.tournaments("eun1")
+        response = await self.request(region, TOURNAMENTS_PATH)
         # Map reponses to Clash data structure
         return list(map(self.map_clash_dto_to_clash, response))
 
+    async def get_clashes_for_regions(
+        self, regions: Iterable[str]
+    ) -> Dict[str, List[ApiClash]]:
+        """Gets clashes of all given regions concurrently.
+        Regions for which the request failed are left out of the result.
+
+        Args:
+            regions (Iterable[str]): Riot platform routing values.
+
+        Returns:
+            Dict[str, List[ApiClash]]: Clashes for each successfully fetched region.
+        """
+        regions = list(set(regions))
+        results = await asyncio.gather(
+            *(self.get_clashes(region) for region in regions), return_exceptions=True
+        )
+        clashes = {}
+        for region, result in zip(regions, results):
+            if isinstance(result, Exception):
+                self.logger.error("Failed to get clashes for %s: %s", region, result)
+            else:
+                clashes[region] = result
+        return clashes
+
 
 if __name__ == "__main__":
     dotenv.load_dotenv()
-    serv = ClashApiService()
-    print(serv.get_clashes())
+
+    async def main():
+        """Prints clashes of the default region."""
+        serv = ClashApiService()
+        print(await serv.get_clashes())
+        await serv.close()
+
+    asyncio.run(main())
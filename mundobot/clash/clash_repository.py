@@ -0,0 +1,287 @@
+"""Module providing asynchronous access to clash data for Discord event handlers."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import functools
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+from bson import ObjectId
+
+from mundobot.clash.attendance import Attendance
+from mundobot.clash.clash import Clash
+from mundobot.clash.clash_api_service import ApiClash, DEFAULT_REGION
+from mundobot.clash.clashmanager import ClashChanges, ClashManager, ClashNotification
+from mundobot.clash.position import ClashPositions, Position, PositionRecord
+
+# Number of database operations running at once, MongoClient pool is sized to match
+DB_POOL_SIZE = 32
+
+T = TypeVar("T")
+
+
+class AsyncClashRepository:
+    """Asynchronous counterpart of ClashManager with the same semantics.
+
+    Blocking pymongo calls run in a thread pool sized for concurrent guild handlers,
+    so the event loop keeps serving Discord while the database answers.
+    Read-modify-write operations of one roster or one regular player are serialized,
+    as they were when all calls ran one by one on the event loop.
+    """
+
+    def __init__(self, manager: ClashManager, pool_size: int = DB_POOL_SIZE) -> None:
+        self.manager = manager
+        self.executor = ThreadPoolExecutor(pool_size, thread_name_prefix="clash-db")
+        # Locks exist only while some call holds or waits for them
+        self.locks: Dict[Hashable, asyncio.Lock] = {}
+        self.lock_users: Dict[Hashable, int] = {}
+
+    @contextlib.asynccontextmanager
+    async def locked(self, key: Hashable) -> AsyncIterator[None]:
+        """Holds lock of a key.
+
+        Args:
+            key (Hashable): Key of the lock.
+        """
+        self.lock_users[key] = self.lock_users.get(key, 0) + 1
+        try:
+            async with self.locks.setdefault(key, asyncio.Lock()):
+                yield
+        finally:
+            self.release_lock_user(key)
+
+    def release_lock_user(self, key: Hashable) -> None:
+        """Forgets lock of a key when no call uses it anymore."""
+        self.lock_users[key] -= 1
+        if self.lock_users[key] == 0:
+            del self.lock_users[key]
+            del self.locks[key]
+
+    async def run(
+        self,
+        function: Callable[..., T],
+        *args: Any,
+        lock_key: Optional[Hashable] = None,
+        **kwargs: Any,
+    ) -> T:
+        """Runs blocking function in the thread pool.
+
+        Args:
+            function (Callable[..., T]): Function to run.
+            lock_key (Optional[Hashable]): Calls with the same key run one at a time.
+
+        Returns:
+            T: Result of the function.
+        """
+        loop = asyncio.get_running_loop()
+        call = functools.partial(function, *args, **kwargs)
+        if lock_key is None:
+            return await loop.run_in_executor(self.executor, call)
+        async with self.locked(lock_key):
+            return await loop.run_in_executor(self.executor, call)
+
+    def close(self) -> None:
+        """Shuts down the thread pool after running operations finish."""
+        self.executor.shutdown(wait=False)
+
+    async def clashes_for_guild(self, guild_id: int) -> List[Dict[str, Any]]:
+        """Async version of ClashManager.clashes_for_guild, reading the whole cursor."""
+        return await self.run(lambda: list(self.manager.clashes_for_guild(guild_id)))
+
+    async def clash_for_message(
+        self, guild_id: int, channel_id: int, message_id: int
+    ) -> Optional[Tuple[ObjectId, Clash]]:
+        """Async version of ClashManager.clash_for_message."""
+        return await self.run(
+            self.manager.clash_for_message, guild_id, channel_id, message_id
+        )
+
+    async def all_clashes(self) -> List[Tuple[ObjectId, Clash]]:
+        """Async version of ClashManager.all_clashes."""
+        return await self.run(self.manager.all_clashes)
+
+    async def positions_for_clashes(
+        self, clash_ids: List[ObjectId]
+    ) -> Dict[ObjectId, ClashPositions]:
+        """Async version of ClashManager.positions_for_clashes."""
+        return await self.run(self.manager.positions_for_clashes, clash_ids)
+
+    async def apply_position_changes(
+        self,
+        clash_id: ObjectId,
+        added: List[PositionRecord],
+        removed: List[Tuple[int, Position]],
+    ) -> ClashPositions:
+        """Async version of ClashManager.apply_position_changes."""
+        return await self.run(
+            self.manager.apply_position_changes,
+            clash_id,
+            added,
+            removed,
+            lock_key=clash_id,
+        )
+
+    async def add_clash(
+        self, clash: Clash, notification_times: List[datetime] = None
+    ) -> ObjectId:
+        """Async version of ClashManager.add_clash."""
+        return await self.run(self.manager.add_clash, clash, notification_times)
+
+    async def has_riot_clash(self, guild_id: int, riot_id: int) -> bool:
+        """Async version of ClashManager.has_riot_clash."""
+        return await self.run(self.manager.has_riot_clash, guild_id, riot_id)
+
+    async def remove_clash(self, clash_name: str, guild_id: int) -> Optional[Clash]:
+        """Async version of ClashManager.remove_clash. Registrations of the clash
+        wait until it is removed, as they are serialized by clash id."""
+        async with self.locked(("guild", guild_id)):
+            clash_id = await self.run(self.manager.find_clash_id, clash_name, guild_id)
+            if clash_id is None:
+                return None
+            return await self.run(
+                self.manager.remove_clash, clash_name, guild_id, lock_key=clash_id
+            )
+
+    async def register_player(
+        self, clash_id: ObjectId, player_id: int, player_name: str, team_role: Position
+    ) -> ClashPositions:
+        """Async version of ClashManager.register_player."""
+        return await self.run(
+            self.manager.register_player,
+            clash_id,
+            player_id,
+            player_name,
+            team_role,
+            lock_key=clash_id,
+        )
+
+    async def unregister_player(
+        self, clash_id: ObjectId, player_name: str, team_role: Position
+    ) -> ClashPositions:
+        """Async version of ClashManager.unregister_player."""
+        return await self.run(
+            self.manager.unregister_player,
+            clash_id,
+            player_name,
+            team_role,
+            lock_key=clash_id,
+        )
+
+    async def get_needed_changes(
+        self, guild_id: int, confirmed_clashes: List[ApiClash]
+    ) -> Tuple[List[ApiClash], List[Clash]]:
+        """Async version of ClashManager.get_needed_changes."""
+        return await self.run(
+            self.manager.get_needed_changes, guild_id, confirmed_clashes
+        )
+
+    async def get_all_needed_changes(
+        self, servers: Dict[int, str], clashes_by_region: Dict[str, List[ApiClash]]
+    ) -> Dict[int, ClashChanges]:
+        """Async version of ClashManager.get_all_needed_changes."""
+        return await self.run(
+            self.manager.get_all_needed_changes, servers, clashes_by_region
+        )
+
+    async def register_server(
+        self, server_id: int, region: str = DEFAULT_REGION
+    ) -> bool:
+        """Async version of ClashManager.register_server."""
+        return await self.run(
+            self.manager.register_server,
+            server_id,
+            region,
+            lock_key=("server", server_id),
+        )
+
+    async def set_server_region(self, server_id: int, region: str) -> bool:
+        """Async version of ClashManager.set_server_region."""
+        return await self.run(self.manager.set_server_region, server_id, region)
+
+    async def get_server_region(self, server_id: int) -> str:
+        """Async version of ClashManager.get_server_region."""
+        return await self.run(self.manager.get_server_region, server_id)
+
+    async def set_dm_reminders(self, server_id: int, enabled: bool) -> bool:
+        """Async version of ClashManager.set_dm_reminders."""
+        return await self.run(self.manager.set_dm_reminders, server_id, enabled)
+
+    async def get_dm_reminder_servers(self, server_ids: List[int]) -> Set[int]:
+        """Async version of ClashManager.get_dm_reminder_servers."""
+        return await self.run(self.manager.get_dm_reminder_servers, server_ids)
+
+    async def unregister_server(self, server_id: int) -> bool:
+        """Async version of ClashManager.unregister_server."""
+        return await self.run(
+            self.manager.unregister_server, server_id, lock_key=("server", server_id)
+        )
+
+    async def get_registered_servers(self) -> Dict[int, str]:
+        """Async version of ClashManager.get_registered_servers."""
+        return await self.run(self.manager.get_registered_servers)
+
+    async def notification_fanout(
+        self, clash_ids: List[ObjectId]
+    ) -> List[ClashNotification]:
+        """Async version of ClashManager.notification_fanout."""
+        return await self.run(self.manager.notification_fanout, clash_ids)
+
+    async def push_notification_ids(
+        self, notification_message_ids: Dict[ObjectId, int]
+    ) -> None:
+        """Async version of ClashManager.push_notification_ids."""
+        await self.run(self.manager.push_notification_ids, notification_message_ids)
+
+    async def regular_players_for_guild(self, guild_id: int) -> List[int]:
+        """Async version of ClashManager.regular_players_for_guild."""
+        return await self.run(self.manager.regular_players_for_guild, guild_id)
+
+    async def register_regular_player(
+        self,
+        guild_id: int,
+        player_id: int,
+        self_managing: bool = False,
+        privilaged_managing: bool = False,
+    ) -> bool:
+        """Async version of ClashManager.register_regular_player."""
+        return await self.run(
+            self.manager.register_regular_player,
+            guild_id,
+            player_id,
+            self_managing,
+            privilaged_managing,
+            lock_key=(guild_id, player_id),
+        )
+
+    async def unregister_regular_player(
+        self,
+        guild_id: int,
+        player_id: int,
+        self_managing: bool = False,
+        privilaged_managing: bool = False,
+    ) -> bool:
+        """Async version of ClashManager.unregister_regular_player."""
+        return await self.run(
+            self.manager.unregister_regular_player,
+            guild_id,
+            player_id,
+            self_managing,
+            privilaged_managing,
+            lock_key=(guild_id, player_id),
+        )
+
+    async def get_attendance(self, guild_id: int, player_id: int) -> Optional[Attendance]:
+        """Async version of ClashManager.get_attendance."""
+        return await self.run(self.manager.get_attendance, guild_id, player_id)
+
@@ -1,22 +1,32 @@
 """Module providing classes of Clashmanager that manages stored Clashes."""
+from collections import defaultdict, namedtuple
 from datetime import datetime
-from dataclasses import asdict
 import logging
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from pymongo import MongoClient, collection, cursor
-from dacite import from_dict
+from bson import ObjectId
+from pymongo import MongoClient, UpdateOne, collection, cursor
 
-from mundobot.clash.clash import Clash, RegularPlayer
+from mundobot.clash.attendance import Attendance, AttendanceManager
+from mundobot.clash.clash import CLASH_PROJECTION, Clash, RegularPlayer
 from mundobot.clash.position import (
+    POSITIONS_PROJECTION,
     Position,
     PositionRecord,
     ClashPositions,
-    DACITE_POSITION_CONFIG,
 )
-from mundobot.clash.clash_api_service import ApiClash
+from mundobot.clash.clash_api_service import ApiClash, DEFAULT_REGION
+from mundobot.clash.notification_scheduler import NotificationScheduler
 from mundobot import helpers
 
+# Changes needed for a guild, missing ApiClashes and names of surplus clashes
+ClashChanges = namedtuple("ClashChanges", "missing surplus")
+CLASH_DIFF_PROJECTION = {"_id": 0, "guild_id": 1, "name": 1, "riot_id": 1}
+# Everything needed to send notification of a clash
+ClashNotification = namedtuple(
+    "ClashNotification", "clash_id clash players regular_players"
+)
+
 
 class ClashManager:
     """Management class for storing and loading Clash instances to MongoDb."""
@@ -28,6 +38,10 @@ class ClashManager:
         self.notifications: collection.Collection = client.clash.notifications
         self.registered_servers: collection.Collection = client.clash.registered_servers
         self.regular_players: collection.Collection = client.clash.regular_players
+        self.notification_scheduler: Optional[NotificationScheduler] = None
+        self.attendance = AttendanceManager(client)
+        # Guild of each clash, it never changes so it is cached for attendance rollups
+        self.clash_guilds: Dict[ObjectId, int] = {}
         self.logger = helpers.prepare_logging("mng", logging.WARNING)
 
     def clashes_for_guild(self, guild_id: int) -> cursor.Cursor:
@@ -41,6 +55,48 @@ class ClashManager:
         """
         return self.clashes.find({"guild_id": guild_id})
 
+    def clash_for_message(
+        self, guild_id: int, channel_id: int, message_id: int
+    ) -> Optional[Tuple[ObjectId, Clash]]:
+        """Gets clash whose registration message is the given message.
+
+        Args:
+            guild_id (int): Id of the guild.
+            channel_id (int): Id of the channel of the message.
+            message_id (int): Id of the message.
+
+        Returns:
+            Optional[Tuple[ObjectId, Clash]]: Id of the clash in DB and the clash
+            or None if the message is not a registration message.
+        """
+        document = self.clashes.find_one(
+            {
+                "guild_id": guild_id,
+                "clash_channel_id": channel_id,
+                "message_id": message_id,
+            },
+            CLASH_PROJECTION,
+        )
+        if document is None:
+            return None
+        self.clash_guilds[document["_id"]] = document["guild_id"]
+        return document["_id"], Clash.from_document(document)
+
+    def find_clash_id(self, clash_name: str, guild_id: int) -> Optional[ObjectId]:
+        """Gets id of a clash by its name.
+
+        Args:
+            clash_name (str): Name of the clash.
+            guild_id (int): Id of the guild.
+
+        Returns:
+            Optional[ObjectId]: Id of the clash in DB or None if it does not exist.
+        """
+        document = self.clashes.find_one(
+            {"name": clash_name, "guild_id": guild_id}, {"_id": 1}
+        )
+        return document["_id"] if document is not None else None
+
     def positions_for_clash(self, clash_id: int) -> ClashPositions:
         """Gets positions for a clash.
 
@@ -48,38 +104,88 @@ class ClashManager:
             clash_id (int): Id of the clash in DB.
 
         Returns:
-            ClashPositions: Positions in the clash.
+            ClashPositions: Positions in the clash, empty if the clash was removed.
         """
-        return from_dict(
-            ClashPositions,
-            self.positions.find_one({"clash_id": clash_id}),
-            DACITE_POSITION_CONFIG,
-        )
+        document = self.positions.find_one({"clash_id": clash_id}, POSITIONS_PROJECTION)
+        if document is None:
+            return ClashPositions(clash_id, [])
+        return ClashPositions.from_document(document)
+
+    def all_clashes(self) -> List[Tuple[ObjectId, Clash]]:
+        """Gets all stored clashes of all guilds.
+
+        Returns:
+            List[Tuple[ObjectId, Clash]]: Id in DB and the clash for each clash.
+        """
+        clashes = []
+        for document in self.clashes.find({}, CLASH_PROJECTION):
+            self.clash_guilds[document["_id"]] = document["guild_id"]
+            clashes.append((document["_id"], Clash.from_document(document)))
+        return clashes
+
+    def positions_for_clashes(
+        self, clash_ids: List[ObjectId]
+    ) -> Dict[ObjectId, ClashPositions]:
+        """Gets positions of more clashes in one query.
+
+        Args:
+            clash_ids (List[ObjectId]): Ids of the clashes in DB.
+
+        Returns:
+            Dict[ObjectId, ClashPositions]: Positions for each clash id.
+        """
+        return {
+            document["clash_id"]: ClashPositions.from_document(document)
+            for document in self.positions.find(
+                {"clash_id": {"$in": clash_ids}}, POSITIONS_PROJECTION
+            )
+        }
 
     def add_clash(
         self, clash: Clash, notification_times: List[datetime] = None
-    ) -> None:
+    ) -> ObjectId:
         """Adds clash to list of clashes.
 
         Args:
             clash (Clash): Clash to be added.
+            notification_times (List[datetime], optional): Times of notifications.
+
+        Returns:
+            ObjectId: Id of the inserted clash.
         """
-        result = self.clashes.insert_one(asdict(clash))
+        result = self.clashes.insert_one(clash.as_dict())
         self.positions.insert_one({"clash_id": result.inserted_id, "players": []})
+        self.clash_guilds[result.inserted_id] = clash.guild_id
 
         if notification_times is None or not isinstance(notification_times, list):
-            return
+            return result.inserted_id
+
+        notifications = [
+            {
+                "clash_id": result.inserted_id,
+                "time": x,
+                "notified": False,
+            }
+            for x in notification_times
+        ]
+        # insert_many fills in _id of the documents
+        self.notifications.insert_many(notifications)
+        if self.notification_scheduler is not None:
+            self.notification_scheduler.schedule(notifications)
+        return result.inserted_id
 
-        self.notifications.insert_many(
-            [
-                {
-                    "clash_id": result.inserted_id,
-                    "time": x,
-                    "notified": False,
-                }
-                for x in notification_times
-            ]
-        )
+    def has_riot_clash(self, guild_id: int, riot_id: int) -> bool:
+        """Checks if a clash of Riot API was already added to a guild.
+
+        Args:
+            guild_id (int): Id of the guild.
+            riot_id (int): Id of the clash in Riot database.
+
+        Returns:
+            bool: True if the guild already has the clash.
+        """
+        query = {"guild_id": guild_id, "riot_id": riot_id}
+        return self.clashes.find_one(query, {"_id": 1}) is not None
 
     def remove_clash(self, clash_name: str, guild_id: int) -> Clash:
         """Removes clash with given name and returns it.
@@ -96,9 +202,122 @@ class ClashManager:
         )
         if result is None:
             return None
-        self.positions.delete_one({"clash_id": result["_id"]})
+        positions = self.positions.find_one_and_delete(
+            {"clash_id": result["_id"]}, POSITIONS_PROJECTION
+        )
+        if positions is not None and result["date"] < datetime.now():
+            self.attendance.record_completion(
+                guild_id, ClashPositions.from_document(positions)
+            )
+        self.clash_guilds.pop(result["_id"], None)
         self.notifications.delete_many({"clash_id": result["_id"]})
-        return from_dict(Clash, result)
+        if self.notification_scheduler is not None:
+            self.notification_scheduler.cancel(result["_id"])
+        return Clash.from_document(result)
+
+    def guild_for_clash(self, clash_id: ObjectId) -> Optional[int]:
+        """Gets id of the guild of a clash.
+
+        Args:
+            clash_id (ObjectId): Id of the clash.
+
+        Returns:
+            Optional[int]: Id of the guild or None if the clash does not exist.
+        """
+        if clash_id not in self.clash_guilds:
+            document = self.clashes.find_one({"_id": clash_id}, {"guild_id": 1})
+            if document is None:
+                return None
+            self.clash_guilds[clash_id] = document["guild_id"]
+        return self.clash_guilds[clash_id]
+
+    def record_registration(
+        self, clash_id: ObjectId, record: PositionRecord, change: int
+    ) -> None:
+        """Counts registration change of a clash to attendance of the player.
+        Changes of a clash removed meanwhile are not counted.
+
+        Args:
+            clash_id (ObjectId): Id of the clash.
+            record (PositionRecord): Registered or unregistered position.
+            change (int): 1 for registration, -1 for unregistration.
+        """
+        guild_id = self.guild_for_clash(clash_id)
+        if guild_id is not None:
+            self.attendance.record_registration(guild_id, record, change)
+
+    def get_attendance(self, guild_id: int, player_id: int) -> Optional[Attendance]:
+        """Gets attendance statistics of a player in a guild.
+
+        Args:
+            guild_id (int): Id of the guild.
+            player_id (int): Id of the player.
+
+        Returns:
+            Optional[Attendance]: Statistics or None if player never registered.
+        """
+        return self.attendance.get_attendance(guild_id, player_id)
+
+    def save_players(
+        self, clash_id: ObjectId, players: List[PositionRecord]
+    ) -> ClashPositions:
+        """Stores players registered to a clash.
+
+        Args:
+            clash_id (ObjectId): Id of the clash.
+            players (List[PositionRecord]): All registered players.
+
+        Returns:
+            ClashPositions: Positions after modification.
+        """
+        document = self.positions.find_one_and_update(
+            {"clash_id": clash_id},
+            {"$set": {"players": [x.as_dict() for x in players]}},
+            projection=POSITIONS_PROJECTION,
+            return_document=collection.ReturnDocument.AFTER,
+        )
+        if document is None:
+            # Clash was removed, nothing is stored
+            return ClashPositions(clash_id, [])
+        return ClashPositions.from_document(document)
+
+    def apply_position_changes(
+        self,
+        clash_id: ObjectId,
+        added: List[PositionRecord],
+        removed: List[Tuple[int, Position]],
+    ) -> ClashPositions:
+        """Adds and removes registrations of a clash, keeping the other
+        registrations of the current roster as they are.
+
+        Args:
+            clash_id (ObjectId): Id of the clash.
+            added (List[PositionRecord]): Registrations to add if missing.
+            removed (List[Tuple[int, Position]]): Player ids and positions to remove.
+
+        Returns:
+            ClashPositions: Positions after modification.
+        """
+        removed_keys = set(removed)
+        players = []
+        removed_records = []
+        for record in self.positions_for_clash(clash_id).players:
+            if (record.player_id, record.position) in removed_keys:
+                removed_records.append(record)
+            else:
+                players.append(record)
+        present = {(record.player_id, record.position) for record in players}
+        added_records = [
+            record
+            for record in added
+            if (record.player_id, record.position) not in present
+        ]
+        positions = self.save_players(clash_id, players + added_records)
+        for record in added_records:
+            self.record_registration(clash_id, record, 1)
+        for record in removed_records:
+            self.record_registration(clash_id, record, -1)
+        return positions
 
     def register_player(
         self, clash_id: int, player_id: int, player_name: str, team_role: Position
@@ -129,18 +348,11 @@ class ClashManager:
             self.logger.warning("This combination already exists. Skipping.")
             return existing_positions
 
-        existing_players.append(PositionRecord(player_id, player_name, team_role))
-        new_players = list(map(lambda x: x.as_dict(), existing_players))
-
-        return from_dict(
-            ClashPositions,
-            self.positions.find_one_and_update(
-                {"clash_id": clash_id},
-                {"$set": {"players": new_players}},
-                return_document=collection.ReturnDocument.AFTER,
-            ),
-            DACITE_POSITION_CONFIG,
-        )
+        record = PositionRecord(player_id, player_name, team_role)
+        existing_players.append(record)
+        positions = self.save_players(clash_id, existing_players)
+        self.record_registration(clash_id, record, 1)
+        return positions
 
     def unregister_player(
         self, clash_id: int, player_name: str, team_role: Position
@@ -171,17 +383,46 @@ class ClashManager:
             return existing_positions
 
         existing_players.remove(already_existing)
-        new_players = list(map(lambda x: x.as_dict(), existing_players))
-
-        return from_dict(
-            ClashPositions,
-            self.positions.find_one_and_update(
-                {"clash_id": clash_id},
-                {"$set": {"players": new_players}},
-                return_document=collection.ReturnDocument.AFTER,
-            ),
-            DACITE_POSITION_CONFIG,
-        )
+        positions = self.save_players(clash_id, existing_players)
+        self.record_registration(clash_id, already_existing, -1)
+        return positions
+
+    @staticmethod
+    def diff_clashes(
+        stored: List[Dict[str, Any]], confirmed_clashes: Dict[Any, ApiClash]
+    ) -> Tuple[List[ApiClash], List[Dict[str, Any]]]:
+        """Compares stored clash documents of one guild with confirmed clashes.
+        Clashes are matched by riot_id, stored clashes without it by name.
+
+        Args:
+            stored (List[Dict[str, Any]]): Stored clash documents of the guild.
+            confirmed_clashes (Dict[Any, ApiClash]): Confirmed clashes by their riot id.
+
+        Returns:
+            Tuple[List[ApiClash], List[Dict[str, Any]]]: Confirmed clashes that are
+            not stored and stored documents that are not confirmed.
+        """
+        confirmed_names = {c.name for c in confirmed_clashes.values()}
+        stored_ids = set()
+        stored_names = set()
+        surplus = []
+        for document in stored:
+            riot_id = document.get("riot_id")
+            if riot_id is not None:
+                stored_ids.add(riot_id)
+                if riot_id not in confirmed_clashes:
+                    surplus.append(document)
+            else:
+                stored_names.add(document["name"])
+                if document["name"] not in confirmed_names:
+                    surplus.append(document)
+
+        missing = [
+            clash
+            for riot_id, clash in confirmed_clashes.items()
+            if riot_id not in stored_ids and clash.name not in stored_names
+        ]
+        return (missing, surplus)
 
     def get_needed_changes(
         self, guild_id: int, confirmed_clashes: List[ApiClash]
@@ -197,35 +438,134 @@ class ClashManager:
             Tuple[List[ApiClash], List[Clash]]: List of not present clashes
             and a list of surplus clashes.
         """
-        missing_names = [c.name for c in confirmed_clashes]
-        surplus_clashes = []
-        all_clashes = self.clashes.find({"guild_id": guild_id})
-        for clash in all_clashes:
-            if clash["name"] in missing_names:
-                missing_names.remove(clash["name"])
-            else:
-                surplus_clashes.append(from_dict(Clash, clash))
-
-        missing_clashes = list(
-            filter(lambda c: c.name in missing_names, confirmed_clashes)
+        missing_clashes, surplus_clashes = self.diff_clashes(
+            list(self.clashes.find({"guild_id": guild_id})),
+            {c.id: c for c in confirmed_clashes},
         )
-        return (missing_clashes, surplus_clashes)
+        return (missing_clashes, [Clash.from_document(c) for c in surplus_clashes])
+
+    def get_all_needed_changes(
+        self, servers: Dict[int, str], clashes_by_region: Dict[str, List[ApiClash]]
+    ) -> Dict[int, ClashChanges]:
+        """Finds needed changes for all given guilds using a single projected query.
+        Guilds whose region is missing in clashes_by_region or that need
+        no changes are left out.
 
-    def register_server(self, server_id: int) -> bool:
+        Args:
+            servers (Dict[int, str]): Riot region of each guild to check.
+            clashes_by_region (Dict[str, List[ApiClash]]): Confirmed clashes of regions.
+
+        Returns:
+            Dict[int, ClashChanges]: Missing clashes and names of surplus clashes
+            for each guild that needs changes.
+        """
+        confirmed_by_region = {
+            region: {c.id: c for c in clashes}
+            for region, clashes in clashes_by_region.items()
+        }
+        guild_ids = [
+            guild_id
+            for guild_id, region in servers.items()
+            if region in confirmed_by_region
+        ]
+
+        stored_by_guild: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+        for document in self.clashes.find(
+            {"guild_id": {"$in": guild_ids}}, CLASH_DIFF_PROJECTION
+        ):
+            stored_by_guild[document["guild_id"]].append(document)
+
+        changes = {}
+        for guild_id in guild_ids:
+            missing, surplus = self.diff_clashes(
+                stored_by_guild.get(guild_id, []),
+                confirmed_by_region[servers[guild_id]],
+            )
+            if missing or surplus:
+                changes[guild_id] = ClashChanges(
+                    missing, [document["name"] for document in surplus]
+                )
+        return changes
+
+    def register_server(self, server_id: int, region: str = DEFAULT_REGION) -> bool:
         """Registers a server for clash updates.
 
         Args:
             server_id (int): Id of the server to receive updtes.
+            region (str, optional): Riot region of the server. Defaults to DEFAULT_REGION.
 
         Returns:
             bool: Success of the operation.
         """
         existing_server = self.registered_servers.find_one({"server_id": server_id})
         if existing_server is None:
-            self.registered_servers.insert_one({"server_id": server_id})
+            self.registered_servers.insert_one(
+                {"server_id": server_id, "region": region}
+            )
             return True
         return False
 
+    def set_server_region(self, server_id: int, region: str) -> bool:
+        """Changes Riot region from which a registered server receives clashes.
+
+        Args:
+            server_id (int): Id of the registered server.
+            region (str): Riot platform routing value.
+
+        Returns:
+            bool: Success of the operation.
+        """
+        result = self.registered_servers.update_one(
+            {"server_id": server_id}, {"$set": {"region": region}}
+        )
+        return result.matched_count > 0
+
+    def get_server_region(self, server_id: int) -> str:
+        """Gets Riot region of a server.
+
+        Args:
+            server_id (int): Id of the server.
+
+        Returns:
+            str: Riot platform routing value, DEFAULT_REGION if not set.
+        """
+        server = self.registered_servers.find_one({"server_id": server_id})
+        if server is None:
+            return DEFAULT_REGION
+        return server.get("region", DEFAULT_REGION)
+
+    def set_dm_reminders(self, server_id: int, enabled: bool) -> bool:
+        """Turns private reminders of unresponsive regular players on or off.
+
+        Args:
+            server_id (int): Id of the registered server.
+            enabled (bool): True if reminders should be sent.
+
+        Returns:
+            bool: Success of the operation.
+        """
+        result = self.registered_servers.update_one(
+            {"server_id": server_id}, {"$set": {"dm_reminders": enabled}}
+        )
+        return result.matched_count > 0
+
+    def get_dm_reminder_servers(self, server_ids: List[int]) -> Set[int]:
+        """Gets which of given servers want private reminders.
+
+        Args:
+            server_ids (List[int]): Ids of the servers.
+
+        Returns:
+            Set[int]: Ids of servers with reminders turned on.
+        """
+        return {
+            result["server_id"]
+            for result in self.registered_servers.find(
+                {"server_id": {"$in": server_ids}, "dm_reminders": True},
+                {"_id": 0, "server_id": 1},
+            )
+        }
+
     def unregister_server(self, server_id: int) -> bool:
         """Unregisters a server from clash updates.
 
@@ -246,36 +586,91 @@ class ClashManager:
         """
         return [result["server_id"] for result in self.registered_servers.find()]
 
-    def get_overdue_notifications(self) -> cursor.Cursor:
-        """Gets all unique Clash instances that have overdue notifications.
+    def get_registered_servers(self) -> Dict[int, str]:
+        """Gets all servers that are registered for clash updates with their regions.
 
         Returns:
-            cursor.Cursor: Cursor of clashes that have overdue notification.
+            Dict[int, str]: Riot region for each id of registered server.
         """
-        overdue_notifications = self.notifications.find(
-            {"time": {"$lt": datetime.now()}, "notified": False}
-        )
-        clashes = self.clashes.find(
-            {"_id": {"$in": overdue_notifications.distinct("clash_id")}}
-        )
-        ids = [notification["_id"] for notification in overdue_notifications]
-        self.notifications.update_many(
-            {"_id": {"$in": ids}}, {"$set": {"notified": True}}
-        )
-        return clashes
+        return {
+            result["server_id"]: result.get("region", DEFAULT_REGION)
+            for result in self.registered_servers.find()
+        }
+
+    def notification_fanout(self, clash_ids: List[ObjectId]) -> List[ClashNotification]:
+        """Loads clashes together with their rosters and active regular players
+        of their guilds in a single aggregation.
 
-    def update_notification_ids(
-        self, clash_id: int, notification_message_ids: List[int]
+        Args:
+            clash_ids (List[ObjectId]): Ids of the clashes to notify.
+
+        Returns:
+            List[ClashNotification]: Data needed to notify each existing clash.
+        """
+        pipeline = [
+            {"$match": {"_id": {"$in": clash_ids}}},
+            {
+                "$lookup": {
+                    "from": "positions",
+                    "localField": "_id",
+                    "foreignField": "clash_id",
+                    "pipeline": [{"$project": POSITIONS_PROJECTION}],
+                    "as": "positions",
+                }
+            },
+            {
+                "$lookup": {
+                    "from": "regular_players",
+                    "localField": "guild_id",
+                    "foreignField": "guild_id",
+                    "pipeline": [
+                        {"$match": {"active": True}},
+                        {"$project": {"_id": 0, "player_id": 1}},
+                    ],
+                    "as": "regular_players",
+                }
+            },
+        ]
+        notifications = []
+        for document in self.clashes.aggregate(pipeline):
+            positions = document.pop("positions")
+            regular_players = document.pop("regular_players")
+            players = (
+                ClashPositions.from_document(positions[0]).players
+                if positions
+                else []
+            )
+            notifications.append(
+                ClashNotification(
+                    document["_id"],
+                    Clash.from_document(document),
+                    players,
+                    [x["player_id"] for x in regular_players],
+                )
+            )
+        return notifications
+
+    def push_notification_ids(
+        self, notification_message_ids: Dict[ObjectId, int]
     ) -> None:
-        """Updates notification message ids array of a clash.
+        """Appends new notification message ids to more clashes in one bulk write.
+        Ids are pushed, so concurrent changes of the arrays are not overwritten.
 
         Args:
-            clash_id (int): Id of the clash to update.
-            notification_message_ids (List[int]): New list of notification message ids.
+            notification_message_ids (Dict[ObjectId, int]): Id of the new notification
+            message for each clash id.
         """
-        self.clashes.update_one(
-            {"_id": clash_id},
-            {"$set": {"notification_message_ids": notification_message_ids}},
+        if not notification_message_ids:
+            return
+        self.clashes.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": clash_id},
+                    {"$push": {"notification_message_ids": message_id}},
+                )
+                for clash_id, message_id in notification_message_ids.items()
+            ],
+            ordered=False,
         )
 
     def regular_players_for_guild(self, guild_id: int) -> List[int]:
@@ -292,6 +687,35 @@ class ClashManager:
             for x in self.regular_players.find({"guild_id": guild_id, "active": True})
         ]
 
+    def find_regular_player(
+        self, guild_id: int, player_id: int
+    ) -> Optional[RegularPlayer]:
+        """Finds regular player record of a player in a guild.
+
+        Args:
+            guild_id (int): Id of the guild.
+            player_id (int): Id of the player.
+
+        Returns:
+            Optional[RegularPlayer]: The record or None if the player was never regular.
+        """
+        current = self.regular_players.find_one(
+            {"player_id": player_id, "guild_id": guild_id}, {"_id": 0}
+        )
+        return RegularPlayer.from_document(current) if current is not None else None
+
+    def save_regular_player(self, player: RegularPlayer) -> None:
+        """Stores regular player record, creating it if it does not exist.
+
+        Args:
+            player (RegularPlayer): The record.
+        """
+        self.regular_players.update_one(
+            {"player_id": player.player_id, "guild_id": player.guild_id},
+            {"$set": player.as_dict()},
+            upsert=True,
+        )
+
     def register_regular_player(
         self,
         guild_id: int,
@@ -305,16 +729,12 @@ class ClashManager:
             guild_id (int): Id of the guild.
             player_id (int): Id of the player.
         """
-        current = self.regular_players.find_one(
-            {"player_id": player_id, "guild_id": guild_id}
-        )
+        current_regular = self.find_regular_player(guild_id, player_id)
 
-        if current is None:
-            new_regular = RegularPlayer(player_id, guild_id, True)
-            self.regular_players.insert_one(asdict(new_regular))
+        if current_regular is None:
+            self.save_regular_player(RegularPlayer(player_id, guild_id, True))
             return True
 
-        current_regular = from_dict(RegularPlayer, current)
         if current_regular.active is True:
             raise ValueError("The player is already active.")
         if current_regular.overruled == "member" and not self_managing:
@@ -333,10 +753,9 @@ class ClashManager:
             last_activated = "member"
         if privilaged_managing is True:
             last_activated = "server"
-        self.regular_players.find_one_and_update(
-            {"player_id": player_id, "guild_id": guild_id},
-            {"$set": {"active": True, "last_activated": last_activated}},
-        )
+        current_regular.active = True
+        current_regular.last_activated = last_activated
+        self.save_regular_player(current_regular)
         return True
 
     def unregister_regular_player(
@@ -355,14 +774,11 @@ class ClashManager:
         Exceptions:
 
         """
-        current = self.regular_players.find_one(
-            {"player_id": player_id, "guild_id": guild_id}
-        )
+        current_player = self.find_regular_player(guild_id, player_id)
 
-        if current is None:
+        if current_player is None:
             raise ValueError("The player is not regular in given server.")
 
-        current_player = from_dict(RegularPlayer, current)
         if current_player.active is not True:
             raise ValueError("The player is not currently active.")
         overrule = "none"
@@ -375,8 +791,8 @@ class ClashManager:
         else:
             final_overrule = "none"
 
-        self.regular_players.update_one(
-            {"player_id": player_id, "guild_id": guild_id},
-            {"$set": {"active": False, "overruled": final_overrule or "none"}},
-        )
+        current_player.active = False
+        current_player.overruled = final_overrule or "none"
+        self.save_regular_player(current_player)
         return True
+
@@ -0,0 +1,311 @@
+"""Module providing in-process scheduler firing clash notifications on time."""
+import asyncio
+from datetime import datetime, timedelta
+import heapq
+import logging
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from bson import ObjectId
+from pymongo import ReturnDocument, collection
+
+from mundobot import helpers
+
+# Heap entry of notification time, notification id and clash id
+ScheduledNotification = Tuple[datetime, ObjectId, ObjectId]
+# Longest sleep between checks, guards against clock changes on the host
+MAX_SLEEP = 60 * 60  # seconds
+# Sleep before next attempt when due notifications could not be fired
+RETRY_SLEEP = 1  # seconds
+# Delay before first resend of notifications that failed to send, doubled each time
+SEND_RETRY_DELAY = 10  # seconds
+MAX_SEND_RETRY_DELAY = 10 * 60  # seconds
+# Sleep while due notifications wait for the leader lease to be held again
+LEASE_WAIT_SLEEP = 30  # seconds
+
+
+class NotificationScheduler:
+    """Keeps pending notifications in a min-heap and sleeps until the next one is due.
+
+    Every due notification is claimed atomically in the database before it is sent,
+    so a notification is sent only once even if more schedulers are running.
+    Claims of notifications that failed to send are released and the notifications
+    are retried with exponential backoff.
+    Claims carry the fencing token of the leader lease. A new leader stamps pending
+    notifications with its token, so a claim of a previous leader is rejected.
+    """
+
+    def __init__(
+        self,
+        notifications: collection.Collection,
+        send: Callable[[List[ObjectId]], Awaitable[Set[ObjectId]]],
+        fencing_token: Optional[Callable[[], Optional[int]]] = None,
+    ) -> None:
+        """Prepares the scheduler.
+
+        Args:
+            notifications (collection.Collection): Collection of clash notifications.
+            send (Callable[[List[ObjectId]], Awaitable[Set[ObjectId]]]): Coroutine
+            sending notifications of clashes with given ids, returns ids of clashes
+            whose notification was not sent.
+            fencing_token (Optional[Callable[[], Optional[int]]]): Gets fencing token
+            of the held leader lease, nothing is claimed while it returns None.
+        """
+        self.notifications = notifications
+        self.send = send
+        self.fencing_token = fencing_token
+        self.heap: List[ScheduledNotification] = []
+        # Number of failed sends of each clash whose notifications are being retried
+        self.failures: Dict[ObjectId, int] = {}
+        self.wakeup = asyncio.Event()
+        # True while due notifications are not sent because the lease is not held
+        self.waiting_for_lease = False
+        self.task: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.logger = helpers.prepare_logging("ntf", logging.WARNING)
+
+    @property
+    def running(self) -> bool:
+        """True if the scheduling task is running."""
+        return self.task is not None and not self.task.done()
+
+    def read_pending(self) -> List[ScheduledNotification]:
+        """Fences pending notifications against claims of previous leaders
+        and reads them from the database.
+
+        Returns:
+            List[ScheduledNotification]: Heap entries of the pending notifications.
+        """
+        if self.fencing_token is not None:
+            token = self.fencing_token()
+            if token is not None:
+                self.notifications.update_many(
+                    {"notified": False}, {"$max": {"lease_token": token}}
+                )
+        return [
+            (document["time"], document["_id"], document["clash_id"])
+            for document in self.notifications.find(
+                {"notified": False}, {"time": 1, "clash_id": 1}
+            )
+        ]
+
+    async def load(self) -> None:
+        """Loads all pending notifications from the database into the heap.
+        Notifications scheduled meanwhile are kept."""
+        pending = await asyncio.to_thread(self.read_pending)
+        known = {entry[1] for entry in self.heap}
+        self.heap += [entry for entry in pending if entry[1] not in known]
+        heapq.heapify(self.heap)
+        self.wakeup.set()
+
+    def start(self) -> None:
+        """Starts the scheduling task, which first loads pending notifications."""
+        if self.running:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.create_task(self.run())
+
+    def stop(self) -> None:
+        """Stops the scheduling task."""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def call_in_loop(self, function: Callable[..., None], *args: Any) -> bool:
+        """Passes a call to the scheduler's loop when made from another thread,
+        e.g. from a database worker thread.
+
+        Args:
+            function (Callable[..., None]): Function to call.
+
+        Returns:
+            bool: True if the call was passed to the loop, False if it should run now.
+        """
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if self.loop is None or running_loop is self.loop or self.loop.is_closed():
+            return False
+        self.loop.call_soon_threadsafe(function, *args)
+        return True
+
+    def schedule(self, documents: Iterable[Dict[str, Any]]) -> None:
+        """Adds newly inserted notifications into the heap.
+
+        Args:
+            documents (Iterable[Dict[str, Any]]): Inserted notification documents.
+        """
+        documents = list(documents)
+        if self.call_in_loop(self.schedule, documents):
+            return
+        for document in documents:
+            heapq.heappush(
+                self.heap, (document["time"], document["_id"], document["clash_id"])
+            )
+        self.wakeup.set()
+
+    def cancel(self, clash_id: ObjectId) -> None:
+        """Removes all notifications of a clash from the heap.
+
+        Args:
+            clash_id (ObjectId): Id of the removed clash.
+        """
+        if self.call_in_loop(self.cancel, clash_id):
+            return
+        self.heap = [entry for entry in self.heap if entry[2] != clash_id]
+        self.failures.pop(clash_id, None)
+        heapq.heapify(self.heap)
+        self.wakeup.set()
+
+    def claim(self, notification_id: ObjectId, token: Optional[int] = None) -> bool:
+        """Atomically marks notification as notified.
+
+        Args:
+            notification_id (ObjectId): Id of the notification.
+            token (Optional[int]): Fencing token of the leader lease. The claim is
+            rejected if the notification was fenced with a newer one.
+
+        Returns:
+            bool: True if this call claimed it, False if it was already claimed, deleted
+            or fenced by a newer leader.
+        """
+        query: Dict[str, Any] = {"_id": notification_id, "notified": False}
+        update: Dict[str, Any] = {"notified": True}
+        if token is not None:
+            query["lease_token"] = {"$not": {"$gt": token}}
+            update["lease_token"] = token
+        return (
+            self.notifications.find_one_and_update(
+                query,
+                {"$set": update},
+                projection={"_id": 1},
+                return_document=ReturnDocument.BEFORE,
+            )
+            is not None
+        )
+
+    def release(
+        self, notification_ids: List[ObjectId], token: Optional[int] = None
+    ) -> None:
+        """Marks claimed notifications as not notified again, so they can be resent.
+
+        Args:
+            notification_ids (List[ObjectId]): Ids of the notifications.
+            token (Optional[int]): Fencing token used for the claims. Notifications
+            claimed by another leader since then are left as they are.
+        """
+        query: Dict[str, Any] = {"_id": {"$in": notification_ids}, "notified": True}
+        if token is not None:
+            query["lease_token"] = token
+        self.notifications.update_many(query, {"$set": {"notified": False}})
+
+    async def fire_due(self) -> None:
+        """Claims and sends all notifications that are due."""
+        now = datetime.now()
+        if not self.heap or self.heap[0][0] > now:
+            return
+        token = None
+        if self.fencing_token is not None:
+            token = self.fencing_token()
+            if token is None:
+                if not self.waiting_for_lease:
+                    self.logger.warning(
+                        "Lease is not held, due notifications are not sent."
+                    )
+                self.waiting_for_lease = True
+                return
+        self.waiting_for_lease = False
+        # More notifications of one clash due at once result in one message
+        due_clashes: Dict[ObjectId, List[ObjectId]] = {}
+        while self.heap and self.heap[0][0] <= now:
+            _, notification_id, clash_id = heapq.heappop(self.heap)
+            if await asyncio.to_thread(self.claim, notification_id, token):
+                due_clashes.setdefault(clash_id, []).append(notification_id)
+
+        if not due_clashes:
+            return
+        try:
+            failed = await self.send(list(due_clashes))
+        except Exception as error:  # pylint: disable=broad-except
+            self.logger.error(
+                "Sending notifications of clashes %s failed: %s",
+                list(due_clashes),
+                error,
+            )
+            failed = set(due_clashes)
+        if failed:
+            self.logger.warning("Notifications of clashes %s will be retried.", failed)
+            await self.retry_later(
+                {x: ids for x, ids in due_clashes.items() if x in failed}, token
+            )
+        for clash_id in due_clashes:
+            if clash_id not in failed:
+                self.failures.pop(clash_id, None)
+
+    async def retry_later(
+        self, due_clashes: Dict[ObjectId, List[ObjectId]], token: Optional[int]
+    ) -> None:
+        """Releases claims of notifications that failed to send and schedules them
+        again after a backoff growing with the number of failures of their clash.
+
+        Args:
+            due_clashes (Dict[ObjectId, List[ObjectId]]): Ids of claimed notifications
+            for each clash id.
+            token (Optional[int]): Fencing token used for the claims.
+        """
+        notification_ids = [x for ids in due_clashes.values() for x in ids]
+        try:
+            await asyncio.to_thread(self.release, notification_ids, token)
+        except Exception as error:  # pylint: disable=broad-except
+            self.logger.error(
+                "Releasing notifications of clashes %s failed, they are not resent: %s",
+                list(due_clashes),
+                error,
+            )
+            return
+        now = datetime.now()
+        for clash_id, ids in due_clashes.items():
+            failures = self.failures.get(clash_id, 0)
+            self.failures[clash_id] = failures + 1
+            delay = min(MAX_SEND_RETRY_DELAY, SEND_RETRY_DELAY * 2**failures)
+            for notification_id in ids:
+                heapq.heappush(
+                    self.heap,
+                    (now + timedelta(seconds=delay), notification_id, clash_id),
+                )
+
+    async def run(self) -> None:
+        """Sleeps until the next notification is due or the heap changes and fires it."""
+        while True:
+            try:
+                await self.load()
+                break
+            except Exception as error:  # pylint: disable=broad-except
+                self.logger.error("Loading notifications failed, will retry: %s", error)
+                await asyncio.sleep(SEND_RETRY_DELAY)
+        while True:
+            self.wakeup.clear()
+            await self.fire_due()
+            timeout = MAX_SLEEP
+            if self.waiting_for_lease:
+                timeout = LEASE_WAIT_SLEEP
+            elif self.heap:
+                timeout = min(
+                    MAX_SLEEP, (self.heap[0][0] - datetime.now()).total_seconds()
+                )
+                if timeout <= 0:
+                    timeout = RETRY_SLEEP
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), max(0.0, timeout))
+            except asyncio.TimeoutError:
+                pass
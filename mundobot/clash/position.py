@@ -2,12 +2,13 @@
 from __future__ import annotations
 import enum
 from functools import reduce
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 from dataclasses import dataclass
-from dacite.config import Config
 
 from bson import ObjectId
 
+POSITIONS_PROJECTION = {"_id": 0, "clash_id": 1, "players": 1}
+
 
 class Position(enum.Enum):
     """Enum class of positions in the clash."""
@@ -50,7 +51,7 @@ class Position(enum.Enum):
         return reduce(lambda acc, pos: acc + pos.value, Position, [])
 
 
-@dataclass
+@dataclass(slots=True)
 class PositionRecord:
     """Class used for storing individual player position records into DB."""
 
@@ -58,6 +59,22 @@ class PositionRecord:
     player_name: str
     position: Position
 
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> PositionRecord:
+        """Convertor from DB document.
+
+        Args:
+            document (Dict[str, Any]): Serialized PositionRecord.
+
+        Returns:
+            PositionRecord: Deserialized PositionRecord.
+        """
+        return cls(
+            document["player_id"],
+            document["player_name"],
+            Position[document["position"]],
+        )
+
     def as_dict(self) -> Dict:
         """Convertor to serialized format.
 
@@ -71,12 +88,24 @@ class PositionRecord:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class ClashPositions:
     """Class used for storing positions in clashes into DB."""
 
     clash_id: ObjectId
     players: List[PositionRecord]
 
+    @classmethod
+    def from_document(cls, document: Dict[str, Any]) -> ClashPositions:
+        """Convertor from DB document.
+
+        Args:
+            document (Dict[str, Any]): Positions document.
 
-DACITE_POSITION_CONFIG = Config(type_hooks={Position: lambda x: Position[x]})
+        Returns:
+            ClashPositions: Deserialized ClashPositions.
+        """
+        return cls(
+            document["clash_id"],
+            [PositionRecord.from_document(player) for player in document["players"]],
+        )
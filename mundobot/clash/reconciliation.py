@@ -0,0 +1,147 @@
+"""Module providing bounded concurrent reconciliation of clashes across guilds."""
+import asyncio
+from dataclasses import dataclass, field
+import logging
+import time
+from typing import Awaitable, Callable, Iterable, List, Optional
+
+from mundobot import helpers
+
+RECONCILIATION_CONCURRENCY = 5
+GUILD_TIMEOUT = 120  # seconds
+GUILD_RETRIES = 2
+RETRY_DELAY = 2  # seconds, doubled for every further attempt
+
+
+@dataclass
+class GuildResult:
+    """Outcome of reconciliation of a single guild."""
+
+    guild_id: int
+    duration: float = 0.0
+    attempts: int = 0
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        """True if the guild was reconciled without error."""
+        return self.error is None
+
+
+@dataclass
+class CycleReport:
+    """Report of one reconciliation cycle over all guilds."""
+
+    started: float = field(default_factory=time.time)
+    duration: float = 0.0
+    guilds: List[GuildResult] = field(default_factory=lambda: [])
+
+    @property
+    def failed(self) -> List[GuildResult]:
+        """Results of guilds that failed even after all retries."""
+        return [result for result in self.guilds if not result.success]
+
+    def summary(self) -> str:
+        """Creates human readable summary with duration of each guild.
+
+        Returns:
+            str: Multiline summary of the cycle.
+        """
+        lines = [
+            f"Reconciled {len(self.guilds)} guilds in {self.duration:.2f} s, "
+            + f"{len(self.failed)} failed."
+        ]
+        for result in sorted(self.guilds, key=lambda r: r.duration, reverse=True):
+            status = "ok" if result.success else f"error: {result.error}"
+            lines.append(
+                f"  {result.guild_id}: {result.duration:.2f} s, "
+                + f"{result.attempts} attempt(s), {status}"
+            )
+        return "\n".join(lines)
+
+
+class GuildReconciler:
+    """Runs a reconciliation coroutine for many guilds through a bounded worker pool.
+
+    Every guild has its own timeout and retries, so one slow or broken guild
+    neither delays the others nor ends the whole cycle.
+    A timed out worker is cancelled and run again, so steps of it that must not
+    be repeated have to be shielded from cancellation and checked before retry.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = RECONCILIATION_CONCURRENCY,
+        timeout: float = GUILD_TIMEOUT,
+        retries: int = GUILD_RETRIES,
+        retry_delay: float = RETRY_DELAY,
+    ) -> None:
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.logger = helpers.prepare_logging("rec", logging.WARNING)
+
+    async def reconcile_guild(
+        self, guild_id: int, worker: Callable[[int], Awaitable[None]]
+    ) -> GuildResult:
+        """Reconciles one guild with timeout and retries.
+
+        Args:
+            guild_id (int): Id of the guild.
+            worker (Callable[[int], Awaitable[None]]): Coroutine reconciling the guild.
+
+        Returns:
+            GuildResult: Outcome of the reconciliation.
+        """
+        result = GuildResult(guild_id)
+        start = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            result.attempts = attempt + 1
+            try:
+                await asyncio.wait_for(worker(guild_id), self.timeout)
+                result.error = None
+                break
+            except asyncio.TimeoutError:
+                result.error = f"timed out after {self.timeout} s"
+            except Exception as error:  # pylint: disable=broad-except
+                result.error = f"{type(error).__name__}: {error}"
+            self.logger.warning(
+                "Reconciliation of %s failed on attempt %d: %s",
+                guild_id,
+                result.attempts,
+                result.error,
+            )
+            if attempt < self.retries:
+                await asyncio.sleep(self.retry_delay * 2**attempt)
+        result.duration = time.perf_counter() - start
+        return result
+
+    async def run(
+        self, guild_ids: Iterable[int], worker: Callable[[int], Awaitable[None]]
+    ) -> CycleReport:
+        """Reconciles all guilds with at most `concurrency` guilds in progress.
+
+        Args:
+            guild_ids (Iterable[int]): Ids of the guilds to reconcile.
+            worker (Callable[[int], Awaitable[None]]): Coroutine reconciling one guild.
+
+        Returns:
+            CycleReport: Report with result and duration of each guild.
+        """
+        report = CycleReport()
+        start = time.perf_counter()
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for guild_id in guild_ids:
+            queue.put_nowait(guild_id)
+
+        async def consume() -> None:
+            while not queue.empty():
+                guild_id = queue.get_nowait()
+                report.guilds.append(await self.reconcile_guild(guild_id, worker))
+
+        await asyncio.gather(
+            *(consume() for _ in range(min(self.concurrency, queue.qsize())))
+        )
+        report.duration = time.perf_counter() - start
+        return report
@@ -0,0 +1,152 @@
+"""Module providing concurrent private reminders for regular players of clashes."""
+import asyncio
+from dataclasses import dataclass, field
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import discord as dc
+from pymongo import collection
+
+from mundobot import helpers
+from mundobot.rate_limit import RateLimiter
+
+REMINDER_CONCURRENCY = 10
+# Discord allows 50 requests per second globally, a DM may need two of them
+# (opening the DM channel and sending the message). Per-route limits and 429
+# responses are handled by discord.py itself.
+REMINDER_RATE_LIMITS = [(20, 1)]
+# Discord error code of a user who does not accept DMs from the bot
+CANNOT_MESSAGE_USER = 50007
+
+
+@dataclass
+class ReminderReport:
+    """Delivery results of one batch of reminders."""
+
+    sent: List[int] = field(default_factory=lambda: [])
+    opted_out: List[int] = field(default_factory=lambda: [])
+    closed: List[int] = field(default_factory=lambda: [])
+    failed: Dict[int, str] = field(default_factory=lambda: {})
+
+    def summary(self) -> str:
+        """Gets short human readable summary of the report."""
+        return (
+            f"Odesláno {len(self.sent)} připomínek, "
+            + f"{len(self.opted_out)} hráčů je nechce, "
+            + f"{len(self.closed)} má zavřené soukromé zprávy "
+            + f"a {len(self.failed)} selhalo."
+        )
+
+
+class DmReminder:
+    """Sends reminders to many players at once within Discord rate limits.
+
+    Players who opted out are kept in the database and cached in memory.
+    Players who do not accept DMs are cached for the lifetime of the process,
+    so they do not cost a failing request on every notification.
+    """
+
+    def __init__(
+        self,
+        opt_outs: collection.Collection,
+        concurrency: int = REMINDER_CONCURRENCY,
+        limits: Optional[List[Tuple[int, float]]] = None,
+    ) -> None:
+        self.opt_outs = opt_outs
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(limits or REMINDER_RATE_LIMITS)
+        self.opted_out: Optional[Set[int]] = None
+        self.closed: Set[int] = set()
+        self.logger = helpers.prepare_logging("rmd", logging.WARNING)
+
+    def load_opt_outs(self) -> Set[int]:
+        """Gets ids of players who opted out, loading them on first use.
+
+        Returns:
+            Set[int]: Ids of players who do not want reminders.
+        """
+        if self.opted_out is None:
+            self.opted_out = {
+                document["player_id"]
+                for document in self.opt_outs.find({}, {"_id": 0, "player_id": 1})
+            }
+        return self.opted_out
+
+    def set_opt_out(self, player_id: int, opted_out: bool) -> None:
+        """Stores whether a player wants to receive reminders.
+
+        Args:
+            player_id (int): Id of the player.
+            opted_out (bool): True if the player does not want reminders.
+        """
+        if opted_out:
+            self.opt_outs.update_one(
+                {"player_id": player_id},
+                {"$set": {"player_id": player_id}},
+                upsert=True,
+            )
+            self.load_opt_outs().add(player_id)
+        else:
+            self.opt_outs.delete_one({"player_id": player_id})
+            self.load_opt_outs().discard(player_id)
+        # Player changing the setting can evidently be messaged again
+        self.closed.discard(player_id)
+
+    async def send_one(
+        self, client: dc.Client, player_id: int, text: str, report: ReminderReport
+    ) -> None:
+        """Sends reminder to one player and records the result in the report.
+
+        Args:
+            client (dc.Client): Client used for sending.
+            player_id (int): Id of the player.
+            text (str): Text of the reminder.
+            report (ReminderReport): Report of the batch.
+        """
+        await self.limiter.acquire()
+        try:
+            user = client.get_user(player_id) or await client.fetch_user(player_id)
+            await user.send(text)
+            report.sent.append(player_id)
+        except dc.Forbidden as error:
+            if error.code == CANNOT_MESSAGE_USER:
+                self.closed.add(player_id)
+                report.closed.append(player_id)
+            else:
+                report.failed[player_id] = str(error)
+        except dc.HTTPException as error:
+            report.failed[player_id] = str(error)
+
+    async def send(
+        self, client: dc.Client, reminders: Iterable[Tuple[int, str]]
+    ) -> ReminderReport:
+        """Sends reminders concurrently, skipping players who opted out.
+
+        Args:
+            client (dc.Client): Client used for sending.
+            reminders (Iterable[Tuple[int, str]]): Pairs of player id and text.
+
+        Returns:
+            ReminderReport: Delivery results.
+        """
+        report = ReminderReport()
+        opted_out = await asyncio.to_thread(self.load_opt_outs)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(player_id: int, text: str) -> None:
+            async with semaphore:
+                await self.send_one(client, player_id, text, report)
+
+        tasks = []
+        for player_id, text in reminders:
+            if player_id in opted_out:
+                report.opted_out.append(player_id)
+            elif player_id in self.closed:
+                report.closed.append(player_id)
+            else:
+                tasks.append(bounded(player_id, text))
+        await asyncio.gather(*tasks)
+
+        if report.failed:
+            self.logger.warning("Reminders failed: %s", report.failed)
+        return report
@@ -0,0 +1,363 @@
+"""Module providing ClashManager keeping its state in memory and writing it to MongoDB later."""
+import asyncio
+import dataclasses
+import os
+from pathlib import Path
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId, json_util
+from pymongo import MongoClient, UpdateOne
+
+from mundobot.clash.attendance import Attendance
+from mundobot.clash.clash import RegularPlayer
+from mundobot.clash.clashmanager import ClashManager, ClashNotification
+from mundobot.clash.position import (
+    POSITIONS_PROJECTION,
+    ClashPositions,
+    PositionRecord,
+)
+
+FLUSH_INTERVAL = 5  # seconds, upper bound of delay before a change reaches MongoDB
+MAX_PENDING = 500  # number of pending writes that triggers flush right away
+
+
+class WriteBehindClashManager(ClashManager):
+    """ClashManager holding positions, regular players and registration counts
+    of attendance rollups in memory.
+
+    Changes are applied in memory and returned immediately. They are written to
+    MongoDB in ordered batches at most FLUSH_INTERVAL seconds later. Every change
+    is first appended to a journal on local disk and synced, the journal is replayed
+    on startup, so pending changes survive a crash of the bot or of the machine.
+
+    All writes are idempotent $set updates of the same fields of a document each
+    time, so replaying the journal or coalescing more changes of one document is safe.
+
+    Methods are called from threads of AsyncClashRepository. The caches are guarded
+    by a lock and callers get copies of cached records, which they may modify.
+    """
+
+    def __init__(self, client: MongoClient, journal_path: str):
+        super().__init__(client)
+        self.journal_path = Path(journal_path)
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self.positions_cache: Dict[ObjectId, ClashPositions] = {}
+        self.regular_players_cache: Dict[int, Dict[int, RegularPlayer]] = {}
+        # Registrations to each position of a player in a guild
+        self.attendance_cache: Dict[Tuple[int, int], Dict[str, int]] = {}
+        self.pending: List[Dict[str, Any]] = []
+        # Guards pending writes and the journal
+        self.lock = threading.Lock()
+        # Guards the caches, never held while waiting for the database
+        self.cache_lock = threading.Lock()
+        # Keeps batches in order when flushed both from the loop and the flusher
+        self.flush_lock = threading.Lock()
+        self.flush_needed = asyncio.Event()
+        self.flush_task: Optional[asyncio.Task] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self.journal = None
+        self.recover()
+        if self.journal is None:
+            self.journal = open(self.journal_path, "a", encoding="utf-8")
+
+    # -----------------------------------------------------
+    # JOURNAL AND FLUSHING
+    # -----------------------------------------------------
+    def recover(self) -> None:
+        """Writes changes left in the journal by a previous run to MongoDB."""
+        if not self.journal_path.exists():
+            return
+        with open(self.journal_path, encoding="utf-8") as journal:
+            self.pending = [json_util.loads(line) for line in journal if line.strip()]
+        if self.pending:
+            self.logger.warning("Recovering %d journaled writes.", len(self.pending))
+        try:
+            self.flush()
+        except Exception as error:  # pylint: disable=broad-except
+            # Writes stay pending and journaled until the periodic flush succeeds
+            self.logger.error("Recovery flush failed, will retry: %s", error)
+
+    def enqueue(
+        self,
+        collection_name: str,
+        query: Dict[str, Any],
+        update: Dict[str, Any],
+        upsert: bool = False,
+    ) -> None:
+        """Journals a write and queues it for the next flush. The journal is synced
+        to disk before the write is queued, so it survives a crash of the machine.
+
+        Args:
+            collection_name (str): Name of the collection in clash database.
+            query (Dict[str, Any]): Filter of the updated document.
+            update (Dict[str, Any]): Fields set on the document.
+            upsert (bool, optional): Create the document if it does not exist.
+            Defaults to False, so writes of removed clashes do not recreate them.
+        """
+        operation = {
+            "collection": collection_name,
+            "filter": query,
+            "set": update,
+            "upsert": upsert,
+        }
+        with self.lock:
+            self.journal.write(json_util.dumps(operation) + "\n")
+            self.journal.flush()
+            os.fsync(self.journal.fileno())
+            self.pending.append(operation)
+            pending_count = len(self.pending)
+        if pending_count >= MAX_PENDING and self.loop is not None:
+            # Writes come from worker threads, the event belongs to the loop
+            self.loop.call_soon_threadsafe(self.flush_needed.set)
+
+    def flush(
+        self, selected: Optional[Callable[[Dict[str, Any]], bool]] = None
+    ) -> None:
+        """Writes pending changes to MongoDB in ordered batches per collection
+        and removes them from the journal.
+
+        Args:
+            selected (Optional[Callable[[Dict[str, Any]], bool]], optional): Selects
+            pending writes to flush, it has to select either all writes of a document
+            or none of them. Defaults to None, which flushes all pending writes.
+        """
+        with self.flush_lock:
+            with self.lock:
+                if selected is None:
+                    operations, self.pending = self.pending, []
+                else:
+                    operations = [x for x in self.pending if selected(x)]
+                    self.pending = [x for x in self.pending if not selected(x)]
+            if not operations:
+                return
+
+            # Later changes of a document replace earlier ones as they set all fields
+            batches: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for operation in operations:
+                batch = batches.setdefault(operation["collection"], {})
+                key = json_util.dumps(operation["filter"], sort_keys=True)
+                batch.pop(key, None)
+                batch[key] = operation
+
+            try:
+                for collection_name, batch in batches.items():
+                    self.client.clash[collection_name].bulk_write(
+                        [
+                            UpdateOne(
+                                x["filter"], {"$set": x["set"]}, upsert=x["upsert"]
+                            )
+                            for x in batch.values()
+                        ],
+                        ordered=True,
+                    )
+            except Exception:
+                with self.lock:
+                    self.pending = operations + self.pending
+                raise
+
+            with self.lock:
+                self.rewrite_journal()
+
+    def rewrite_journal(self) -> None:
+        """Replaces the journal by writes that are still pending. Must hold the lock."""
+        temporary_path = self.journal_path.with_suffix(".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as journal:
+            for operation in self.pending:
+                journal.write(json_util.dumps(operation) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        if self.journal is not None:
+            self.journal.close()
+        os.replace(temporary_path, self.journal_path)
+        self.journal = open(self.journal_path, "a", encoding="utf-8")
+
+    async def run_flushing(self) -> None:
+        """Flushes pending changes every FLUSH_INTERVAL or when too many are pending."""
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_needed.wait(), FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_needed.clear()
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as error:  # pylint: disable=broad-except
+                self.logger.error("Flush failed, will retry: %s", error)
+
+    def start(self) -> None:
+        """Starts periodic flushing."""
+        if self.flush_task is None or self.flush_task.done():
+            self.loop = asyncio.get_running_loop()
+            self.flush_task = asyncio.create_task(self.run_flushing())
+
+    def stop(self) -> None:
+        """Stops periodic flushing and writes out everything that is pending."""
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        self.flush()
+
+    # -----------------------------------------------------
+    # IN MEMORY STATE
+    # -----------------------------------------------------
+    @staticmethod
+    def copy_positions(positions: ClashPositions) -> ClashPositions:
+        """Copies cached positions, so that callers can modify the list of players."""
+        return ClashPositions(positions.clash_id, list(positions.players))
+
+    def positions_for_clash(self, clash_id: int) -> ClashPositions:
+        with self.cache_lock:
+            cached = self.positions_cache.get(clash_id)
+        if cached is None:
+            document = self.positions.find_one(
+                {"clash_id": clash_id}, POSITIONS_PROJECTION
+            )
+            if document is None:
+                # Removed clash is not cached, so its positions are not written again
+                return ClashPositions(clash_id, [])
+            with self.cache_lock:
+                cached = self.positions_cache.setdefault(
+                    clash_id, ClashPositions.from_document(document)
+                )
+        return self.copy_positions(cached)
+
+    def save_players(
+        self, clash_id: ObjectId, players: List[PositionRecord]
+    ) -> ClashPositions:
+        positions = ClashPositions(clash_id, list(players))
+        # Cache and journal change together, so their order is the same
+        with self.cache_lock:
+            if clash_id not in self.positions_cache:
+                # Clash was removed after its positions were read
+                return ClashPositions(clash_id, [])
+            self.positions_cache[clash_id] = positions
+            self.enqueue(
+                "positions",
+                {"clash_id": clash_id},
+                {"players": [x.as_dict() for x in players]},
+            )
+        return self.copy_positions(positions)
+
+    def positions_for_clashes(
+        self, clash_ids: List[ObjectId]
+    ) -> Dict[ObjectId, ClashPositions]:
+        with self.cache_lock:
+            missing = [x for x in clash_ids if x not in self.positions_cache]
+        loaded = super().positions_for_clashes(missing) if missing else {}
+        with self.cache_lock:
+            for clash_id, positions in loaded.items():
+                self.positions_cache.setdefault(clash_id, positions)
+            return {
+                x: self.copy_positions(self.positions_cache[x])
+                for x in clash_ids
+                if x in self.positions_cache
+            }
+
+    def remove_clash(self, clash_name: str, guild_id: int):
+        # Pending writes of removed positions must not recreate them
+        self.flush()
+        clash = self.clashes.find_one({"name": clash_name, "guild_id": guild_id})
+        if clash is not None:
+            with self.cache_lock:
+                self.positions_cache.pop(clash["_id"], None)
+        return super().remove_clash(clash_name, guild_id)
+
+    def record_registration(
+        self, clash_id: ObjectId, record: PositionRecord, change: int
+    ) -> None:
+        guild_id = self.guild_for_clash(clash_id)
+        if guild_id is None:
+            return
+        key = (guild_id, record.player_id)
+        with self.cache_lock:
+            positions = self.attendance_cache.get(key)
+        if positions is None:
+            document = self.attendance.attendance.find_one(
+                {"guild_id": guild_id, "player_id": record.player_id},
+                {"_id": 0, "positions": 1},
+            )
+            loaded = dict(document.get("positions", {})) if document else {}
+            with self.cache_lock:
+                positions = self.attendance_cache.setdefault(key, loaded)
+        # Whole map of positions is set, so the write is idempotent like the others,
+        # counters of completed clashes are incremented by remove_clash directly
+        with self.cache_lock:
+            position = str(record.position)
+            positions[position] = positions.get(position, 0) + change
+            self.enqueue(
+                "attendance",
+                {"guild_id": guild_id, "player_id": record.player_id},
+                {"player_name": record.player_name, "positions": dict(positions)},
+                upsert=True,
+            )
+
+    def get_attendance(self, guild_id: int, player_id: int) -> Optional[Attendance]:
+        # Rollups are read from MongoDB, so pending writes of this one are flushed
+        query = {"guild_id": guild_id, "player_id": player_id}
+        self.flush(lambda x: x["collection"] == "attendance" and x["filter"] == query)
+        return super().get_attendance(guild_id, player_id)
+
+    def guild_regular_players(self, guild_id: int) -> Dict[int, RegularPlayer]:
+        """Gets in memory regular player records of a guild, loading them on first use.
+        The records are shared, they have to be read and changed under cache_lock.
+
+        Args:
+            guild_id (int): Id of the guild.
+
+        Returns:
+            Dict[int, RegularPlayer]: Record for each player id.
+        """
+        with self.cache_lock:
+            players = self.regular_players_cache.get(guild_id)
+        if players is None:
+            loaded = {
+                document["player_id"]: RegularPlayer.from_document(document)
+                for document in self.regular_players.find(
+                    {"guild_id": guild_id}, {"_id": 0}
+                )
+            }
+            with self.cache_lock:
+                players = self.regular_players_cache.setdefault(guild_id, loaded)
+        return players
+
+    def regular_players_for_guild(self, guild_id: int) -> List[int]:
+        players = self.guild_regular_players(guild_id)
+        with self.cache_lock:
+            return [player.player_id for player in players.values() if player.active]
+
+    def find_regular_player(
+        self, guild_id: int, player_id: int
+    ) -> Optional[RegularPlayer]:
+        players = self.guild_regular_players(guild_id)
+        with self.cache_lock:
+            player = players.get(player_id)
+        return dataclasses.replace(player) if player is not None else None
+
+    def save_regular_player(self, player: RegularPlayer) -> None:
+        players = self.guild_regular_players(player.guild_id)
+        with self.cache_lock:
+            players[player.player_id] = dataclasses.replace(player)
+            self.enqueue(
+                "regular_players",
+                {"player_id": player.player_id, "guild_id": player.guild_id},
+                player.as_dict(),
+                upsert=True,
+            )
+
+    def notification_fanout(self, clash_ids: List[ObjectId]) -> List[ClashNotification]:
+        # The aggregation reads rosters and regular players from MongoDB,
+        # so pending writes of the notified clashes and their guilds are flushed
+        notified = set(clash_ids)
+        guild_ids = {self.guild_for_clash(x) for x in notified}
+
+        def selected(operation: Dict[str, Any]) -> bool:
+            if operation["collection"] == "positions":
+                return operation["filter"]["clash_id"] in notified
+            if operation["collection"] == "regular_players":
+                return operation["filter"]["guild_id"] in guild_ids
+            return False
+
+        self.flush(selected)
+        return super().notification_fanout(clash_ids)
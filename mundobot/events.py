@@ -0,0 +1,115 @@
+"""Module providing fan-out of live per-guild events to subscribers like web clients."""
+import asyncio
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Set
+
+SUBSCRIBER_BUFFER = 100  # events kept for a subscriber that does not keep up
+
+
+class Subscription:
+    """Bounded buffer of events of one guild for one subscriber.
+
+    When the buffer is full the oldest event is dropped, so a slow subscriber
+    costs at most SUBSCRIBER_BUFFER events of memory and never slows publishing.
+    """
+
+    def __init__(self, hub: "EventHub", guild_id: int, max_size: int) -> None:
+        self.hub = hub
+        self.guild_id = guild_id
+        self.buffer: Deque[Dict[str, Any]] = deque(maxlen=max_size)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+    def push(self, event: Dict[str, Any]) -> None:
+        """Adds event to the buffer, dropping the oldest one if it is full.
+
+        Args:
+            event (Dict[str, Any]): Published event.
+        """
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(event)
+        self.ready.set()
+
+    async def get(self) -> Dict[str, Any]:
+        """Waits for the oldest buffered event and removes it from the buffer.
+
+        Returns:
+            Dict[str, Any]: The event.
+        """
+        while not self.buffer:
+            self.ready.clear()
+            await self.ready.wait()
+        return self.buffer.popleft()
+
+    def close(self) -> None:
+        """Stops receiving events."""
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    """Publishes events of a guild to all of its subscribers.
+
+    Publishing never waits, it only appends to the buffers of subscribers.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, buffer_size: int = SUBSCRIBER_BUFFER) -> None:
+        self.buffer_size = buffer_size
+        self.subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+        # Receive events of all guilds, e.g. to forward them to other processes
+        self.listeners: List[Callable[[int, Dict[str, Any]], None]] = []
+
+    def subscribe(self, guild_id: int) -> Subscription:
+        """Creates subscription to events of a guild.
+
+        Args:
+            guild_id (int): Id of the guild.
+
+        Returns:
+            Subscription: New subscription, it has to be closed when not needed.
+        """
+        subscription = Subscription(self, guild_id, self.buffer_size)
+        self.subscribers[guild_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Removes subscription from the hub.
+
+        Args:
+            subscription (Subscription): Subscription to remove.
+        """
+        subscribers = self.subscribers.get(subscription.guild_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self.subscribers[subscription.guild_id]
+
+    def publish(self, guild_id: int, event_type: str, **data: Any) -> None:
+        """Publishes event to all subscribers of a guild.
+
+        Args:
+            guild_id (int): Id of the guild.
+            event_type (str): Type of the event, e.g. enqueue or registration.
+            data (Any): JSON serializable content of the event.
+        """
+        if not self.subscribers.get(guild_id) and not self.listeners:
+            return
+        self.dispatch(
+            guild_id,
+            {"type": event_type, "time": datetime.now().isoformat(), **data},
+        )
+
+    def dispatch(self, guild_id: int, event: Dict[str, Any]) -> None:
+        """Passes already created event to listeners and subscribers of a guild.
+
+        Args:
+            guild_id (int): Id of the guild.
+            event (Dict[str, Any]): The event.
+        """
+        for listener in self.listeners:
+            listener(guild_id, event)
+        for subscription in self.subscribers.get(guild_id, ()):
+            subscription.push(event)
@@ -0,0 +1,171 @@
+"""Module declaring indexes of all collections queried by the bot."""
+from collections import namedtuple
+import logging
+from typing import Any, Dict, List
+
+import dotenv
+from pymongo import ASCENDING, MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+from mundobot import helpers
+
+IndexSpec = namedtuple("IndexSpec", "database collection keys unique")
+# Hot query of a collection in form of a filter, used to check index usage
+HotQuery = namedtuple("HotQuery", "database collection filter")
+
+INDEXES: List[IndexSpec] = [
+    # clashes_for_guild, remove_clash, get_needed_changes
+    IndexSpec("clash", "clashes", [("guild_id", ASCENDING), ("name", ASCENDING)], False),
+    # has_riot_clash, clashes created from confirmed Riot clashes
+    IndexSpec(
+        "clash", "clashes", [("guild_id", ASCENDING), ("riot_id", ASCENDING)], False
+    ),
+    # clash_for_message, reaction handlers
+    IndexSpec(
+        "clash",
+        "clashes",
+        [
+            ("guild_id", ASCENDING),
+            ("clash_channel_id", ASCENDING),
+            ("message_id", ASCENDING),
+        ],
+        False,
+    ),
+    # positions_for_clash, register_player, one positions document per clash
+    IndexSpec("clash", "positions", [("clash_id", ASCENDING)], True),
+    # NotificationScheduler.load, pending notifications ordered by time
+    IndexSpec(
+        "clash", "notifications", [("notified", ASCENDING), ("time", ASCENDING)], False
+    ),
+    # remove_clash
+    IndexSpec("clash", "notifications", [("clash_id", ASCENDING)], False),
+    # register_server, get_server_region
+    IndexSpec("clash", "registered_servers", [("server_id", ASCENDING)], True),
+    # register_regular_player, unregister_regular_player
+    IndexSpec(
+        "clash",
+        "regular_players",
+        [("guild_id", ASCENDING), ("player_id", ASCENDING)],
+        True,
+    ),
+    # regular_players_for_guild, covered by the index
+    IndexSpec(
+        "clash",
+        "regular_players",
+        [("guild_id", ASCENDING), ("active", ASCENDING), ("player_id", ASCENDING)],
+        False,
+    ),
+    # attendance rollups, one document per player of a guild
+    IndexSpec(
+        "clash", "attendance", [("guild_id", ASCENDING), ("player_id", ASCENDING)], True
+    ),
+    # DmReminder opt outs, one document per player
+    IndexSpec("clash", "reminder_opt_outs", [("player_id", ASCENDING)], True),
+    # find_sound, save_to_database, delete_sound, list_sounds_for_guild
+    IndexSpec(
+        "bot", "sounds_data", [("guild_id", ASCENDING), ("name", ASCENDING)], True
+    ),
+]
+
+HOT_QUERIES: List[HotQuery] = [
+    HotQuery("clash", "clashes", {"guild_id": 0}),
+    HotQuery("clash", "clashes", {"name": "", "guild_id": 0}),
+    HotQuery("clash", "clashes", {"guild_id": 0, "riot_id": 0}),
+    HotQuery(
+        "clash",
+        "clashes",
+        {"guild_id": 0, "clash_channel_id": 0, "message_id": 0},
+    ),
+    HotQuery("clash", "positions", {"clash_id": None}),
+    HotQuery("clash", "notifications", {"notified": False}),
+    HotQuery("clash", "notifications", {"clash_id": None}),
+    HotQuery("clash", "registered_servers", {"server_id": 0}),
+    HotQuery("clash", "regular_players", {"guild_id": 0, "player_id": 0}),
+    HotQuery("clash", "regular_players", {"guild_id": 0, "active": True}),
+    HotQuery("clash", "attendance", {"guild_id": 0, "player_id": 0}),
+    HotQuery("bot", "sounds_data", {"guild_id": 0, "name": ""}),
+    HotQuery("bot", "sounds_data", {"guild_id": 0}),
+]
+
+logger = helpers.prepare_logging("idx", logging.WARNING)
+
+
+def ensure_indexes(client: MongoClient) -> List[str]:
+    """Creates all declared indexes. Already existing indexes are left untouched,
+    so it is safe to call on every startup. Errors are logged, not raised,
+    so an unreachable database does not stop the bot from starting.
+
+    Args:
+        client (MongoClient): Client of the used mongodb.
+
+    Returns:
+        List[str]: Names of the ensured indexes.
+    """
+    names = []
+    for spec in INDEXES:
+        try:
+            names.append(
+                client[spec.database][spec.collection].create_index(
+                    spec.keys, unique=spec.unique
+                )
+            )
+        except OperationFailure as error:
+            # Most likely existing duplicates prevent creation of a unique index
+            logger.error(
+                "Index %s on %s.%s could not be created: %s",
+                spec.keys,
+                spec.database,
+                spec.collection,
+                error,
+            )
+        except PyMongoError as error:
+            # Server is not reachable, the remaining indexes would fail the same way
+            logger.error("Indexes could not be ensured: %s", error)
+            break
+    return names
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Gets names of all stages of a query plan."""
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+def find_collection_scans(client: MongoClient) -> List[HotQuery]:
+    """Explains all hot queries and finds those that fall back to a collection scan.
+    Plans of empty collections say nothing about index usage, so they are reported
+    in the log and the check is meaningful only on populated collections.
+
+    Args:
+        client (MongoClient): Client of the used mongodb.
+
+    Returns:
+        List[HotQuery]: Hot queries whose winning plan contains COLLSCAN.
+    """
+    scans = []
+    for query in HOT_QUERIES:
+        queried = client[query.database][query.collection]
+        if queried.estimated_document_count() == 0:
+            logger.warning(
+                "%s.%s is empty, its plan is not checked.",
+                query.database,
+                query.collection,
+            )
+        explanation = queried.find(query.filter).explain()
+        winning_plan = explanation["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            scans.append(query)
+    return scans
+
+
+if __name__ == "__main__":
+    dotenv.load_dotenv()
+    mongo_client = MongoClient(helpers.get_connection_string())
+    print(ensure_indexes(mongo_client))
+    for scan in find_collection_scans(mongo_client):
+        print("COLLSCAN:", scan)
@@ -0,0 +1,257 @@
+"""Module providing request/response IPC over a Unix socket between the bot and API processes.
+
+Every message is a frame of 4 byte big endian length followed by compact JSON.
+Requests are {"id", "method", "params"}, responses {"id", "result"} or
+{"id", "error"} and pushed events {"event", "guild_id"}.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import struct
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from mundobot import helpers
+
+HEADER = struct.Struct(">I")
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+# Events are dropped for a connection that has this many bytes not yet sent
+MAX_EVENT_BACKLOG = 1024 * 1024
+CALL_TIMEOUT = 30  # seconds
+
+
+class IpcError(Exception):
+    """Error returned by the remote handler.
+
+    Attributes:
+        data (Dict[str, Any]): Error description sent by the server.
+    """
+
+    def __init__(self, data: Dict[str, Any]) -> None:
+        super().__init__(data.get("detail", "IPC call failed"))
+        self.data = data
+
+
+def encode(message: Dict[str, Any]) -> bytes:
+    """Encodes message into a frame.
+
+    Args:
+        message (Dict[str, Any]): JSON serializable message.
+
+    Returns:
+        bytes: Frame with length header.
+    """
+    payload = json.dumps(message, separators=(",", ":")).encode()
+    return HEADER.pack(len(payload)) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    """Reads one frame.
+
+    Args:
+        reader (asyncio.StreamReader): Reader of the connection.
+
+    Raises:
+        asyncio.IncompleteReadError: If the connection was closed.
+        ValueError: If the frame is larger than MAX_FRAME_SIZE.
+
+    Returns:
+        Dict[str, Any]: Decoded message.
+    """
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {length} bytes is too large.")
+    return json.loads(await reader.readexactly(length))
+
+
+Handler = Callable[..., Awaitable[Any]]
+# Converts exception of a handler to error sent to the client, None to re-raise it
+ErrorMapper = Callable[[Exception], Optional[Dict[str, Any]]]
+
+
+class IpcServer:
+    """Serves calls of registered handlers and pushes events to subscribed clients."""
+
+    def __init__(
+        self,
+        path: str,
+        handlers: Dict[str, Handler],
+        error_mapper: Optional[ErrorMapper] = None,
+    ) -> None:
+        self.path = path
+        self.handlers = handlers
+        self.error_mapper = error_mapper
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.subscribers: Set[asyncio.StreamWriter] = set()
+        self.logger = helpers.prepare_logging("ipc", logging.WARNING)
+
+    async def start(self) -> None:
+        """Starts listening on the socket, replacing a stale one."""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(self.handle_connection, self.path)
+
+    def close(self) -> None:
+        """Stops listening."""
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+
+    def push_event(self, guild_id: int, event: Dict[str, Any]) -> None:
+        """Pushes event to all clients that subscribed to events.
+
+        Args:
+            guild_id (int): Id of the guild of the event.
+            event (Dict[str, Any]): The event.
+        """
+        frame = encode({"event": event, "guild_id": guild_id})
+        for writer in list(self.subscribers):
+            if writer.is_closing():
+                self.subscribers.discard(writer)
+            elif writer.transport.get_write_buffer_size() < MAX_EVENT_BACKLOG:
+                writer.write(frame)
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Reads requests of one client and answers them concurrently."""
+        tasks: Set[asyncio.Task] = set()
+        try:
+            while True:
+                request = await read_frame(reader)
+                if (
+                    not isinstance(request, dict)
+                    or not isinstance(request.get("id"), int)
+                    or not isinstance(request.get("method"), str)
+                ):
+                    raise ValueError(f"Malformed request {request}.")
+                if request["method"] == "subscribe_events":
+                    self.subscribers.add(writer)
+                    writer.write(encode({"id": request["id"], "result": True}))
+                    continue
+                task = asyncio.create_task(self.answer(request, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ValueError as error:
+            self.logger.error("Closing IPC connection: %s", error)
+        finally:
+            self.subscribers.discard(writer)
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    async def answer(self, request: Dict[str, Any], writer: asyncio.StreamWriter) -> None:
+        """Runs handler of a request and writes its response."""
+        handler = self.handlers.get(request["method"])
+        try:
+            if handler is None:
+                raise KeyError(f"Unknown method {request['method']}")
+            response = {
+                "id": request["id"],
+                "result": await handler(**request.get("params", {})),
+            }
+        except Exception as error:  # pylint: disable=broad-except
+            data = self.error_mapper(error) if self.error_mapper else None
+            if data is None:
+                self.logger.error("IPC call %s failed: %s", request["method"], error)
+                data = {"detail": str(error)}
+            response = {"id": request["id"], "error": data}
+        if not writer.is_closing():
+            writer.write(encode(response))
+            await writer.drain()
+
+
+class IpcClient:
+    """Client keeping one connection to IpcServer, calls share it concurrently."""
+
+    def __init__(
+        self,
+        path: str,
+        on_event: Optional[Callable[[int, Dict[str, Any]], None]] = None,
+    ) -> None:
+        self.path = path
+        self.on_event = on_event
+        self.ids = itertools.count()
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.reader_task: Optional[asyncio.Task] = None
+        self.connect_lock = asyncio.Lock()
+        self.logger = helpers.prepare_logging("ipc", logging.WARNING)
+
+    async def connect(self) -> asyncio.StreamWriter:
+        """Opens the connection if it is not open.
+
+        Returns:
+            asyncio.StreamWriter: Writer of the connection.
+        """
+        async with self.connect_lock:
+            if self.writer is None or self.writer.is_closing():
+                reader, self.writer = await asyncio.open_unix_connection(self.path)
+                self.reader_task = asyncio.create_task(self.read_responses(reader))
+                if self.on_event is not None:
+                    await self.send("subscribe_events", {})
+            return self.writer
+
+    async def read_responses(self, reader: asyncio.StreamReader) -> None:
+        """Resolves pending calls with responses and passes events to on_event."""
+        try:
+            while True:
+                message = await read_frame(reader)
+                if "event" in message:
+                    if self.on_event is not None:
+                        self.on_event(message["guild_id"], message["event"])
+                    continue
+                future = self.pending.pop(message["id"], None)
+                if future is None or future.done():
+                    continue
+                if "error" in message:
+                    future.set_exception(IpcError(message["error"]))
+                else:
+                    future.set_result(message.get("result"))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError) as error:
+            self.logger.warning("IPC connection closed: %s", error)
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("IPC connection closed"))
+            self.pending.clear()
+
+    async def send(self, method: str, params: Dict[str, Any]) -> Any:
+        """Sends request over the open connection and waits for its result."""
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.writer.write(encode({"id": request_id, "method": method, "params": params}))
+        try:
+            return await asyncio.wait_for(future, CALL_TIMEOUT)
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def call(self, method: str, **params: Any) -> Any:
+        """Calls handler of the server.
+
+        Args:
+            method (str): Name of the handler.
+            params (Any): JSON serializable arguments of the handler.
+
+        Raises:
+            IpcError: If the handler failed.
+            ConnectionError: If the bot process is not reachable.
+
+        Returns:
+            Any: Result of the handler.
+        """
+        await self.connect()
+        return await self.send(method, params)
+
+    async def close(self) -> None:
+        """Closes the connection."""
+        if self.reader_task is not None:
+            self.reader_task.cancel()
+        if self.writer is not None:
+            self.writer.close()
@@ -0,0 +1,147 @@
+"""Module providing lease based leader election stored in MongoDB."""
+from datetime import datetime, timedelta
+import logging
+from typing import Callable, Optional
+
+from pymongo import ReturnDocument, collection
+from pymongo.errors import DuplicateKeyError
+
+from mundobot import helpers
+
+
+class LeaderLease:
+    """Lease lock held by at most one replica at a time.
+
+    The holder renews the lease with heartbeats. When it stops doing so the lease
+    expires and another replica takes it over, increasing the fencing token, so the
+    previous holder can detect that its work would no longer be valid.
+
+    Attributes:
+        name (str): Name of the lease, one document per name.
+        holder (str): Identifier of this replica.
+        duration (float): Seconds for which the lease is valid after a heartbeat.
+        token (Optional[int]): Fencing token of the lease if held, else None.
+    """
+
+    def __init__(
+        self,
+        locks: collection.Collection,
+        name: str,
+        holder: str,
+        duration: float,
+        clock: Callable[[], datetime] = datetime.utcnow,
+    ) -> None:
+        self.locks = locks
+        self.clock = clock
+        self.name = name
+        self.holder = holder
+        self.duration = duration
+        self.token: Optional[int] = None
+        self.expires: Optional[datetime] = None
+        self.logger = helpers.prepare_logging("lease", logging.WARNING)
+
+    @property
+    def held(self) -> bool:
+        """True if this replica holds a lease that has not expired locally."""
+        return (
+            self.token is not None
+            and self.expires is not None
+            and self.clock() < self.expires
+        )
+
+    @property
+    def fencing_token(self) -> Optional[int]:
+        """Fencing token of the lease if it is held, else None."""
+        return self.token if self.held else None
+
+    def renew(self) -> bool:
+        """Extends a held lease.
+
+        Returns:
+            bool: True if the lease is still held by this replica.
+        """
+        if self.token is None:
+            return False
+        expires = self.clock() + timedelta(seconds=self.duration)
+        result = self.locks.update_one(
+            {"_id": self.name, "holder": self.holder, "token": self.token},
+            {"$set": {"expires": expires}},
+        )
+        if result.matched_count == 0:
+            self.logger.warning("Lease %s was lost by %s.", self.name, self.holder)
+            self.token = None
+            self.expires = None
+            return False
+        self.expires = expires
+        return True
+
+    def acquire(self) -> bool:
+        """Takes over the lease if it does not exist or has expired.
+
+        Returns:
+            bool: True if the lease was acquired by this replica.
+        """
+        now = self.clock()
+        expires = now + timedelta(seconds=self.duration)
+        try:
+            document = self.locks.find_one_and_update(
+                {"_id": self.name, "expires": {"$lt": now}},
+                {
+                    "$set": {"holder": self.holder, "expires": expires},
+                    "$inc": {"token": 1},
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # The lease exists and has not expired yet
+            return False
+        self.token = document["token"]
+        self.expires = expires
+        self.logger.warning(
+            "Lease %s acquired by %s with token %d.", self.name, self.holder, self.token
+        )
+        return True
+
+    def heartbeat(self) -> bool:
+        """Renews the lease if held, else tries to acquire it.
+
+        Returns:
+            bool: True if this replica holds the lease after the call.
+        """
+        if self.token is not None and self.renew():
+            return True
+        return self.acquire()
+
+    def is_valid(self, token: int) -> bool:
+        """Checks that a fencing token is still the current one in the database.
+
+        Args:
+            token (int): Fencing token obtained when the work started.
+
+        Returns:
+            bool: True if the lease is still held with the same token.
+        """
+        return (
+            self.locks.count_documents(
+                {
+                    "_id": self.name,
+                    "holder": self.holder,
+                    "token": token,
+                    "expires": {"$gt": self.clock()},
+                },
+                limit=1,
+            )
+            > 0
+        )
+
+    def release(self) -> None:
+        """Gives up the lease so that another replica can take over immediately."""
+        if self.token is None:
+            return
+        self.locks.update_one(
+            {"_id": self.name, "holder": self.holder, "token": self.token},
+            {"$set": {"expires": self.clock()}},
+        )
+        self.token = None
+        self.expires = None
@@ -0,0 +1,98 @@
+"""Module providing index of guilds shared by users and the bot."""
+from collections import defaultdict
+from typing import Dict, Iterable, Set
+
+import discord as dc
+
+
+class GuildMembershipIndex:
+    """Maps users to ids of guilds in which they share membership with the bot.
+
+    The index is built from the member cache on login and kept current from member
+    and guild events, so finding guilds of a user does not scan all guilds.
+    """
+
+    def __init__(self) -> None:
+        self.guilds_by_user: Dict[int, Set[int]] = defaultdict(set)
+        self.members_by_guild: Dict[int, Set[int]] = defaultdict(set)
+
+    def rebuild(self, guilds: Iterable[dc.Guild]) -> None:
+        """Replaces the index by members of given guilds.
+
+        Args:
+            guilds (Iterable[dc.Guild]): All guilds of the bot.
+        """
+        self.guilds_by_user.clear()
+        self.members_by_guild.clear()
+        for guild in guilds:
+            self.add_guild(guild)
+
+    def add_guild(self, guild: dc.Guild) -> None:
+        """Adds all cached members of a guild.
+
+        Args:
+            guild (dc.Guild): Guild the bot joined or that became available.
+        """
+        for member in guild.members:
+            self.add_member(guild.id, member.id)
+
+    def remove_guild(self, guild_id: int) -> None:
+        """Removes a guild with all of its members.
+
+        Args:
+            guild_id (int): Id of the guild the bot left.
+        """
+        for user_id in self.members_by_guild.pop(guild_id, set()):
+            self.discard(user_id, guild_id)
+
+    def add_member(self, guild_id: int, user_id: int) -> None:
+        """Adds membership of a user in a guild.
+
+        Args:
+            guild_id (int): Id of the guild.
+            user_id (int): Id of the user.
+        """
+        self.guilds_by_user[user_id].add(guild_id)
+        self.members_by_guild[guild_id].add(user_id)
+
+    def remove_member(self, guild_id: int, user_id: int) -> None:
+        """Removes membership of a user in a guild.
+
+        Args:
+            guild_id (int): Id of the guild.
+            user_id (int): Id of the user.
+        """
+        self.members_by_guild.get(guild_id, set()).discard(user_id)
+        self.discard(user_id, guild_id)
+
+    def discard(self, user_id: int, guild_id: int) -> None:
+        """Removes guild from guilds of a user, dropping users without guilds."""
+        guilds = self.guilds_by_user.get(user_id)
+        if guilds is None:
+            return
+        guilds.discard(guild_id)
+        if not guilds:
+            del self.guilds_by_user[user_id]
+
+    def guilds_of(self, user_id: int) -> Set[int]:
+        """Gets ids of guilds the user shares with the bot.
+
+        Args:
+            user_id (int): Id of the user.
+
+        Returns:
+            Set[int]: Ids of the guilds.
+        """
+        return set(self.guilds_by_user.get(user_id, ()))
+
+    def is_member(self, user_id: int, guild_id: int) -> bool:
+        """Checks if a user is member of a guild.
+
+        Args:
+            user_id (int): Id of the user.
+            guild_id (int): Id of the guild.
+
+        Returns:
+            bool: True if the user is member of the guild.
+        """
+        return guild_id in self.guilds_by_user.get(user_id, ())
@@ -9,21 +9,33 @@ import signal
 from datetime import datetime
 import sys
 import traceback
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 from uuid import UUID, getnode
 import certifi
 
+from bson import ObjectId
 import discord as dc
-from dacite import from_dict
 from discord.ext import commands
 from discord.ext.commands.context import Context
 from pymongo import MongoClient
-import schedule
 
 from mundobot.clash.clash import Clash
-from mundobot.clash.clash_api_service import ApiClash, ClashApiService
-from mundobot.clash.clashmanager import ClashManager
-from mundobot.clash.position import Position
+from mundobot.events import EventHub
+from mundobot.clash.clash_repository import AsyncClashRepository, DB_POOL_SIZE
+from mundobot.clash.clash_api_service import ApiClash, ClashApiService, REGIONS
+from mundobot.clash.clashmanager import (
+    ClashChanges,
+    ClashManager,
+    ClashNotification,
+)
+from mundobot.clash.notification_scheduler import NotificationScheduler
+from mundobot.clash.write_behind import WriteBehindClashManager
+from mundobot.clash.position import ClashPositions, Position, PositionRecord
+from mundobot.clash.reconciliation import CycleReport, GuildReconciler
+from mundobot.clash.reminders import DmReminder, ReminderReport
+from mundobot.indexes import ensure_indexes
+from mundobot.leader_lease import LeaderLease
+from mundobot.membership import GuildMembershipIndex
 from mundobot.playback import PlaybackManager
 from mundobot import helpers
 
@@ -33,10 +45,15 @@ from mundobot import helpers
 # Date: 22/3/2021
 # -------------------------------------------
 
-LOCK_REFRESH_TIMEOUT = 1.5  # minutes
-LOCK_CHECK_TIMEOUT = 4 * 60  # 4 minutes
-LOCK_CHECK_TIMEOUT_OWNER = 60
-LOCK_CHECK_TIMEOUT_INITIAL = 5
+LOCK_NAME = "clash"
+LOCK_DURATION = 30  # seconds for which the lease is valid after a heartbeat
+LOCK_REFRESH_TIMEOUT = 10  # seconds between heartbeats of the lease holder
+LOCK_CHECK_TIMEOUT = 5  # seconds between takeover attempts of standby replicas
+LOCK_CHECK_TIMEOUT_INITIAL = 5  # seconds before the first attempt after login
+CLASH_CHECK_INTERVAL = 60 * 60  # seconds between clash reconciliations
+REACTION_PAGE_SIZE = 100  # maximum allowed by Discord
+SWEEP_CONCURRENCY = 5
+SWEEP_CLASH_TIMEOUT = 60  # seconds
 
 QueueStatus = namedtuple("QueueStatus", "playing stop")
 
@@ -50,12 +67,19 @@ class MundoBot(commands.Bot):
         client (MongoClient): Client for accessing used mongodb.
     """
 
-    def __init__(self, token: str, mongodb_connection_string: str) -> None:
+    def __init__(
+        self,
+        token: str,
+        mongodb_connection_string: str,
+        write_behind_journal: Optional[str] = None,
+    ) -> None:
         """Initializes the bot by creating connections to db and preparing token.
 
         Args:
             token (str): Discord api bot token.
             mongodb_connection_string (str): Connection string to mongodb.
+            write_behind_journal (Optional[str]): Path of journal of clash data.
+            If given clash data is kept in memory and written to mongodb in batches.
         """
         intents: dc.Intents = dc.Intents.default()
         intents.members = True  # pylint: disable=assigning-non-slot
@@ -70,17 +94,56 @@ class MundoBot(commands.Bot):
             mongodb_connection_string,
             uuidRepresentation="standard",
             tlsCAFile=certifi.where(),
+            maxPoolSize=DB_POOL_SIZE,
         )
+        # Indexes are ensured in on_ready, constructing the bot does not wait for DB
+        self.index_task: Optional[asyncio.Task] = None
 
-        self.clash_manager = ClashManager(self.client)
+        self.clash_manager: ClashManager
+        if write_behind_journal:
+            self.clash_manager = WriteBehindClashManager(
+                self.client, write_behind_journal
+            )
+        else:
+            self.clash_manager = ClashManager(self.client)
+        # Discord handlers use the async repository, the sync manager stays for scripts
+        self.clash_repository = AsyncClashRepository(self.clash_manager)
+        self.membership_index = GuildMembershipIndex()
+        self.loop_lag_monitor = helpers.LoopLagMonitor()
+        self.loop_lag_task: Optional[asyncio.Task] = None
+        self.identifier: UUID = UUID(int=getnode())
+        # Process id distinguishes more replicas running on the same host
+        self.leader_lease = LeaderLease(
+            self.client.bot.locks,
+            LOCK_NAME,
+            f"{self.identifier}:{os.getpid()}",
+            LOCK_DURATION,
+        )
+        self.leadership_task: Optional[asyncio.Task] = None
+        # True while this replica runs the work of the leader
+        self.leading = False
+        self.clash_checking_task: Optional[asyncio.Task] = None
+        self.reaction_sweep_task: Optional[asyncio.Task] = None
+        self.notification_scheduler = NotificationScheduler(
+            self.clash_manager.notifications,
+            self.send_notifications,
+            lambda: self.leader_lease.fencing_token,
+        )
+        self.clash_manager.notification_scheduler = self.notification_scheduler
+        self.dm_reminder = DmReminder(self.client.clash.reminder_opt_outs)
+        # Last delivery report of private reminders for each guild
+        self.reminder_reports: Dict[int, ReminderReport] = {}
         self.clash_api_service = ClashApiService()
+        # Live events of guilds for web clients
+        self.event_hub = EventHub()
         self.playback_manager = PlaybackManager(
-            self.client, self.path, self.voice_clients
+            self.client, self.path, self.voice_clients, self.event_hub
         )
 
-        self.identifier: UUID = UUID(int=getnode())
-        self.checking_done = False
-        self.job: Optional[schedule.Job] = None
+        self.reconciler = GuildReconciler()
+        # Clashes being created by reconciliation by guild and riot id
+        self.clash_creations: Dict[Tuple[int, int], asyncio.Task] = {}
+        self.last_clash_report: Optional[CycleReport] = None
 
         self.logger = helpers.prepare_logging(
             "bot",
@@ -107,12 +170,39 @@ class MundoBot(commands.Bot):
         @self.event
         async def on_ready() -> None:
             self.logger.info("Logged in.")
+            self.membership_index.rebuild(self.guilds)
+            if self.index_task is None:
+                self.index_task = asyncio.create_task(
+                    asyncio.to_thread(ensure_indexes, self.client)
+                )
+            if self.loop_lag_task is None:
+                self.loop_lag_task = asyncio.create_task(self.loop_lag_monitor.run())
+            if isinstance(self.clash_manager, WriteBehindClashManager):
+                self.clash_manager.start()
+            if self.leadership_task is None:
+                self.leadership_task = asyncio.create_task(self.run_leadership())
             for signame in ("SIGINT", "SIGTERM"):
                 self.loop.add_signal_handler(
                     getattr(signal, signame),
                     lambda: asyncio.create_task(self.termination_handler()),
                 )
 
+        @self.event
+        async def on_member_join(member: dc.Member) -> None:
+            self.membership_index.add_member(member.guild.id, member.id)
+
+        @self.event
+        async def on_member_remove(member: dc.Member) -> None:
+            self.membership_index.remove_member(member.guild.id, member.id)
+
+        @self.event
+        async def on_guild_join(guild: dc.Guild) -> None:
+            self.membership_index.add_guild(guild)
+
+        @self.event
+        async def on_guild_remove(guild: dc.Guild) -> None:
+            self.membership_index.remove_guild(guild.id)
+
         @self.event
         async def on_command_error(ctx: Context, error: commands.CommandError) -> None:
             """Changes the behaviour of command error to ignore CheckFailures.
@@ -166,17 +256,14 @@ class MundoBot(commands.Bot):
             Args:
                 reaction (dc.RawReactionActionEvent): Event of adding reaction
             """
+            if reaction.emoji.name not in Position.accepted_reactions():
+                return
             # Checks if reaction was made on one of initial messages
-            for clash_entry in self.clash_manager.clashes_for_guild(reaction.guild_id):
-                clash: Clash = from_dict(Clash, clash_entry)
-                if (
-                    reaction.channel_id != clash.clash_channel_id
-                    or reaction.message_id != clash.message_id
-                    or reaction.emoji.name not in Position.accepted_reactions()
-                ):
-                    continue
-
-                clash_id: int = clash_entry["_id"]
+            found = await self.clash_repository.clash_for_message(
+                reaction.guild_id, reaction.channel_id, reaction.message_id
+            )
+            if found is not None:
+                clash_id, clash = found
                 guild: dc.Guild = self.get_guild(clash.guild_id)
                 position = Position.get_position(reaction.emoji.name)
                 role: dc.Role = guild.get_role(clash.role_id)
@@ -193,9 +280,18 @@ class MundoBot(commands.Bot):
                 if position != Position.NOOB:
                     await reaction.member.add_roles(role)
 
-                new_positions = self.clash_manager.register_player(
+                new_positions = await self.clash_repository.register_player(
                     clash_id, reaction.member.id, reaction.member.name, position
                 )
+                self.event_hub.publish(
+                    guild.id,
+                    "registration",
+                    clash=clash.name,
+                    player_id=str(reaction.member.id),
+                    player_name=reaction.member.name,
+                    position=str(position),
+                    registered=True,
+                )
 
                 # Update message in this clash channel
                 channel = guild.get_channel(clash.channel_id)
@@ -203,7 +299,6 @@ class MundoBot(commands.Bot):
                     clash.status_id
                 )
                 await status_message.edit(content=helpers.show_players(new_positions))
-                break
 
         @self.event
         async def on_raw_reaction_remove(reaction: dc.RawReactionActionEvent) -> None:
@@ -213,17 +308,14 @@ class MundoBot(commands.Bot):
             Args:
                 reaction (dc.RawReactionActionEvent): Event of removing reaction.
             """
+            if reaction.emoji.name not in Position.accepted_reactions():
+                return
             # Checks if reaction was made on one of initial messages
-            for clash_entry in self.clash_manager.clashes_for_guild(reaction.guild_id):
-                clash: Clash = from_dict(Clash, clash_entry)
-                if (
-                    reaction.channel_id != clash.clash_channel_id
-                    or reaction.message_id != clash.message_id
-                    or reaction.emoji.name not in Position.accepted_reactions()
-                ):
-                    continue
-
-                clash_id: int = clash_entry["_id"]
+            found = await self.clash_repository.clash_for_message(
+                reaction.guild_id, reaction.channel_id, reaction.message_id
+            )
+            if found is not None:
+                clash_id, clash = found
                 guild: dc.Guild = self.get_guild(clash.guild_id)
                 position = Position.get_position(reaction.emoji.name)
                 member: dc.Member = guild.get_member(reaction.user_id)
@@ -239,9 +331,18 @@ class MundoBot(commands.Bot):
 
                 role = guild.get_role(clash.role_id)
                 await member.remove_roles(role)
-                new_positions = self.clash_manager.unregister_player(
+                new_positions = await self.clash_repository.unregister_player(
                     clash_id, member.name, position
                 )
+                self.event_hub.publish(
+                    guild.id,
+                    "registration",
+                    clash=clash.name,
+                    player_id=str(member.id),
+                    player_name=member.name,
+                    position=str(position),
+                    registered=False,
+                )
 
                 # Update message in this clash channel
                 channel = guild.get_channel(clash.channel_id)
@@ -249,7 +350,6 @@ class MundoBot(commands.Bot):
                     clash.status_id
                 )
                 await status_message.edit(content=helpers.show_players(new_positions))
-                break
 
         # -----------------------------------------------------
         # MUNDO GREET COMMANDS
@@ -283,7 +383,9 @@ class MundoBot(commands.Bot):
                 voice_channel = None
 
             if voice_channel is not None:
-                await self.playback_manager.add_to_queue(ctx.guild, voice_channel, "mundo", num)
+                await self.playback_manager.add_to_queue(
+                    ctx.guild.id, voice_channel, "mundo", num
+                )
             else:
                 await ctx.author.send("Mundo can't greet without voice channel.")
 
@@ -471,7 +573,7 @@ class MundoBot(commands.Bot):
             if not await helpers.check_permissions(ctx.author):
                 return
 
-            success = self.clash_manager.register_server(ctx.guild.id)
+            success = await self.clash_repository.register_server(ctx.guild.id)
             if success:
                 await ctx.channel.send("Server now receive clash updates.")
                 self.logger.info(
@@ -492,7 +594,7 @@ class MundoBot(commands.Bot):
             if not await helpers.check_permissions(ctx.author):
                 return
 
-            success = self.clash_manager.unregister_server(ctx.guild.id)
+            success = await self.clash_repository.unregister_server(ctx.guild.id)
             if success:
                 await ctx.channel.send("Server now no receive clash updates.")
                 self.logger.info(
@@ -503,6 +605,37 @@ class MundoBot(commands.Bot):
                     "You not receive clash updates. Me no stupid to remove something no existing."
                 )
 
+        @self.command()
+        async def clash_region(ctx: Context, region: str) -> None:
+            """Sets Riot region from which the server receives clash updates.
+
+            Args:
+                ctx (Context): Context of the command
+                region (str): Riot platform routing value, e.g. eun1 or euw1.
+            """
+            if not await helpers.check_permissions(ctx.author):
+                return
+
+            region = region.lower()
+            if region not in REGIONS:
+                await ctx.author.send(
+                    "Mundo no know this region. Mundo know only " + ", ".join(REGIONS)
+                )
+                return
+
+            success = await self.clash_repository.set_server_region(
+                ctx.guild.id, region
+            )
+            if success:
+                await ctx.channel.send(f"Server now receive clash updates for {region}.")
+                self.logger.info(
+                    "%s set clash region of %s to %s", ctx.author, ctx.guild, region
+                )
+            else:
+                await ctx.author.send(
+                    "You not receive clash updates. Register server first, me no stupid."
+                )
+
         @self.command()
         async def regular_players(ctx: Context) -> None:
             """Gets all regular players in the server.
@@ -515,7 +648,9 @@ class MundoBot(commands.Bot):
                 "Getting list of regular players in %s",
                 guild.name,
             )
-            regular_player_ids = self.clash_manager.regular_players_for_guild(guild.id)
+            regular_player_ids = await self.clash_repository.regular_players_for_guild(
+                guild.id
+            )
             regular_players: Iterable[str | None] = map(
                 lambda x: guild.get_member(x).name, regular_player_ids
             )
@@ -552,7 +687,7 @@ class MundoBot(commands.Bot):
                 return
 
             try:
-                self.clash_manager.register_regular_player(
+                await self.clash_repository.register_regular_player(
                     guild.id, player.id, not bool(name), bool(name)
                 )
             except ValueError as error:
@@ -598,7 +733,7 @@ class MundoBot(commands.Bot):
             )
 
             try:
-                self.clash_manager.unregister_regular_player(
+                await self.clash_repository.unregister_regular_player(
                     guild.id, player.id, not bool(name), bool(name)
                 )
             except ValueError as error:
@@ -615,6 +750,109 @@ class MundoBot(commands.Bot):
                 )
                 await player.send("Nadále nejsi častým hráčem na serveru " + guild.name)
 
+        @self.command()
+        async def attendance(ctx: Context, name: Optional[str] = None) -> None:
+            """Sends clash attendance statistics of self or other player.
+
+            Args:
+                ctx (Context): Context of the command.
+                name (Optional[str], optional): Name of the player. Defaults to None.
+            """
+            guild: dc.Guild = ctx.guild
+            player = ctx.author if name is None else guild.get_member_named(name)
+            if player is None:
+                await ctx.author.send("Hráč neexistuje.")
+                return
+
+            stats = await self.clash_repository.get_attendance(guild.id, player.id)
+            if stats is None:
+                await ctx.channel.send(
+                    player.name + " se zatím na žádný clash nepřihlásil."
+                )
+                return
+
+            positions = ", ".join(
+                f"{position}: {count}"
+                for position, count in sorted(stats.positions.items())
+                if count > 0
+            )
+            await ctx.channel.send(
+                f"{player.name} odehrál {stats.clashes} clashů"
+                f" a jako noob byl u {stats.noob_clashes}.\n"
+                f"Přihlášky na pozice: {positions or 'žádné'}"
+            )
+
+        @self.command()
+        async def dm_reminders(ctx: Context, state: Optional[str] = None) -> None:
+            """Turns private reminders of unresponsive regular players on or off,
+            without argument sends report of the last reminders.
+
+            Args:
+                ctx (Context): Context of the command.
+                state (Optional[str], optional): "on" or "off". Defaults to None.
+            """
+            if not await helpers.check_permissions(ctx.author):
+                return
+
+            if state is None:
+                report = self.reminder_reports.get(ctx.guild.id)
+                await ctx.channel.send(
+                    report.summary()
+                    if report
+                    else "Zatím nebyly odeslány žádné připomínky."
+                )
+                return
+            if state not in ("on", "off"):
+                await ctx.author.send("Použij !dm_reminders on nebo !dm_reminders off.")
+                return
+
+            success = await self.clash_repository.set_dm_reminders(
+                ctx.guild.id, state == "on"
+            )
+            if success:
+                await ctx.channel.send(
+                    "Soukromé připomínky jsou zapnuté."
+                    if state == "on"
+                    else "Soukromé připomínky jsou vypnuté."
+                )
+            else:
+                await ctx.author.send(
+                    "You not receive clash updates. Register server first, me no stupid."
+                )
+
+        @self.command()
+        async def remind_me(ctx: Context, state: str) -> None:
+            """Turns private clash reminders of the author on or off.
+
+            Args:
+                ctx (Context): Context of the command.
+                state (str): "on" or "off".
+            """
+            if state not in ("on", "off"):
+                await ctx.author.send("Použij !remind_me on nebo !remind_me off.")
+                return
+
+            await asyncio.to_thread(
+                self.dm_reminder.set_opt_out, ctx.author.id, state == "off"
+            )
+            await ctx.author.send(
+                "Připomínky clashů ti budou chodit."
+                if state == "on"
+                else "Připomínky clashů ti již nebudou chodit."
+            )
+
+        @self.command()
+        async def loop_lag(ctx: Context) -> None:
+            """Sends summary of recently measured event loop lag.
+
+            Args:
+                ctx (Context): Context of the command.
+            """
+            if not await helpers.check_permissions(ctx.author):
+                return
+
+            await ctx.channel.send(self.loop_lag_monitor.summary())
+
         @self.command()
         async def test(ctx: Context, string, name) -> None:
             """Testing function
@@ -649,6 +887,12 @@ class MundoBot(commands.Bot):
             whose permissions will be the baseline.
             riot_id (Optional[int]): Id of clash in riot database.
         """
+        # Clash of Riot API may have been added meanwhile by an earlier attempt
+        if riot_id is not None and await self.clash_repository.has_riot_clash(
+            guild.id, riot_id
+        ):
+            return
+
         # Convert date from iso format if necessary
         try:
             date_converted = datetime.fromisoformat(date)
@@ -672,47 +916,74 @@ class MundoBot(commands.Bot):
                         "Mundo need clash text channel to send clash update."
                     )
             return
-        message: dc.Message = await clash_channel.send(
-            f"@everyone Nábor na clash {clash_name} - {date}\n"
-            + "Pokud můžete a chcete si zahrát tak zareagujete svojí rolí"
-            + " nebo fill rolí, případně :thumbdown: pokud nemůžete.",
-            allowed_mentions=dc.AllowedMentions.all(),
-        )
-
         # Give access to new channel to everyone above or equal to requesting user +
         # new designated role
         if user is None:
             user = guild.owner
-        overwrites = {}
         author_role = max(user.roles)
-        for role in guild.roles:
-            overwrites[role] = dc.PermissionOverwrite(
-                read_messages=(role >= author_role)
-            )
-
-        # Check if role with desired clash_name already exists, else create it and give
-        # it permissions to channel
-        role_name = clash_name + " Player"
-        role = next((r for r in guild.roles if r.name == role_name), None)
-        if role is None:
-            role: dc.Role = await guild.create_role(
-                name=role_name, permissions=guild.default_role.permissions
-            )
-            overwrites[role] = dc.PermissionOverwrite(read_messages=True)
 
-        # Channel will be placed to category named Clash, else to no category
-        category = next((c for c in guild.categories if c.name == "Clash"), None)
+        # Resources created for the clash, deleted again if the creation fails
+        created: List[Union[dc.Role, dc.TextChannel, dc.Message]] = []
 
-        # Create new channel only if no channel of such name currently exists
-        channel = helpers.find_text_channel_by_name(guild, clash_name)
-        if channel is None:
-            channel = await guild.create_text_channel(
-                clash_name, overwrites=overwrites, category=category
+        async def prepare_channel() -> Tuple[dc.Role, dc.TextChannel, dc.Message]:
+            # Check if role with desired clash_name already exists, else create it
+            role_name = clash_name + " Player"
+            role = next((r for r in guild.roles if r.name == role_name), None)
+            if role is None:
+                role = await guild.create_role(
+                    name=role_name, permissions=guild.default_role.permissions
+                )
+                created.append(role)
+
+            # Channel will be placed to category named Clash, else to no category
+            category = next((c for c in guild.categories if c.name == "Clash"), None)
+
+            # Create new channel only if no channel of such name currently exists
+            channel = helpers.find_text_channel_by_name(guild, clash_name)
+            if channel is None:
+                channel = await guild.create_text_channel(
+                    clash_name,
+                    overwrites=helpers.clash_channel_overwrites(
+                        guild, author_role, role
+                    ),
+                    category=category,
+                )
+                created.append(channel)
+
+            # Add message to channel and pin it
+            status = await channel.send(helpers.show_players())
+            created.append(status)
+            await status.pin()
+            return role, channel, status
+
+        # Announcement does not depend on the role and channel so it is sent meanwhile
+        message, prepared = await asyncio.gather(
+            clash_channel.send(
+                f"@everyone Nábor na clash {clash_name} - {date}\n"
+                + "Pokud můžete a chcete si zahrát tak zareagujete svojí rolí"
+                + " nebo fill rolí, případně :thumbdown: pokud nemůžete.",
+                allowed_mentions=dc.AllowedMentions.all(),
+            ),
+            prepare_channel(),
+            return_exceptions=True,
+        )
+        failure = next(
+            (x for x in (message, prepared) if isinstance(x, BaseException)), None
+        )
+        if failure is not None:
+            if not isinstance(message, BaseException):
+                created.append(message)
+            cleanup = await asyncio.gather(
+                *(helpers.ignore_missing(x.delete()) for x in created),
+                return_exceptions=True,
             )
-
-        # Add message to channel and pin it
-        status: dc.Message = await channel.send(helpers.show_players())
-        await status.pin()
+            for error in cleanup:
+                if isinstance(error, Exception):
+                    self.logger.error(
+                        "Cleanup of clash %s failed: %s", clash_name, error
+                    )
+            raise failure
+        role, channel, status = prepared
 
         # Create new Clash object to hold all data about it and supporting structure
         clash = Clash(
@@ -730,7 +1001,7 @@ class MundoBot(commands.Bot):
         notification_times = helpers.prepare_notification_times(clash)
 
         # Add all this to clash manager for saving
-        self.clash_manager.add_clash(clash, notification_times)
+        await self.clash_repository.add_clash(clash, notification_times)
 
     async def remove_clash_internal(self, guild: dc.Guild, clash_name: str) -> None:
         """Deletes clash and all associated propertis with it.
@@ -739,7 +1010,7 @@ class MundoBot(commands.Bot):
             guild (dc.Guild): Guild in which the clash is removed.
             clash_name (str): Name of clash to be removed.
         """
-        clash: Clash = self.clash_manager.remove_clash(clash_name, guild.id)
+        clash: Clash = await self.clash_repository.remove_clash(clash_name, guild.id)
 
         if clash is None:
             return
@@ -753,109 +1024,452 @@ class MundoBot(commands.Bot):
             clash (Clash): Clash which is being deleted.
         """
         guild: dc.Guild = self.get_guild(clash.guild_id)
-        # Delete role and channel
-        role: dc.Role = guild.get_role(clash.role_id)
-        await role.delete()
-        channel: dc.TextChannel = guild.get_channel(clash.channel_id)
-        await channel.delete()
-
-        # Delete original message and notifications in general clash channel
-        channel = guild.get_channel(clash.clash_channel_id)
-        clash.notification_message_ids.append(clash.message_id)
+        if guild is None:
+            return
+        role: Optional[dc.Role] = guild.get_role(clash.role_id)
+        channel: Optional[dc.TextChannel] = guild.get_channel(clash.channel_id)
+        clash_channel: Optional[dc.TextChannel] = guild.get_channel(
+            clash.clash_channel_id
+        )
 
-        for message_id in clash.notification_message_ids:
-            message: dc.Message = await channel.fetch_message(message_id)
-            await message.delete()
+        # Delete role, channel and original message with notifications in general
+        # clash channel concurrently, resources deleted by hand are skipped
+        await asyncio.gather(
+            helpers.ignore_missing(role.delete() if role is not None else None),
+            helpers.ignore_missing(channel.delete() if channel is not None else None),
+            helpers.delete_messages(
+                clash_channel, clash.notification_message_ids + [clash.message_id]
+            ),
+        )
 
     # -----------------------------------------------------
     # PERIODIC CLASH MANAGEMENT METHODS
     # -----------------------------------------------------
-    async def run_notifications(self) -> None:
-        """Gets all overdue notifications and sends them out."""
-        overdue_clashes = self.clash_manager.get_overdue_notifications()
-
-        for clash_entry in overdue_clashes:
-            clash = from_dict(Clash, clash_entry)
-            guild: dc.Guild = self.get_guild(clash.guild_id)
-            clash_channel: dc.TextChannel = guild.get_channel(clash.clash_channel_id)
-            players = self.clash_manager.positions_for_clash(clash_entry["_id"]).players
-            regular_players = self.clash_manager.regular_players_for_guild(guild.id)
-            message: dc.Message = await clash_channel.send(
-                helpers.get_notification(players, clash, regular_players)
+    async def send_notifications(self, clash_ids: List[ObjectId]) -> Set[ObjectId]:
+        """Sends notifications of clashes, used by the notification scheduler.
+
+        Args:
+            clash_ids (List[ObjectId]): Ids of the clashes in DB.
+
+        Returns:
+            Set[ObjectId]: Ids of clashes whose notification was not sent.
+        """
+        return await self.send_clash_notifications(
+            await self.clash_repository.notification_fanout(clash_ids)
+        )
+
+    async def send_clash_notifications(
+        self, notifications: List[ClashNotification]
+    ) -> Set[ObjectId]:
+        """Sends notification messages of clashes concurrently
+        and stores their ids in one bulk write. Storing the ids and private
+        reminders are done after the messages are sent, their failures are only
+        logged, so they never cause the messages to be sent again.
+
+        Args:
+            notifications (List[ClashNotification]): Clashes with rosters
+            and regular players.
+
+        Returns:
+            Set[ObjectId]: Ids of clashes whose notification was not sent.
+        """
+
+        async def send(notification: ClashNotification) -> Optional[dc.Message]:
+            clash = notification.clash
+            guild: Optional[dc.Guild] = self.get_guild(clash.guild_id)
+            if guild is None:
+                return None
+            clash_channel = guild.get_channel(clash.clash_channel_id)
+            if clash_channel is None:
+                return None
+            return await clash_channel.send(
+                helpers.get_notification(
+                    notification.players, clash, notification.regular_players
+                )
+            )
+
+        messages = await asyncio.gather(
+            *(send(notification) for notification in notifications),
+            return_exceptions=True,
+        )
+        new_ids = {}
+        failed = set()
+        for notification, message in zip(notifications, messages):
+            if isinstance(message, Exception):
+                self.logger.error(
+                    "Notification of %s failed: %s", notification.clash.name, message
+                )
+                failed.add(notification.clash_id)
+            elif message is None:
+                # Guild or channel is gone, a retry would not help
+                self.logger.warning(
+                    "Notification of %s has no channel.", notification.clash.name
+                )
+            else:
+                new_ids[notification.clash_id] = message.id
+        try:
+            await self.clash_repository.push_notification_ids(new_ids)
+        except Exception as error:  # pylint: disable=broad-except
+            self.logger.error("Storing notification message ids failed: %s", error)
+        try:
+            await self.send_dm_reminders(
+                [n for n in notifications if n.clash_id not in failed]
             )
-            clash.notification_message_ids.append(message.id)
-            self.clash_manager.update_notification_ids(
-                clash_entry["_id"], clash.notification_message_ids
+        except Exception as error:  # pylint: disable=broad-except
+            self.logger.error("Sending private reminders failed: %s", error)
+        return failed
+
+    async def send_dm_reminders(self, notifications: List[ClashNotification]) -> None:
+        """Sends private reminders to unresponsive regular players of clashes
+        in guilds that turned reminders on.
+
+        Args:
+            notifications (List[ClashNotification]): Clashes with rosters
+            and regular players.
+        """
+        enabled = await self.clash_repository.get_dm_reminder_servers(
+            list({n.clash.guild_id for n in notifications})
+        )
+        reminders: Dict[int, Dict[int, List[str]]] = {}
+        for notification in notifications:
+            clash = notification.clash
+            guild = self.get_guild(clash.guild_id)
+            if guild is None or clash.guild_id not in enabled:
+                continue
+            if not helpers.needs_players(notification.players):
+                continue
+            for player_id in helpers.get_players_to_remind(
+                notification.players, notification.regular_players
+            ):
+                reminders.setdefault(clash.guild_id, {}).setdefault(
+                    player_id, []
+                ).append(helpers.get_dm_reminder(clash, guild))
+
+        # Player missing in more clashes of one guild receives one message
+        reports = await asyncio.gather(
+            *(
+                self.dm_reminder.send(
+                    self,
+                    (
+                        (player_id, "\n\n".join(texts))
+                        for player_id, texts in players.items()
+                    ),
+                )
+                for players in reminders.values()
             )
+        )
+        for guild_id, report in zip(reminders, reports):
+            self.reminder_reports[guild_id] = report
+            self.logger.info("Reminders in %s: %s", guild_id, report.summary())
 
-    async def load_clashes_for_guild(self, guild_id: int) -> None:
+    async def load_clashes_for_guild(
+        self, guild_id: int, clashes: Optional[List[ApiClash]] = None
+    ) -> None:
         """Makes clashes for a guild consistent with list of clashes from Riot.
 
         Args:
             guild_id (int): Id of the guild to check.
+            clashes (Optional[List[ApiClash]]): Already fetched clashes of guild's region.
+            If not provided they are fetched for the region of the guild.
         """
         guild = self.get_guild(guild_id)
-        clashes: List[ApiClash] = self.clash_api_service.get_clashes()
-        missing_clashes, surplus_clashes = self.clash_manager.get_needed_changes(
-            guild.id, clashes
+        if guild is None:
+            raise ValueError(f"Guild {guild_id} is not available to the bot.")
+        if clashes is None:
+            region = await self.clash_repository.get_server_region(guild_id)
+            clashes = await self.clash_api_service.get_clashes(region)
+        (
+            missing_clashes,
+            surplus_clashes,
+        ) = await self.clash_repository.get_needed_changes(guild.id, clashes)
+        await self.apply_clash_changes(
+            guild, ClashChanges(missing_clashes, [c.name for c in surplus_clashes])
         )
-        missing_clashes.sort(key=lambda c: c.date)
 
-        for clash in missing_clashes:
-            await self.add_clash_internal(guild, clash.name, clash.date, clash.id)
-        for clash in surplus_clashes:
-            await self.remove_clash_internal(guild, clash.name)
+    async def apply_clash_changes(self, guild: dc.Guild, changes: ClashChanges) -> None:
+        """Adds missing clashes and removes surplus clashes of a guild.
 
-    async def run_clash_checking(self) -> None:
-        """Checks removes expired clashes and sends notification that should have been send."""
-        guild_ids = self.clash_manager.get_registered_server_ids()
+        Args:
+            guild (dc.Guild): Guild to change.
+            changes (ClashChanges): Missing clashes and names of surplus clashes.
+        """
+        for clash in sorted(changes.missing, key=lambda c: c.date):
+            key = (guild.id, clash.id)
+            if key not in self.clash_creations:
+                task = asyncio.create_task(
+                    self.add_clash_internal(
+                        guild, clash.name, clash.date, riot_id=clash.id
+                    )
+                )
+                self.clash_creations[key] = task
+                task.add_done_callback(
+                    lambda _, key=key: self.clash_creations.pop(key, None)
+                )
+            # Timeout of reconciliation must not interrupt a half created clash,
+            # its channel, role and announcement would be created again on retry
+            await asyncio.shield(self.clash_creations[key])
+        for clash_name in changes.surplus:
+            await self.remove_clash_internal(guild, clash_name)
 
-        for guild_id in guild_ids:
-            await self.load_clashes_for_guild(guild_id)
+    async def run_clash_checking(self) -> None:
+        """Checks removes expired clashes and adds new ones.
+        Notifications are sent on time by the notification scheduler."""
+        servers = await self.clash_repository.get_registered_servers()
+        clashes_by_region = await self.clash_api_service.get_clashes_for_regions(
+            servers.values()
+        )
 
-        await self.run_notifications()
+        # Guilds whose region could not be fetched or that need no changes are skipped
+        changes = await self.clash_repository.get_all_needed_changes(
+            servers, clashes_by_region
+        )
+        attempted = set()
+        token = self.leader_lease.token
+
+        async def reconcile(guild_id: int) -> None:
+            # Fencing, other replica may have taken over while this cycle was running
+            if token is not None and not await asyncio.to_thread(
+                self.leader_lease.is_valid, token
+            ):
+                raise RuntimeError("Leader lease was lost.")
+            # Retries recompute the changes since the failed attempt may have
+            # applied some, after clashes still being created by it are stored
+            if guild_id in attempted:
+                await asyncio.gather(
+                    *(
+                        task
+                        for (creation_guild_id, _), task in self.clash_creations.items()
+                        if creation_guild_id == guild_id
+                    ),
+                    return_exceptions=True,
+                )
+                await self.load_clashes_for_guild(
+                    guild_id, clashes_by_region[servers[guild_id]]
+                )
+                return
+            attempted.add(guild_id)
+            guild = self.get_guild(guild_id)
+            if guild is None:
+                raise ValueError(f"Guild {guild_id} is not available to the bot.")
+            await self.apply_clash_changes(guild, changes[guild_id])
+
+        self.last_clash_report = await self.reconciler.run(changes.keys(), reconcile)
+        if self.last_clash_report.failed:
+            self.logger.warning(self.last_clash_report.summary())
+        else:
+            self.logger.info(self.last_clash_report.summary())
+
+    async def run_clash_checking_periodically(self) -> None:
+        """Runs clash checking every CLASH_CHECK_INTERVAL seconds."""
+        while True:
+            try:
+                await self.run_clash_checking()
+            except Exception as error:  # pylint: disable=broad-except
+                self.logger.error("Clash checking failed: %s", error)
+            await asyncio.sleep(CLASH_CHECK_INTERVAL)
+
+    def start_leader_work(self) -> None:
+        """Starts clash reconciliation and notifications on the lease holder."""
+        self.logger.info("%s became leader.", self.leader_lease.holder)
+        self.notification_scheduler.start()
+        self.clash_checking_task = asyncio.create_task(
+            self.run_clash_checking_periodically()
+        )
+        self.reaction_sweep_task = asyncio.create_task(self.reconcile_reactions())
+
+    def stop_leader_work(self) -> None:
+        """Stops clash reconciliation and notifications after the lease is lost."""
+        self.logger.warning("%s is no longer leader.", self.leader_lease.holder)
+        self.notification_scheduler.stop()
+        if self.clash_checking_task is not None:
+            self.clash_checking_task.cancel()
+            self.clash_checking_task = None
+        if self.reaction_sweep_task is not None:
+            self.reaction_sweep_task.cancel()
+            self.reaction_sweep_task = None
+
+    async def run_leadership(self) -> None:
+        """Keeps trying to hold the leader lease. Only the holder runs clash
+        reconciliation and notifications, so more replicas do not duplicate them."""
+        await asyncio.sleep(LOCK_CHECK_TIMEOUT_INITIAL)
+        while True:
+            try:
+                holds_lease = await asyncio.to_thread(self.leader_lease.heartbeat)
+            except Exception as error:  # pylint: disable=broad-except
+                self.logger.error("Lease heartbeat failed: %s", error)
+                holds_lease = self.leader_lease.held
+
+            if holds_lease and not self.leading:
+                self.start_leader_work()
+            elif not holds_lease and self.leading:
+                self.stop_leader_work()
+            self.leading = holds_lease
+
+            await asyncio.sleep(
+                LOCK_REFRESH_TIMEOUT if self.leading else LOCK_CHECK_TIMEOUT
+            )
 
     # Maybe redundant
     async def termination_handler(self):
         """Closes the bot."""
         self.logger.info("Terminating bot.")
+        if self.leadership_task is not None:
+            self.leadership_task.cancel()
+        if self.leading:
+            self.stop_leader_work()
+            self.leading = False
+        await asyncio.to_thread(self.leader_lease.release)
+        if isinstance(self.clash_manager, WriteBehindClashManager):
+            self.clash_manager.stop()
+        self.clash_repository.close()
+        await self.clash_api_service.close()
         await self.close()
 
-    # # -----------------------------------------------------
-    # # CLASH CONSISTENCY CHECKS TO BE RUN AT THE LOGIN
-    # # -----------------------------------------------------
-    # async def check_positions(self) -> None:
-    #     """Checks if positions of players in the clash match positions stored in ClashManager."""
-    #     clash: Clash
-
-    #     print("Checking player positions")
-    #     return
-
-    #     for clash in self.clash_manager.clashes.values():
-    #         # Finds guild, its clash_channel and initial message
-    #         self.clash_manager.players[clash.name] = {}
-    #         guild = self.get_guild(clash.guild_id)
-    #         channel = guild.get_channel(clash.clash_channel_id)
-    #         message: dc.Message = await channel.fetch_message(clash.message_id)
-
-    #         # Checks reactions and adds users to players dictionary
-    #         for reaction in message.reactions:
-    #             for user in await reaction.users().flatten():
-    #                 # Delete all other reactions if user already is in players dictionary
-    #                 # for this clash
-    #                 if user.name in self.clash_manager.players[clash.name]:
-    #                     await self.remove_reactions(
-    #                         user,
-    #                         message,
-    #                         self.clash_manager.players[clash.name][user.name],
-    #                     )
-    #                     await user.send("Only one position per player dummy.")
-    #                 else:
-    #                     if isinstance(reaction.emoji, str):
-    #                         emoji_name = reaction.emoji
-    #                     else:
-    #                         emoji_name = reaction.emoji.name
-    #                     position = Position.get_position(emoji_name)
-    #                     self.clash_manager.register_player(
-    #                         clash.name, user.name, position
-    #                     )
+    # -----------------------------------------------------
+    # CLASH CONSISTENCY CHECKS TO BE RUN AT THE LOGIN
+    # -----------------------------------------------------
+    async def collect_reactions(
+        self, clash: Clash
+    ) -> Optional[Dict[Tuple[int, Position], dc.abc.User]]:
+        """Pages through position reactions on the registration message of a clash.
+
+        Args:
+            clash (Clash): Clash whose registration message is read.
+
+        Returns:
+            Optional[Dict[Tuple[int, Position], dc.abc.User]]: User for each reacting
+            user id and position, None if the message is not available.
+        """
+        guild: Optional[dc.Guild] = self.get_guild(clash.guild_id)
+        if guild is None:
+            return None
+        channel: Optional[dc.TextChannel] = guild.get_channel(clash.clash_channel_id)
+        if channel is None:
+            return None
+        try:
+            message: dc.Message = await channel.fetch_message(clash.message_id)
+        except dc.NotFound:
+            return None
+
+        reactions = {}
+        for reaction in message.reactions:
+            if isinstance(reaction.emoji, str):
+                emoji_name = reaction.emoji
+            else:
+                emoji_name = reaction.emoji.name
+            position = Position.get_position(emoji_name)
+            if position is None:
+                continue
+
+            after = None
+            while True:
+                page = [
+                    user
+                    async for user in reaction.users(
+                        limit=REACTION_PAGE_SIZE, after=after
+                    )
+                ]
+                for user in page:
+                    if user != self.user:
+                        reactions[(user.id, position)] = user
+                if len(page) < REACTION_PAGE_SIZE:
+                    break
+                after = page[-1]
+        return reactions
+
+    async def sweep_clash(
+        self, clash_id: ObjectId, clash: Clash, positions: Optional[ClashPositions]
+    ) -> bool:
+        """Compares reactions of a clash with its stored positions and applies
+        the differences to the positions, roles and the status message.
+
+        Args:
+            clash_id (ObjectId): Id of the clash in DB.
+            clash (Clash): The clash.
+            positions (Optional[ClashPositions]): Stored positions of the clash.
+
+        Returns:
+            bool: True if the clash was corrected.
+        """
+        reactions = await self.collect_reactions(clash)
+        if reactions is None:
+            return False
+        stored = {
+            (record.player_id, record.position)
+            for record in (positions.players if positions is not None else [])
+        }
+        if stored == reactions.keys():
+            return False
+
+        added = [
+            PositionRecord(user.id, user.name, position)
+            for (user_id, position), user in reactions.items()
+            if (user_id, position) not in stored
+        ]
+        removed = list(stored - reactions.keys())
+        self.logger.info(
+            "Correcting %d registrations in %s.", len(added) + len(removed), clash.name
+        )
+        # Only the differences are applied to the current positions under the lock
+        # of the clash, so registrations made during the sweep are kept
+        corrected = await self.clash_repository.apply_position_changes(
+            clash_id, added, removed
+        )
+
+        # NOOB doesn't get player role and access to channel
+        with_role = {
+            r.player_id for r in corrected.players if r.position != Position.NOOB
+        }
+        changed = {r.player_id for r in added} | {player_id for player_id, _ in removed}
+        guild: dc.Guild = self.get_guild(clash.guild_id)
+        role: Optional[dc.Role] = guild.get_role(clash.role_id)
+        actions = []
+        if role is not None:
+            for member_id in changed:
+                member: Optional[dc.Member] = guild.get_member(member_id)
+                if member is None:
+                    continue
+                if member_id in with_role:
+                    actions.append(helpers.ignore_missing(member.add_roles(role)))
+                else:
+                    actions.append(helpers.ignore_missing(member.remove_roles(role)))
+        channel: Optional[dc.TextChannel] = guild.get_channel(clash.channel_id)
+        if channel is not None:
+            actions.append(
+                helpers.ignore_missing(
+                    channel.get_partial_message(clash.status_id).edit(
+                        content=helpers.show_players(corrected)
+                    )
+                )
+            )
+        await asyncio.gather(*actions)
+        return True
+
+    async def reconcile_reactions(self) -> None:
+        """Applies reactions added or removed while the bot was offline to the
+        positions of all clashes. Clashes are swept with bounded concurrency and
+        each has a time limit."""
+        clashes = await self.clash_repository.all_clashes()
+        positions = await self.clash_repository.positions_for_clashes(
+            [clash_id for clash_id, _ in clashes]
+        )
+        semaphore = asyncio.Semaphore(SWEEP_CONCURRENCY)
+        corrected = []
+
+        async def sweep(clash_id: ObjectId, clash: Clash) -> None:
+            async with semaphore:
+                try:
+                    changed = await asyncio.wait_for(
+                        self.sweep_clash(clash_id, clash, positions.get(clash_id)),
+                        SWEEP_CLASH_TIMEOUT,
+                    )
+                except Exception as error:  # pylint: disable=broad-except
+                    self.logger.error("Sweep of %s failed: %r", clash.name, error)
+                    return
+            if changed:
+                corrected.append(clash_id)
+
+        await asyncio.gather(*(sweep(clash_id, clash) for clash_id, clash in clashes))
+        self.logger.info(
+            "Reaction sweep corrected %d of %d clashes.", len(corrected), len(clashes)
+        )
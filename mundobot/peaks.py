@@ -0,0 +1,73 @@
+"""Module computing compact waveform peaks of sounds for drawing them in the web UI."""
+import subprocess
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+PEAK_COUNT = 200  # min/max pairs per sound, 400 bytes in total
+# Peaks do not need full quality, low sample rate makes decoding and reduction cheap
+DECODE_SAMPLE_RATE = 8000
+DECODE_TIMEOUT = 60  # seconds
+
+
+def decode_samples(path: Path) -> np.ndarray:
+    """Decodes a sound file to mono 16 bit samples with ffmpeg.
+
+    Args:
+        path (Path): Path of the sound file.
+
+    Raises:
+        subprocess.CalledProcessError: If the file can not be decoded.
+
+    Returns:
+        np.ndarray: Decoded samples.
+    """
+    result = subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-i", str(path), "-vn", "-ac", "1",
+            "-ar", str(DECODE_SAMPLE_RATE), "-f", "s16le", "-",
+        ],
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        check=True,
+        timeout=DECODE_TIMEOUT,
+    )
+    return np.frombuffer(result.stdout, dtype="<i2")
+
+
+def compute_peaks(samples: np.ndarray, count: int = PEAK_COUNT) -> bytes:
+    """Reduces samples to min/max envelope of equally long buckets.
+
+    Args:
+        samples (np.ndarray): Mono 16 bit samples.
+        count (int, optional): Number of buckets. Defaults to PEAK_COUNT.
+
+    Returns:
+        bytes: Interleaved int8 minimum and maximum of every bucket.
+    """
+    if samples.size == 0:
+        return bytes(2 * count)
+    # Last bucket is padded by repeating the last sample, so it does not add a false peak
+    bucket_size = -(-samples.size // count)
+    padded = np.pad(samples, (0, bucket_size * count - samples.size), mode="edge")
+    buckets = padded.reshape(count, bucket_size)
+    envelope = np.stack((buckets.min(axis=1), buckets.max(axis=1)), axis=1)
+    return (envelope >> 8).astype(np.int8).tobytes()
+
+
+def peaks_of_file(path: Path, count: int = PEAK_COUNT) -> Optional[bytes]:
+    """Computes waveform peaks of a sound file.
+
+    Args:
+        path (Path): Path of the sound file.
+        count (int, optional): Number of buckets. Defaults to PEAK_COUNT.
+
+    Returns:
+        Optional[bytes]: Peaks, None if the file can not be decoded.
+    """
+    try:
+        return compute_peaks(decode_samples(path), count)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return None
+
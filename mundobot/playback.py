@@ -1,16 +1,26 @@
 """Module containing playback related classes of PlaybackManager and PlaybackItem."""
 import asyncio
+import hashlib
+import os
 import re
+import tempfile
+import time
 from dataclasses import dataclass
 from pathlib import Path
 from queue import Queue
-from typing import Dict, List, Optional, Tuple
+from typing import BinaryIO, Dict, List, Optional, Tuple
 
 import discord as dc
+import gridfs
 import requests
+from bson import ObjectId
 from bson.binary import Binary
 from pymongo import MongoClient
 from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
+
+from mundobot.events import EventHub
+from mundobot.peaks import peaks_of_file
 
 
 @dataclass
@@ -29,26 +39,55 @@ class PlaybackStatus:
     stop: bool
 
 
-SOUND_NAME_REGEX = r"[a-zA-Z0-9.-_]+"
+SOUND_NAME_REGEX = r"[a-zA-Z0-9._-]+"
 DOWNLOAD_REGEX = r"https:\/\/drive\.google\.com\/uc\?((id=[\w-]+)|(export=download))&((id=[\w-]+)|(export=download))"
 MAX_LENGTH = 16000000
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+CHANNEL_SWITCH_TIME = 1.5  # seconds the bot waits after connecting to a channel
+ESTIMATED_BITRATE = 128000  # bits per second, used to estimate duration from size
 COMMON_SOUNDS = ["mundo", "hello-there", "badumtss", "mundo-say-name-often"]
 DISPLAYED_COMMON_SOUNDS = ["mundo", "hello-there", "badumtss"]
 
 
+def is_valid_sound_name(sound_name: str) -> bool:
+    """Checks if a name can be used for a new guild sound.
+
+    Args:
+        sound_name (str): Name of the sound.
+
+    Returns:
+        bool: True if the name is valid and not taken by a common sound.
+    """
+    return (
+        re.fullmatch(SOUND_NAME_REGEX, sound_name) is not None
+        and sound_name not in COMMON_SOUNDS
+    )
+
+
 class PlaybackManager:
     """Class responsible for downloading, caching and playing sounds in VoiceClients."""
 
     def __init__(
-        self, client: MongoClient, path: str, voice_clients: List[dc.VoiceClient]
+        self,
+        client: MongoClient,
+        path: str,
+        voice_clients: List[dc.VoiceClient],
+        event_hub: Optional[EventHub] = None,
     ) -> None:
         self.client = client
+        self.event_hub = event_hub
         self.sounds: Collection = client.bot.sounds
         self.sounds_data: Collection = client.bot.sounds_data
+        # Uploaded sounds are stored in chunks, older ones as single documents in sounds
+        self.sound_files = gridfs.GridFSBucket(client.bot, bucket_name="sound_files")
         self.voice_clients = voice_clients
         self.path = path
         self.playback_queue: Dict[int, Queue[PlaybackItem]] = {}
         self.playback_queue_handle: Dict[int, PlaybackStatus] = {}
+        # Estimated monotonic time when the currently played sound of a guild ends
+        self.playing_until: Dict[int, float] = {}
+        # Default sounds are not in the database, their peaks are kept in memory
+        self.default_peaks: Dict[str, bytes] = {}
 
     async def add_to_queue(
         self,
@@ -71,6 +110,14 @@ class PlaybackManager:
         # Put channel to a music queue
         for _ in range(num):
             self.playback_queue[guild_id].put(PlaybackItem(channel, sound_name))
+        self.publish(
+            guild_id,
+            "enqueue",
+            sound=sound_name,
+            channel_id=str(channel.id),
+            count=num,
+            queue_length=self.playback_queue[guild_id].qsize(),
+        )
 
         if guild_id not in self.playback_queue_handle:
             self.playback_queue_handle[guild_id] = PlaybackStatus(False, False)
@@ -85,8 +132,50 @@ class PlaybackManager:
         Args:
             guild (dc.Guild): Guild for which the playback should be stopped.
         """
-        self.playback_queue_handle[guild] = PlaybackStatus(True, True)
-        self.playback_queue[guild] = Queue()
+        self.playback_queue_handle[guild.id] = PlaybackStatus(True, True)
+        self.playback_queue[guild.id] = Queue()
+        self.publish(guild.id, "shutup")
+
+    def estimate_duration(self, sound_name: str, guild_id: int) -> float:
+        """Estimates duration of a sound from size of its file.
+
+        Args:
+            sound_name (str): Name of the sound.
+            guild_id (int): Id of the guild.
+
+        Returns:
+            float: Estimated duration in seconds, 0 if the sound is not cached.
+        """
+        path = self.find_sound(sound_name, guild_id, False)
+        if path is None:
+            return 0.0
+        return path.stat().st_size * 8 / ESTIMATED_BITRATE
+
+    def queue_status(self, guild_id: int) -> Tuple[int, float]:
+        """Gets length of the playback queue of a guild and estimated time
+        until everything in it is played.
+
+        Args:
+            guild_id (int): Id of the guild.
+
+        Returns:
+            Tuple[int, float]: Number of queued sounds and seconds to play them.
+        """
+        queue = self.playback_queue.get(guild_id)
+        items: List[PlaybackItem] = list(queue.queue) if queue is not None else []
+        eta = max(0.0, self.playing_until.get(guild_id, 0.0) - time.monotonic())
+        channel = None
+        for item in items:
+            if item.channel != channel:
+                eta += CHANNEL_SWITCH_TIME
+                channel = item.channel
+            eta += self.estimate_duration(item.sound, guild_id)
+        return len(items), eta
+
+    def publish(self, guild_id: int, event_type: str, **data) -> None:
+        """Publishes playback event of a guild if there is an event hub."""
+        if self.event_hub is not None:
+            self.event_hub.publish(guild_id, event_type, **data)
 
     async def play_from_queue(self, guild_id: int) -> None:
         """Play sound in next channel of the queue.
@@ -117,24 +206,35 @@ class PlaybackManager:
             # In case bot isn't connected to a voice_channel yet
             if voice_client is None:
                 voice_client = await playback_item.channel.connect()
-                await asyncio.sleep(1.5)
+                await asyncio.sleep(CHANNEL_SWITCH_TIME)
             # Else first disconnect bot from current channel and than connect it
             elif voice_client.channel is not playback_item.channel:
                 # Wait for current audio to stop playing
                 while voice_client.is_playing():
                     await asyncio.sleep(0.1)
                 await voice_client.move_to(playback_item.channel)
-                await asyncio.sleep(1.5)
+                await asyncio.sleep(CHANNEL_SWITCH_TIME)
 
+            sound = playback_item.sound
             if mundo_repetitions >= 5:
                 mundo_repetitions = 0
-                await self.play_sound(voice_client, "mundo-say-name-often", guild_id)
-            else:
-                await self.play_sound(voice_client, playback_item.sound, guild_id)
+                sound = "mundo-say-name-often"
+            self.publish(
+                guild_id,
+                "start",
+                sound=sound,
+                channel_id=str(playback_item.channel.id),
+                queue_length=self.playback_queue[guild_id].qsize(),
+            )
+            self.playing_until[guild_id] = time.monotonic() + self.estimate_duration(
+                sound, guild_id
+            )
+            await self.play_sound(voice_client, sound, guild_id)
 
             while voice_client.is_playing():
                 # Not clean but it iiiis what it iiiis
                 await asyncio.sleep(0.1)
+            self.publish(guild_id, "finish", sound=sound)
 
         if voice_client.is_connected():
             await voice_client.disconnect()
@@ -168,10 +268,7 @@ class PlaybackManager:
             bool: Success of the operation.
         """
         # Check if provided sound_name is valid
-        if (
-            re.match(SOUND_NAME_REGEX, sound_name) is None
-            or sound_name in COMMON_SOUNDS
-        ):
+        if not is_valid_sound_name(sound_name):
             return False
 
         # Check if the provided link is direct download link of google
@@ -254,14 +351,125 @@ class PlaybackManager:
         Returns:
             Path: Path of the saved cached sound.
         """
-        filepath = f"{self.path}/sounds/{guild_id}_{sound_name}.mp3"
-        path = Path(filepath)
+        path = self.local_cache_path(sound_name, guild_id)
         if not path.exists():
             path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_bytes(content)
+            # Readers never see a partially written sound, every writer has its own file
+            with tempfile.NamedTemporaryFile(
+                dir=path.parent, suffix=".tmp", delete=False
+            ) as temporary:
+                try:
+                    temporary.write(content)
+                except BaseException:
+                    os.unlink(temporary.name)
+                    raise
+            os.replace(temporary.name, path)
         return path
 
-    def transfer_from_database(self, sound_name: str, guild_id: int) -> Path:
+    def local_cache_path(self, sound_name: str, guild_id: int) -> Path:
+        """Gets path of a guild sound in local sound cache.
+
+        Args:
+            sound_name (str): Name of the sound.
+            guild_id (int): Id of the guild.
+
+        Returns:
+            Path: Path of the cached sound, it may not exist.
+        """
+        return Path(f"{self.path}/sounds/{guild_id}_{sound_name}.mp3")
+
+    def preview_cache_path(self, sound_name: str, guild_id: int) -> Path:
+        """Gets path of a cached preview rendition of a sound.
+
+        Args:
+            sound_name (str): Name of the sound.
+            guild_id (int): Id of the guild.
+
+        Returns:
+            Path: Path of the preview, it may not exist.
+        """
+        prefix = "default" if sound_name in COMMON_SOUNDS else guild_id
+        return Path(f"{self.path}/sounds/previews/{prefix}_{sound_name}.webm")
+
+    def sound_exists(self, sound_name: str, guild_id: int) -> bool:
+        """Checks if a guild already has a sound with given name.
+
+        Args:
+            sound_name (str): Name of the sound.
+            guild_id (int): Id of the guild.
+
+        Returns:
+            bool: True if the sound is stored in the database.
+        """
+        return (
+            self.sounds_data.find_one(
+                {"name": sound_name, "guild_id": guild_id}, {"_id": 1}
+            )
+            is not None
+        )
+
+    def save_upload(self, sound_name: str, guild_id: int, source: BinaryIO) -> bool:
+        """Saves an uploaded sound file to local sound cache and to the database.
+        The file is read once in chunks, hashed on the fly and never held in memory whole.
+
+        Args:
+            sound_name (str): Name of the sound unique for the guild.
+            guild_id (int): Id of the guild.
+            source (BinaryIO): Uploaded file.
+
+        Raises:
+            ValueError: If the file is larger than MAX_LENGTH.
+
+        Returns:
+            bool: Success of the operation, False if the sound already exists.
+        """
+        path = self.local_cache_path(sound_name, guild_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        length = 0
+        temporary_name = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                dir=path.parent, suffix=".tmp", delete=False
+            ) as temporary:
+                temporary_name = temporary.name
+                while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                    length += len(chunk)
+                    if length > MAX_LENGTH:
+                        raise ValueError("File too large")
+                    digest.update(chunk)
+                    temporary.write(chunk)
+                temporary.flush()
+                peaks = peaks_of_file(Path(temporary.name))
+
+                temporary.seek(0)
+                file_id = self.sound_files.upload_from_stream(
+                    f"{guild_id}_{sound_name}", temporary
+                )
+                sound_info = {
+                    "name": sound_name,
+                    "guild_id": guild_id,
+                    "file_id": file_id,
+                    "sha256": digest.hexdigest(),
+                    "length": length,
+                }
+                if peaks is not None:
+                    sound_info["peaks"] = Binary(peaks)
+                try:
+                    self.sounds_data.insert_one(sound_info)
+                except DuplicateKeyError:
+                    self.sound_files.delete(file_id)
+                    return False
+            os.replace(temporary_name, path)
+            temporary_name = None
+        finally:
+            # Temporary file of a failed or duplicate upload is not left behind
+            if temporary_name is not None:
+                os.unlink(temporary_name)
+        self.preview_cache_path(sound_name, guild_id).unlink(missing_ok=True)
+        return True
+
+    def transfer_from_database(self, sound_name: str, guild_id: int) -> Optional[Path]:
         """Transferes sound from database to local cache storage.
 
         Args:
@@ -269,15 +477,47 @@ class PlaybackManager:
             guild_id (int): Id of the guild.
 
         Returns:
-            Path: Path of the saved cached sound.
+            Optional[Path]: Path of the saved cached sound, None if it is not stored.
         """
         sound_info = self.sounds_data.find_one(
             {"name": sound_name, "guild_id": guild_id}
         )
+        if sound_info is None:
+            return None
+        if "file_id" in sound_info:
+            return self.transfer_chunks(sound_name, guild_id, sound_info["file_id"])
         sound = self.sounds.find_one({"_id": sound_info["sound_id"]})
+        if sound is None:
+            return None
 
         return self.save_to_local_cache(sound_name, guild_id, sound["data"])
 
+    def transfer_chunks(
+        self, sound_name: str, guild_id: int, file_id: ObjectId
+    ) -> Optional[Path]:
+        """Transferes sound stored in chunks to local cache storage chunk by chunk.
+
+        Args:
+            sound_name (str): Name of the sound.
+            guild_id (int): Id of the guild.
+            file_id (ObjectId): Id of the stored file.
+
+        Returns:
+            Optional[Path]: Path of the saved cached sound, None if it is not stored.
+        """
+        path = self.local_cache_path(sound_name, guild_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=path.parent, suffix=".tmp", delete=False
+        ) as temporary:
+            try:
+                self.sound_files.download_to_stream(file_id, temporary)
+            except gridfs.errors.NoFile:
+                os.unlink(temporary.name)
+                return None
+        os.replace(temporary.name, path)
+        return path
+
     def delete_sound(self, sound_name: str, guild_id: int) -> None:
         """Deletes a sound from database and local cache.
 
@@ -291,12 +531,55 @@ class PlaybackManager:
         res = self.sounds_data.find_one_and_delete(
             {"guild_id": guild_id, "name": sound_name}
         )
-        if res is not None:
+        if res is not None and "file_id" in res:
+            try:
+                self.sound_files.delete(res["file_id"])
+            except gridfs.errors.NoFile:
+                pass
+        elif res is not None:
             self.sounds.delete_one({"_id": res["sound_id"]})
 
         sound_path = self.find_sound(sound_name, guild_id, False)
         if sound_path is not None:
             sound_path.unlink()
+        self.preview_cache_path(sound_name, guild_id).unlink(missing_ok=True)
+
+    def get_peaks(self, sound_name: str, guild_id: int) -> Optional[bytes]:
+        """Gets waveform peaks of a sound, computing and storing them if missing.
+
+        Args:
+            sound_name (str): Name of the sound.
+            guild_id (int): Id of the guild.
+
+        Returns:
+            Optional[bytes]: Interleaved int8 min/max peaks, None if the sound does not exist
+            or can not be decoded.
+        """
+        if sound_name in COMMON_SOUNDS:
+            if sound_name not in self.default_peaks:
+                sound_path = self.find_sound(sound_name, guild_id, False)
+                peaks = peaks_of_file(sound_path) if sound_path is not None else None
+                if peaks is None:
+                    return None
+                self.default_peaks[sound_name] = peaks
+            return self.default_peaks[sound_name]
+
+        sound_info = self.sounds_data.find_one(
+            {"name": sound_name, "guild_id": guild_id}, {"peaks": 1}
+        )
+        if sound_info is None:
+            return None
+        if "peaks" in sound_info:
+            return bytes(sound_info["peaks"])
+
+        # Sounds saved before peaks were introduced get them on first request
+        sound_path = self.find_sound(sound_name, guild_id)
+        peaks = peaks_of_file(sound_path) if sound_path is not None else None
+        if peaks is not None:
+            self.sounds_data.update_one(
+                {"_id": sound_info["_id"]}, {"$set": {"peaks": Binary(peaks)}}
+            )
+        return peaks
 
     def list_sounds_for_guild(self, guild_id: int) -> Tuple[List[str], List[str]]:
         """Lists all sounds available for a server.
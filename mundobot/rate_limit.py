@@ -0,0 +1,117 @@
+"""Module providing token bucket rate limiters shared by outgoing and incoming requests."""
+import asyncio
+import time
+from typing import List, Optional, Tuple
+
+
+class TokenBucket:
+    """Token bucket allowing `capacity` acquisitions per `period` seconds.
+
+    Attributes:
+        capacity (int): Maximal number of tokens in the bucket.
+        period (float): Number of seconds in which the bucket refills completely.
+    """
+
+    def __init__(self, capacity: int, period: float) -> None:
+        self.capacity = capacity
+        self.period = period
+        self.tokens: float = capacity
+        self.updated = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        """Number of tokens refilled per second."""
+        return self.capacity / self.period
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, tokens: int = 1) -> float:
+        """Gets number of seconds until given number of tokens is available.
+
+        Args:
+            tokens (int, optional): Number of requested tokens. Defaults to 1.
+
+        Returns:
+            float: 0 if the tokens are available now, else seconds to wait.
+        """
+        self._refill(time.monotonic())
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    def try_acquire(self, tokens: int = 1) -> float:
+        """Tries to take tokens from the bucket without waiting.
+
+        Args:
+            tokens (int, optional): Number of tokens to take. Defaults to 1.
+
+        Returns:
+            float: 0 if the tokens were taken, else seconds until they will be available.
+        """
+        wait = self.wait_time(tokens)
+        if wait <= 0:
+            self.tokens -= tokens
+        return wait
+
+
+class RateLimiter:
+    """Set of token buckets that all have to allow a request before it is sent."""
+
+    def __init__(self, limits: Optional[List[Tuple[int, float]]] = None) -> None:
+        self.buckets: List[TokenBucket] = [
+            TokenBucket(capacity, period) for capacity, period in limits or []
+        ]
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    @staticmethod
+    def parse_limits(header: str) -> List[Tuple[int, float]]:
+        """Parses Riot rate limit header in form of "20:1,100:120".
+
+        Args:
+            header (str): Value of the X-App-Rate-Limit or X-Method-Rate-Limit header.
+
+        Returns:
+            List[Tuple[int, float]]: Pairs of (capacity, period in seconds).
+        """
+        limits = []
+        for limit in header.split(","):
+            capacity, period = limit.strip().split(":")
+            limits.append((int(capacity), float(period)))
+        return limits
+
+    def update_limits(self, header: Optional[str]) -> None:
+        """Replaces the buckets by limits announced by the server, keeping their state
+        if the limit did not change.
+
+        Args:
+            header (Optional[str]): Value of the rate limit header or None if missing.
+        """
+        if not header:
+            return
+        limits = self.parse_limits(header)
+        if limits == [(b.capacity, b.period) for b in self.buckets]:
+            return
+        self.buckets = [TokenBucket(capacity, period) for capacity, period in limits]
+
+    def penalize(self, retry_after: float) -> None:
+        """Blocks all requests for given number of seconds after a 429 response.
+
+        Args:
+            retry_after (float): Seconds to wait as sent by the server.
+        """
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    async def acquire(self) -> None:
+        """Waits until all buckets allow another request and takes a token from each."""
+        async with self.lock:
+            while True:
+                wait = max(
+                    [self.blocked_until - time.monotonic()]
+                    + [b.wait_time() for b in self.buckets]
+                )
+                if wait <= 0:
+                    for bucket in self.buckets:
+                        bucket.try_acquire()
+                    return
+                await asyncio.sleep(wait)
@@ -0,0 +1,195 @@
+"""Tests of creating Discord resources of a clash on a fake guild with many roles."""
+import asyncio
+import itertools
+import logging
+import time
+from types import SimpleNamespace
+
+import pytest
+
+dc = pytest.importorskip("discord")
+
+from mundobot.mundobot import MundoBot  # noqa: E402
+
+LATENCY = 0.05  # seconds of every fake Discord call
+ROLE_COUNT = 300
+ids = itertools.count(1)
+
+
+async def discord_call(result=None):
+    await asyncio.sleep(LATENCY)
+    return result
+
+
+class FakeRole:
+    """Role ordered by position like dc.Role."""
+
+    def __init__(self, name: str, position: int) -> None:
+        self.id = next(ids)
+        self.name = name
+        self.position = position
+        self.permissions = dc.Permissions.none()
+        self.deleted = False
+
+    def is_default(self) -> bool:
+        return self.position == 0
+
+    def __lt__(self, other) -> bool:
+        return self.position < other.position
+
+    def __ge__(self, other) -> bool:
+        return self.position >= other.position
+
+    async def delete(self) -> None:
+        self.deleted = await discord_call(True)
+
+
+class FakeMessage:
+    def __init__(self) -> None:
+        self.id = next(ids)
+        self.deleted = False
+
+    async def pin(self) -> None:
+        await discord_call()
+
+    async def delete(self) -> None:
+        self.deleted = await discord_call(True)
+
+
+class FakeChannel:
+    def __init__(self, name: str, overwrites=None) -> None:
+        self.id = next(ids)
+        self.name = name
+        self.overwrites = overwrites or {}
+        self.messages = []
+        self.deleted = False
+        self.fail_send = False
+
+    async def send(self, *_, **__) -> FakeMessage:
+        await discord_call()
+        if self.fail_send:
+            raise RuntimeError("Missing permissions")
+        self.messages.append(FakeMessage())
+        return self.messages[-1]
+
+    async def delete(self) -> None:
+        self.deleted = await discord_call(True)
+
+
+class FakeGuild:
+    def __init__(self, fail_channel: bool = False) -> None:
+        self.id = next(ids)
+        self.default_role = FakeRole("@everyone", 0)
+        self.roles = [self.default_role] + [
+            FakeRole(f"role {i}", i) for i in range(1, ROLE_COUNT)
+        ]
+        self.owner = SimpleNamespace(roles=[self.default_role, self.roles[-10]])
+        self.categories = []
+        self.text_channels = [FakeChannel("clash")]
+        self.fail_channel = fail_channel
+
+    async def create_role(self, name, **_) -> FakeRole:
+        role = await discord_call(FakeRole(name, len(self.roles)))
+        self.roles.append(role)
+        return role
+
+    async def create_text_channel(self, name, overwrites, **_) -> FakeChannel:
+        await discord_call()
+        if self.fail_channel:
+            raise RuntimeError("Maximum number of channels reached")
+        channel = FakeChannel(name.replace(" ", "-").lower(), overwrites)
+        self.text_channels.append(channel)
+        return channel
+
+
+class FakeRepository:
+    def __init__(self) -> None:
+        self.clashes = []
+
+    async def has_riot_clash(self, *_) -> bool:
+        return False
+
+    async def add_clash(self, clash, _) -> None:
+        self.clashes.append(clash)
+
+
+def fake_bot():
+    return SimpleNamespace(
+        clash_repository=FakeRepository(), logger=logging.getLogger("test")
+    )
+
+
+async def add_clash_sequentially(guild: FakeGuild, clash_name: str) -> FakeChannel:
+    """Calls made when creating a clash before the calls were made concurrently,
+    with an overwrite for every role of the guild."""
+    await guild.text_channels[0].send("announcement")
+    author_role = max(guild.owner.roles)
+    overwrites = {
+        role: dc.PermissionOverwrite(read_messages=role >= author_role)
+        for role in guild.roles
+    }
+    role = await guild.create_role(clash_name + " Player")
+    overwrites[role] = dc.PermissionOverwrite(read_messages=True)
+    channel = await guild.create_text_channel(clash_name, overwrites)
+    status = await channel.send("status")
+    await status.pin()
+    return channel
+
+
+def test_clash_creation_is_faster_with_smaller_payload():
+    before_guild = FakeGuild()
+    start = time.perf_counter()
+    before_channel = asyncio.run(add_clash_sequentially(before_guild, "Clash Cup"))
+    before = time.perf_counter() - start
+
+    after_guild = FakeGuild()
+    bot = fake_bot()
+    start = time.perf_counter()
+    asyncio.run(
+        MundoBot.add_clash_internal(bot, after_guild, "Clash Cup", "2024-01-20")
+    )
+    after = time.perf_counter() - start
+    after_channel = after_guild.text_channels[-1]
+
+    print(
+        f"\nBefore: {before * 1e3:.0f} ms, {len(before_channel.overwrites)} overwrites"
+        f"\nAfter: {after * 1e3:.0f} ms, {len(after_channel.overwrites)} overwrites"
+    )
+    assert len(bot.clash_repository.clashes) == 1
+    # Announcement is sent while the role, channel and status are created
+    assert after < before - LATENCY / 2
+    # Default role, ten roles from the owner's role up and the clash role
+    assert len(after_channel.overwrites) == 12
+    assert len(before_channel.overwrites) == ROLE_COUNT + 1
+
+
+def test_failed_channel_creation_deletes_created_resources():
+    guild = FakeGuild(fail_channel=True)
+    bot = fake_bot()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(MundoBot.add_clash_internal(bot, guild, "Clash Cup", "2024-01-20"))
+
+    created_role = guild.roles[-1]
+    assert created_role.name == "Clash Cup Player"
+    assert created_role.deleted
+    assert guild.text_channels[0].messages[0].deleted
+    assert bot.clash_repository.clashes == []
+
+
+def test_failed_announcement_deletes_channel_and_keeps_existing_role():
+    guild = FakeGuild()
+    existing_role = FakeRole("Clash Cup Player", ROLE_COUNT)
+    guild.roles.append(existing_role)
+    guild.text_channels[0].fail_send = True
+    bot = fake_bot()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(MundoBot.add_clash_internal(bot, guild, "Clash Cup", "2024-01-20"))
+
+    channel = guild.text_channels[-1]
+    assert channel.name == "clash-cup"
+    assert channel.deleted
+    assert channel.messages[0].deleted
+    assert not existing_role.deleted
+    assert bot.clash_repository.clashes == []
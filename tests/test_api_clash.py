@@ -0,0 +1,61 @@
+"""Tests of guild access checks of the clash API."""
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("discord")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from mundobot.api.api_clash import ClashRouter  # noqa: E402
+from mundobot.api.api_login import create_access_token  # noqa: E402
+from mundobot.clash.attendance import Attendance  # noqa: E402
+
+MEMBER_ID = 1
+OUTSIDER_ID = 2
+GUILD_ID = 10
+
+
+class MembershipBackend:
+    """Backend of a single guild with a single member and stored attendance."""
+
+    async def is_member(self, user_id: int, guild_id: int) -> bool:
+        return user_id == MEMBER_ID and guild_id == GUILD_ID
+
+    async def get_attendance(self, guild_id: int, player_id: int):
+        return Attendance(guild_id, player_id, "player", {}, 1, 0)
+
+
+@pytest.fixture(name="client")
+def fixture_client(monkeypatch):
+    monkeypatch.setenv("API_JWT_SECRET_KEY", "test")
+    app = FastAPI()
+    app.include_router(ClashRouter(MembershipBackend()).router)
+    return TestClient(app)
+
+
+def headers(user_id: int, guild_id=None):
+    token = create_access_token({"sub": str(user_id)}, timedelta(minutes=5))
+    result = {"Authorization": f"Bearer {token}"}
+    if guild_id is not None:
+        result["guild-id"] = str(guild_id)
+    return result
+
+
+def test_member_reads_attendance(client):
+    response = client.get(f"/clash/attendance/{OUTSIDER_ID}", headers=headers(MEMBER_ID, GUILD_ID))
+    assert response.status_code == 200
+    assert response.json()["clashes"] == 1
+
+
+def test_non_member_is_forbidden(client):
+    response = client.get(f"/clash/attendance/{MEMBER_ID}", headers=headers(OUTSIDER_ID, GUILD_ID))
+    assert response.status_code == 403
+
+
+def test_missing_guild_is_rejected(client):
+    response = client.get("/clash/attendance", headers=headers(MEMBER_ID))
+    assert response.status_code == 400
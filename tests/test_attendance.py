@@ -0,0 +1,95 @@
+"""Tests of incrementally maintained clash attendance rollups."""
+from datetime import datetime
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("discord")
+
+from mundobot.clash.clash import Clash  # noqa: E402
+from mundobot.clash.clashmanager import ClashManager  # noqa: E402
+from mundobot.clash.position import (  # noqa: E402
+    ClashPositions,
+    Position,
+    PositionRecord,
+)
+from mundobot.clash.write_behind import WriteBehindClashManager  # noqa: E402
+
+GUILD_ID = 1
+
+
+def add_clash(manager: ClashManager, name: str = "Clash Cup") -> object:
+    return manager.add_clash(
+        Clash(name, "20.01.2024", GUILD_ID, 2, 3, 4, 5, 6, date=datetime(2024, 1, 20))
+    )
+
+
+def test_backfilled_clash_is_completed_once():
+    manager = ClashManager(mongomock.MongoClient())
+    clash_id = add_clash(manager)
+    manager.positions.update_one(
+        {"clash_id": clash_id},
+        {"$set": {"players": [PositionRecord(10, "player", Position.MID).as_dict()]}},
+    )
+
+    manager.attendance.backfill()
+    manager.remove_clash("Clash Cup", GUILD_ID)
+
+    attendance = manager.get_attendance(GUILD_ID, 10)
+    assert attendance.positions == {"MID": 1}
+    assert attendance.clashes == 1
+
+
+def test_completion_is_counted_in_one_bulk_write(monkeypatch):
+    manager = ClashManager(mongomock.MongoClient())
+    bulk_writes = []
+    attendance = manager.attendance.attendance
+    bulk_write = attendance.bulk_write
+
+    def recording_bulk_write(requests, *args, **kwargs):
+        bulk_writes.append(len(requests))
+        return bulk_write(requests, *args, **kwargs)
+
+    monkeypatch.setattr(attendance, "bulk_write", recording_bulk_write)
+    players = [
+        PositionRecord(10, "player", Position.MID),
+        PositionRecord(10, "player", Position.NOOB),
+        PositionRecord(11, "noob", Position.NOOB),
+    ]
+
+    manager.attendance.record_completion(GUILD_ID, ClashPositions(None, players))
+    manager.attendance.record_completion(GUILD_ID, ClashPositions(None, []))
+
+    assert bulk_writes == [2]
+    assert manager.get_attendance(GUILD_ID, 10).clashes == 1
+    assert manager.get_attendance(GUILD_ID, 11).noob_clashes == 1
+
+
+def test_sweep_changes_are_counted():
+    manager = ClashManager(mongomock.MongoClient())
+    clash_id = add_clash(manager)
+    manager.register_player(clash_id, 10, "player", Position.MID)
+
+    manager.apply_position_changes(
+        clash_id,
+        [PositionRecord(11, "other", Position.TOP)],
+        [(10, Position.MID), (12, Position.BOT)],
+    )
+
+    assert manager.get_attendance(GUILD_ID, 10).positions == {"MID": 0}
+    assert manager.get_attendance(GUILD_ID, 11).positions == {"TOP": 1}
+    assert manager.get_attendance(GUILD_ID, 12) is None
+
+
+def test_write_behind_rollups_wait_for_flush(tmp_path):
+    manager = WriteBehindClashManager(
+        mongomock.MongoClient(), str(tmp_path / "journal")
+    )
+    clash_id = add_clash(manager)
+    manager.register_player(clash_id, 10, "player", Position.MID)
+    manager.register_player(clash_id, 10, "player", Position.FILL)
+    manager.unregister_player(clash_id, "player", Position.FILL)
+
+    assert manager.attendance.attendance.count_documents({}) == 0
+    manager.flush()
+    assert manager.get_attendance(GUILD_ID, 10).positions == {"MID": 1, "FILL": 0}
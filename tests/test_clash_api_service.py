@@ -0,0 +1,88 @@
+"""Tests of ClashApiService against a stand-in Riot API server."""
+import asyncio
+import time
+
+import pytest
+
+web = pytest.importorskip("aiohttp.web")
+pytest.importorskip("discord")
+pytest.importorskip("dotenv")
+
+from mundobot.clash import clash_api_service  # noqa: E402
+from mundobot.clash.clash_api_service import (  # noqa: E402
+    ClashApiService,
+    RiotApiError,
+    TOURNAMENTS_PATH,
+)
+
+TOURNAMENT = {
+    "id": 1,
+    "nameKey": "bilgewater",
+    "nameKeySecondary": "day_1",
+    "schedule": [{"startTime": 1700000000000}],
+}
+
+
+async def serve(responses):
+    """Starts server answering tournament requests with given responses in order.
+
+    Returns runner, base url and list of monotonic times of received requests.
+    """
+    requests = []
+
+    async def tournaments(_):
+        requests.append(time.monotonic())
+        status, headers = responses[min(len(requests), len(responses)) - 1]
+        if status == 200:
+            return web.json_response([TOURNAMENT], headers=headers)
+        return web.Response(status=status, headers=headers)
+
+    app = web.Application()
+    app.router.add_get("/{region}" + TOURNAMENTS_PATH, tournaments)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}/{{region}}", requests
+
+
+def test_rate_limited_request_waits_for_retry_after():
+    async def run():
+        runner, base_url, requests = await serve(
+            [(429, {"Retry-After": "0.3"}), (200, {})]
+        )
+        service = ClashApiService("key", base_url)
+        try:
+            clashes = await service.get_clashes("eun1")
+        finally:
+            await service.close()
+            await runner.cleanup()
+        return clashes, requests
+
+    clashes, requests = asyncio.run(run())
+    assert [clash.id for clash in clashes] == [1]
+    assert len(requests) == 2
+    assert requests[1] - requests[0] >= 0.3
+
+
+def test_server_errors_back_off_and_raise_last_status(monkeypatch):
+    monkeypatch.setattr(clash_api_service, "SERVER_ERROR_BACKOFF", 0.2)
+
+    async def run():
+        runner, base_url, requests = await serve([(503, {})])
+        service = ClashApiService("key", base_url)
+        try:
+            with pytest.raises(RiotApiError) as error:
+                await service.get_clashes("eun1")
+        finally:
+            await service.close()
+            await runner.cleanup()
+        return error.value, requests
+
+    error, requests = asyncio.run(run())
+    assert error.status == 503
+    assert len(requests) == clash_api_service.MAX_RETRIES
+    # Delays are at least half of 0.2 and 0.4 seconds
+    assert requests[1] - requests[0] >= 0.1
+    assert requests[2] - requests[1] >= 0.2
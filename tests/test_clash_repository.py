@@ -0,0 +1,64 @@
+"""Tests of registrations racing with removal of their clash."""
+import asyncio
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("discord")
+
+from mundobot.clash.clash import Clash  # noqa: E402
+from mundobot.clash.clash_repository import AsyncClashRepository  # noqa: E402
+from mundobot.clash.clashmanager import ClashManager  # noqa: E402
+from mundobot.clash.position import Position  # noqa: E402
+from mundobot.clash.write_behind import WriteBehindClashManager  # noqa: E402
+
+
+def race_registration_with_removal(manager: ClashManager):
+    repository = AsyncClashRepository(manager)
+    clash_id = manager.add_clash(Clash("Clash Cup", "20.01.2024", 1, 2, 3, 4, 5, 6))
+
+    async def run():
+        return await asyncio.gather(
+            repository.remove_clash("Clash Cup", 1),
+            repository.register_player(clash_id, 10, "player", Position.MID),
+        )
+
+    try:
+        removed, positions = asyncio.run(run())
+    finally:
+        repository.close()
+    return clash_id, removed, positions
+
+
+def test_registration_racing_removal_leaves_no_positions():
+    manager = ClashManager(mongomock.MongoClient())
+    clash_id, removed, positions = race_registration_with_removal(manager)
+
+    assert removed.name == "Clash Cup"
+    assert positions.clash_id == clash_id
+    assert manager.positions.find_one({"clash_id": clash_id}) is None
+    assert manager.attendance.attendance.count_documents({"guild_id": None}) == 0
+
+
+def test_registration_after_removal_is_ignored():
+    manager = ClashManager(mongomock.MongoClient())
+    clash_id = manager.add_clash(Clash("Clash Cup", "20.01.2024", 1, 2, 3, 4, 5, 6))
+    manager.remove_clash("Clash Cup", 1)
+
+    positions = manager.register_player(clash_id, 10, "player", Position.MID)
+    assert positions.players == []
+    assert manager.unregister_player(clash_id, "player", Position.MID).players == []
+    assert manager.positions.find_one({"clash_id": clash_id}) is None
+    assert manager.attendance.attendance.count_documents({}) == 0
+
+
+def test_write_behind_registration_after_removal_is_not_written(tmp_path):
+    manager = WriteBehindClashManager(
+        mongomock.MongoClient(), str(tmp_path / "journal")
+    )
+    clash_id, _, _ = race_registration_with_removal(manager)
+    manager.flush()
+
+    assert clash_id not in manager.positions_cache
+    assert manager.positions.find_one({"clash_id": clash_id}) is None
+    assert manager.pending == []
@@ -0,0 +1,49 @@
+"""Load test of publishing live events to many subscribers."""
+import asyncio
+import time
+
+from mundobot.events import EventHub, Subscription
+
+SUBSCRIBER_COUNT = 1000
+EVENT_COUNT = 1000
+# Far below what the hub delivers, so slow machines pass and only regressions fail
+MIN_DELIVERIES_PER_SECOND = 20000
+
+
+def test_thousand_subscribers_with_one_stalled():
+    async def run():
+        hub = EventHub()
+        subscriptions = [hub.subscribe(1) for _ in range(SUBSCRIBER_COUNT)]
+        stalled, readers = subscriptions[0], subscriptions[1:]
+
+        async def read(subscription: Subscription) -> int:
+            for _ in range(EVENT_COUNT):
+                await subscription.get()
+            return EVENT_COUNT
+
+        tasks = [asyncio.create_task(read(x)) for x in readers]
+        start = time.perf_counter()
+        for i in range(EVENT_COUNT):
+            hub.publish(1, "test", index=i)
+            # Let readers run between events, as network sends would
+            await asyncio.sleep(0)
+        received = sum(await asyncio.wait_for(asyncio.gather(*tasks), 60))
+        return hub, stalled, received, time.perf_counter() - start
+
+    hub, stalled, received, duration = asyncio.run(run())
+    assert received == (SUBSCRIBER_COUNT - 1) * EVENT_COUNT
+    assert received / duration > MIN_DELIVERIES_PER_SECOND
+    # Subscriber that never reads keeps only the newest events
+    assert len(stalled.buffer) == hub.buffer_size
+    assert stalled.dropped == EVENT_COUNT - hub.buffer_size
+    assert stalled.buffer[-1]["index"] == EVENT_COUNT - 1
+
+
+def test_closed_subscription_receives_nothing():
+    hub = EventHub()
+    subscription = hub.subscribe(1)
+    subscription.close()
+    hub.publish(1, "test")
+
+    assert not subscription.buffer
+    assert not hub.subscribers
@@ -0,0 +1,111 @@
+"""Tests of serving sound files with ETags, conditional GET and range requests."""
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from mundobot.api.file_serving import ContentEtags, parse_range, serve_file  # noqa: E402
+
+CONTENT = bytes(range(100))
+
+
+@pytest.fixture(name="client")
+def fixture_client(tmp_path):
+    (tmp_path / "sound.mp3").write_bytes(CONTENT)
+    (tmp_path / "empty.mp3").write_bytes(b"")
+    etags = ContentEtags()
+    app = FastAPI()
+
+    @app.get("/{name}")
+    async def sound(request: Request, name: str):
+        return await serve_file(request, tmp_path / name, "audio/mp3", etags)
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("bytes=0-9", (0, 9)),
+        ("bytes=90-", (90, 99)),
+        ("bytes=90-200", (90, 99)),
+        ("bytes=-10", (90, 99)),
+        ("bytes=-200", (0, 99)),
+        ("bytes=5-3", None),
+        ("bytes=0-1,5-6", None),
+        ("items=0-1", None),
+        ("bytes=-", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert parse_range(header, len(CONTENT)) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=-0"])
+def test_parse_unsatisfiable_range(header):
+    with pytest.raises(ValueError):
+        parse_range(header, len(CONTENT))
+
+
+def test_whole_file(client):
+    response = client.get("/sound.mp3")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"]
+
+
+def test_range(client):
+    response = client.get("/sound.mp3", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[10:20]
+    assert response.headers["content-range"] == "bytes 10-19/100"
+
+
+def test_suffix_range(client):
+    response = client.get("/sound.mp3", headers={"Range": "bytes=-5"})
+    assert response.status_code == 206
+    assert response.content == CONTENT[-5:]
+    assert response.headers["content-range"] == "bytes 95-99/100"
+
+
+def test_not_modified(client):
+    etag = client.get("/sound.mp3").headers["etag"]
+    response = client.get("/sound.mp3", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_unsatisfiable_range(client):
+    response = client.get("/sound.mp3", headers={"Range": "bytes=100-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */100"
+
+
+def test_invalid_range_sends_whole_file(client):
+    response = client.get("/sound.mp3", headers={"Range": "bytes=5-3"})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_range_of_empty_file_sends_it_whole(client):
+    response = client.get("/empty.mp3", headers={"Range": "bytes=0-"})
+    assert response.status_code == 200
+    assert response.content == b""
+
+
+def test_mismatched_if_range_sends_whole_file(client):
+    etag = client.get("/sound.mp3").headers["etag"]
+    response = client.get(
+        "/sound.mp3", headers={"Range": "bytes=0-9", "If-Range": '"other"'}
+    )
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+    response = client.get("/sound.mp3", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.content == CONTENT[:10]
@@ -0,0 +1,37 @@
+"""Tests of helpers choosing regular players to notify of a clash."""
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("discord")
+
+from mundobot import helpers  # noqa: E402
+from mundobot.clash.clash import Clash  # noqa: E402
+from mundobot.clash.position import Position, PositionRecord  # noqa: E402
+
+PLAYERS = [
+    PositionRecord(1, "playing", Position.MID),
+    PositionRecord(2, "declined", Position.NOOB),
+    PositionRecord(3, "both", Position.NOOB),
+    PositionRecord(3, "both", Position.FILL),
+]
+
+
+def test_players_who_answered_noob_are_not_reminded():
+    assert helpers.get_players_to_remind(PLAYERS, [1, 2, 3, 4]) == {4}
+
+
+def test_all_regular_players_are_reminded_of_empty_clash():
+    assert helpers.get_players_to_remind([], [1, 2]) == {1, 2}
+
+
+def test_notification_mentions_players_who_answered_noob():
+    clash = Clash("Clash Cup", "20.01.2024", 1, 2, 3, 4, 5, 6, date=datetime.now())
+
+    notification = helpers.get_notification(PLAYERS, clash, [1, 2, 3, 4])
+
+    mentions = notification.split("Stále neodpověděli: \n")[1]
+    assert "<@2>" in mentions
+    assert "<@4>" in mentions
+    assert "<@1>" not in mentions
+    assert "<@3>" not in mentions
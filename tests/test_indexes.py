@@ -0,0 +1,88 @@
+"""Tests that hot queries use the declared indexes on populated collections.
+
+They need a throwaway MongoDB server given by MONGO_TEST_CONNECTION_STRING,
+its clash and bot databases are dropped.
+"""
+import os
+
+import pytest
+
+pymongo = pytest.importorskip("pymongo")
+pytest.importorskip("discord")
+
+from mundobot.indexes import (  # noqa: E402
+    HOT_QUERIES,
+    INDEXES,
+    ensure_indexes,
+    find_collection_scans,
+)
+
+DOCUMENT_COUNT = 1000
+GUILD_COUNT = 20
+
+
+def seed_document(index: int):
+    """Creates document having every field filtered by a hot query."""
+    return {
+        "guild_id": index % GUILD_COUNT,
+        "name": f"sound-{index}",
+        "clash_channel_id": index,
+        "message_id": index,
+        "riot_id": index,
+        "clash_id": index,
+        "notified": index % 2 == 0,
+        "time": index,
+        "server_id": index,
+        "player_id": index,
+        "active": index % 3 == 0,
+    }
+
+
+def is_index_prefix(query) -> bool:
+    """Checks that filtered fields of a query are a prefix of a declared index."""
+    fields = set(query.filter)
+    return any(
+        {key for key, _ in spec.keys[: len(fields)]} == fields
+        for spec in INDEXES
+        if (spec.database, spec.collection) == (query.database, query.collection)
+    )
+
+
+@pytest.fixture(name="client")
+def fixture_client():
+    connection_string = os.environ.get("MONGO_TEST_CONNECTION_STRING")
+    if not connection_string:
+        pytest.skip("MONGO_TEST_CONNECTION_STRING is not set")
+    client = pymongo.MongoClient(connection_string, serverSelectionTimeoutMS=2000)
+    for database in {query.database for query in HOT_QUERIES}:
+        client.drop_database(database)
+    for database, collection in {(q.database, q.collection) for q in HOT_QUERIES}:
+        client[database][collection].insert_many(
+            [seed_document(index) for index in range(DOCUMENT_COUNT)]
+        )
+    yield client
+    for database in {query.database for query in HOT_QUERIES}:
+        client.drop_database(database)
+    client.close()
+
+
+def test_hot_queries_are_index_prefixes():
+    assert [query for query in HOT_QUERIES if not is_index_prefix(query)] == []
+
+
+def test_hot_queries_use_indexes(client):
+    ensure_indexes(client)
+    assert find_collection_scans(client) == []
+
+
+def test_missing_index_is_reported(client):
+    ensure_indexes(client)
+    client.clash.attendance.drop_indexes()
+    scans = find_collection_scans(client)
+    assert [(q.database, q.collection) for q in scans] == [("clash", "attendance")]
+
+
+def test_unreachable_server_is_logged():
+    client = pymongo.MongoClient("mongodb://127.0.0.1:1", serverSelectionTimeoutMS=100)
+    assert ensure_indexes(client) == []
+    client.close()
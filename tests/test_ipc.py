@@ -0,0 +1,156 @@
+"""Round-trip tests of IPC between the bot and API processes over a Unix socket."""
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("discord")
+
+from mundobot import ipc  # noqa: E402
+from mundobot.ipc import IpcClient, IpcError, IpcServer, encode  # noqa: E402
+
+
+async def echo(value, delay=0.0):
+    await asyncio.sleep(delay)
+    return value
+
+
+async def fail():
+    raise RuntimeError("broken handler")
+
+
+def run_with_server(socket_path, test, handlers=None, error_mapper=None):
+    """Runs test coroutine function with a started server and a client."""
+
+    async def run():
+        server = IpcServer(
+            str(socket_path), handlers or {"echo": echo, "fail": fail}, error_mapper
+        )
+        await server.start()
+        events = []
+        client = IpcClient(
+            str(socket_path), lambda guild_id, event: events.append((guild_id, event))
+        )
+        try:
+            return await test(server, client, events)
+        finally:
+            await client.close()
+            server.close()
+
+    return asyncio.run(run())
+
+
+def test_concurrent_calls_share_connection(tmp_path):
+    async def test(_, client, __):
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(client.call("echo", value=i, delay=0.2) for i in range(20))
+        )
+        return results, time.perf_counter() - start
+
+    results, duration = run_with_server(tmp_path / "ipc.sock", test)
+    assert results == list(range(20))
+    # Calls were answered concurrently, one by one they would take 4 seconds
+    assert duration < 1
+
+
+def test_handler_error_is_returned(tmp_path):
+    async def test(_, client, __):
+        with pytest.raises(IpcError) as error:
+            await client.call("fail")
+        with pytest.raises(IpcError):
+            await client.call("missing")
+        # Connection stays usable after errors
+        return error.value, await client.call("echo", value="ok")
+
+    error, result = run_with_server(tmp_path / "ipc.sock", test)
+    assert "broken handler" in str(error)
+    assert result == "ok"
+
+
+def test_http_errors_are_raised_in_worker(tmp_path):
+    pytest.importorskip("fastapi")
+    from fastapi import HTTPException
+    from pymongo import MongoClient
+
+    from mundobot.api.backend import RemoteBackend, http_error
+
+    async def not_found():
+        raise HTTPException(status_code=404, detail="Sound not found")
+
+    socket_path = str(tmp_path / "ipc.sock")
+
+    async def test(*_):
+        backend = RemoteBackend(
+            socket_path, MongoClient("mongodb://127.0.0.1:1", connect=False), "/tmp"
+        )
+        await backend.start()
+        try:
+            with pytest.raises(HTTPException) as error:
+                await backend.call("not_found")
+        finally:
+            await backend.close()
+        return error.value
+
+    error = run_with_server(socket_path, test, {"not_found": not_found}, http_error)
+    assert error.status_code == 404
+    assert error.detail == "Sound not found"
+
+
+def test_events_are_pushed_to_subscribers(tmp_path):
+    async def test(server, client, events):
+        await client.connect()
+        server.push_event(1, {"type": "enqueue", "sound": "mundo"})
+        for _ in range(100):
+            if events:
+                break
+            await asyncio.sleep(0.01)
+        return events
+
+    events = run_with_server(tmp_path / "ipc.sock", test)
+    assert events == [(1, {"type": "enqueue", "sound": "mundo"})]
+
+
+def test_malformed_request_closes_only_its_connection(tmp_path):
+    socket_path = str(tmp_path / "ipc.sock")
+
+    async def test(_, client, __):
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        writer.write(encode({"method": "echo", "params": {"value": 1}}))
+        closed = await asyncio.wait_for(reader.read(), 1)
+        writer.close()
+        return closed, await client.call("echo", value=2)
+
+    closed, result = run_with_server(socket_path, test)
+    assert closed == b""
+    assert result == 2
+
+
+def test_call_times_out(tmp_path, monkeypatch):
+    monkeypatch.setattr(ipc, "CALL_TIMEOUT", 0.1)
+
+    async def test(_, client, __):
+        with pytest.raises(asyncio.TimeoutError):
+            await client.call("echo", value=1, delay=1)
+        return client.pending
+
+    assert not run_with_server(tmp_path / "ipc.sock", test)
+
+
+def test_client_reconnects_after_server_restart(tmp_path):
+    socket_path = str(tmp_path / "ipc.sock")
+
+    async def test(server, client, _):
+        assert await client.call("echo", value=1) == 1
+        server.close()
+        # Closing the listener keeps accepted connections, drop the client's one
+        client.writer.close()
+        await asyncio.sleep(0.05)
+        restarted = IpcServer(socket_path, {"echo": echo})
+        await restarted.start()
+        try:
+            return await client.call("echo", value=2)
+        finally:
+            restarted.close()
+
+    assert run_with_server(socket_path, test) == 2
@@ -0,0 +1,77 @@
+"""Tests of leader failover fencing clash notifications."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("discord")
+
+from mundobot.clash.notification_scheduler import NotificationScheduler  # noqa: E402
+from mundobot.leader_lease import LeaderLease  # noqa: E402
+
+LEASE_DURATION = 10  # seconds
+
+
+class FakeClock:
+    """Clock moved forward only by the test."""
+
+    def __init__(self) -> None:
+        self.now = datetime(2024, 1, 1)
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += timedelta(seconds=seconds)
+
+
+async def send(_):
+    return set()
+
+
+def test_expired_leader_cannot_claim_after_failover():
+    client = mongomock.MongoClient()
+    clock = FakeClock()
+    first = LeaderLease(client.bot.locks, "clash", "first", LEASE_DURATION, clock)
+    second = LeaderLease(client.bot.locks, "clash", "second", LEASE_DURATION, clock)
+    notifications = client.clash.notifications
+    notification_id = notifications.insert_one(
+        {"clash_id": 1, "time": datetime(2024, 1, 1), "notified": False}
+    ).inserted_id
+
+    assert first.acquire()
+    first_token = first.token
+    assert not second.acquire()
+    first_scheduler = NotificationScheduler(notifications, send, lambda: first_token)
+    asyncio.run(first_scheduler.load())
+
+    # First leader pauses past its lease, second one takes over and fences
+    clock.advance(LEASE_DURATION + 1)
+    assert second.acquire()
+    assert second.token > first_token
+    second_scheduler = NotificationScheduler(
+        notifications, send, lambda: second.fencing_token
+    )
+    asyncio.run(second_scheduler.load())
+
+    assert not first_scheduler.claim(notification_id, first_token)
+    assert not first.is_valid(first_token)
+    assert not first.renew()
+    assert second_scheduler.claim(notification_id, second.fencing_token)
+    assert notifications.find_one({"_id": notification_id})["lease_token"] == (
+        second.token
+    )
+
+
+def test_claim_is_not_repeated():
+    client = mongomock.MongoClient()
+    notifications = client.clash.notifications
+    notification_id = notifications.insert_one(
+        {"clash_id": 1, "time": datetime(2024, 1, 1), "notified": False}
+    ).inserted_id
+    scheduler = NotificationScheduler(notifications, send, lambda: 1)
+    asyncio.run(scheduler.load())
+
+    assert scheduler.claim(notification_id, 1)
+    assert not scheduler.claim(notification_id, 1)
@@ -0,0 +1,142 @@
+"""Tests of leader failover between two bot processes sharing a MongoDB server.
+
+They need a throwaway MongoDB server given by MONGO_TEST_CONNECTION_STRING,
+its mundobot_test_failover database is dropped.
+"""
+import asyncio
+from datetime import datetime
+import multiprocessing
+import os
+import time
+
+import pytest
+
+pymongo = pytest.importorskip("pymongo")
+pytest.importorskip("discord")
+
+from mundobot.clash.notification_scheduler import NotificationScheduler  # noqa: E402
+from mundobot.leader_lease import LeaderLease  # noqa: E402
+
+DATABASE = "mundobot_test_failover"
+LEASE_DURATION = 1  # seconds
+TIMEOUT = 10  # seconds
+
+# Forked children open their own clients, as recommended by pymongo
+context = multiprocessing.get_context("fork")
+
+
+async def send(_):
+    return set()
+
+
+def open_database(connection_string: str):
+    client = pymongo.MongoClient(connection_string, serverSelectionTimeoutMS=2000)
+    return client, client[DATABASE]
+
+
+def race_for_lease(connection_string, holder, barrier, results) -> None:
+    """Acquires the lease at the same moment as the other process."""
+    client, database = open_database(connection_string)
+    lease = LeaderLease(database.locks, "clash", holder, LEASE_DURATION)
+    barrier.wait(TIMEOUT)
+    results.put((holder, lease.acquire(), lease.token))
+    client.close()
+
+
+def paused_leader(connection_string, notification_id, taken_over, results) -> None:
+    """Takes the lease, pauses past its expiry and then tries to send."""
+    client, database = open_database(connection_string)
+    lease = LeaderLease(database.locks, "clash", "first", LEASE_DURATION)
+    acquired = lease.acquire()
+    token = lease.token
+    scheduler = NotificationScheduler(database.notifications, send, lambda: token)
+    asyncio.run(scheduler.load())
+    results.put(("acquired", acquired, token))
+    taken_over.wait(TIMEOUT)
+    results.put(("claimed", scheduler.claim(notification_id, token), token))
+    client.close()
+
+
+def new_leader(connection_string, taken_over, results) -> None:
+    """Takes over the expired lease and fences the pending notifications."""
+    client, database = open_database(connection_string)
+    lease = LeaderLease(database.locks, "clash", "second", LEASE_DURATION)
+    acquired = lease.acquire()
+    scheduler = NotificationScheduler(
+        database.notifications, send, lambda: lease.fencing_token
+    )
+    asyncio.run(scheduler.load())
+    results.put(("took over", acquired, lease.token))
+    taken_over.set()
+    client.close()
+
+
+def join(*processes) -> None:
+    for process in processes:
+        process.join(TIMEOUT)
+        assert process.exitcode == 0
+
+
+@pytest.fixture(name="connection_string")
+def fixture_connection_string():
+    connection_string = os.environ.get("MONGO_TEST_CONNECTION_STRING")
+    if not connection_string:
+        pytest.skip("MONGO_TEST_CONNECTION_STRING is not set")
+    client = pymongo.MongoClient(connection_string, serverSelectionTimeoutMS=2000)
+    client.drop_database(DATABASE)
+    yield connection_string
+    client.drop_database(DATABASE)
+    client.close()
+
+
+def test_only_one_process_acquires_lease(connection_string):
+    barrier = context.Barrier(2)
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=race_for_lease, args=(connection_string, holder, barrier, results)
+        )
+        for holder in ("first", "second")
+    ]
+    for process in processes:
+        process.start()
+    join(*processes)
+
+    outcomes = [results.get(timeout=TIMEOUT) for _ in processes]
+    assert [acquired for _, acquired, _ in outcomes].count(True) == 1
+    assert [token for _, acquired, token in outcomes if acquired] == [1]
+
+
+def test_paused_leader_cannot_send_after_failover(connection_string):
+    client, database = open_database(connection_string)
+    notification_id = database.notifications.insert_one(
+        {"clash_id": 1, "time": datetime(2024, 1, 1), "notified": False}
+    ).inserted_id
+    taken_over = context.Event()
+    results = context.Queue()
+
+    first = context.Process(
+        target=paused_leader,
+        args=(connection_string, notification_id, taken_over, results),
+    )
+    first.start()
+    assert results.get(timeout=TIMEOUT)[:2] == ("acquired", True)
+
+    # The first process is paused past its lease before the second one starts
+    time.sleep(LEASE_DURATION + 0.5)
+    second = context.Process(
+        target=new_leader, args=(connection_string, taken_over, results)
+    )
+    second.start()
+    join(second, first)
+
+    outcomes = {}
+    for _ in range(2):
+        name, done, token = results.get(timeout=TIMEOUT)
+        outcomes[name] = (done, token)
+    assert outcomes["took over"] == (True, 2)
+    assert outcomes["claimed"] == (False, 1)
+    document = database.notifications.find_one({"_id": notification_id})
+    assert document["notified"] is False
+    assert document["lease_token"] == 2
+    client.close()
@@ -0,0 +1,120 @@
+"""Tests of resending clash notifications that failed to send."""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("discord")
+
+from mundobot.clash import notification_scheduler  # noqa: E402
+from mundobot.clash.notification_scheduler import NotificationScheduler  # noqa: E402
+
+
+class FlakySender:
+    """Send coroutine failing a given number of times before it succeeds."""
+
+    def __init__(self, failures: int) -> None:
+        self.failures = failures
+        self.sent = []
+
+    async def __call__(self, clash_ids):
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("Discord is down")
+        self.sent.append(clash_ids)
+        return set()
+
+
+def insert_due(notifications, clash_id):
+    return notifications.insert_one(
+        {"clash_id": clash_id, "time": datetime(2024, 1, 1), "notified": False}
+    ).inserted_id
+
+
+def test_failed_send_is_released_and_retried(monkeypatch):
+    monkeypatch.setattr(notification_scheduler, "SEND_RETRY_DELAY", 0)
+    notifications = mongomock.MongoClient().clash.notifications
+    notification_id = insert_due(notifications, 1)
+    sender = FlakySender(1)
+    scheduler = NotificationScheduler(notifications, sender, lambda: 1)
+    asyncio.run(scheduler.load())
+
+    asyncio.run(scheduler.fire_due())
+    assert sender.sent == []
+    assert notifications.find_one({"_id": notification_id})["notified"] is False
+    assert [entry[1] for entry in scheduler.heap] == [notification_id]
+
+    asyncio.run(scheduler.fire_due())
+    assert sender.sent == [[1]]
+    assert notifications.find_one({"_id": notification_id})["notified"] is True
+    assert scheduler.heap == []
+    assert scheduler.failures == {}
+
+
+def test_retry_backs_off():
+    notifications = mongomock.MongoClient().clash.notifications
+    insert_due(notifications, 1)
+    scheduler = NotificationScheduler(notifications, FlakySender(2), lambda: 1)
+    asyncio.run(scheduler.load())
+
+    before = datetime.now()
+    asyncio.run(scheduler.fire_due())
+    first_retry = scheduler.heap[0][0]
+    assert first_retry >= before + timedelta(
+        seconds=notification_scheduler.SEND_RETRY_DELAY
+    )
+
+    scheduler.heap = [(datetime(2024, 1, 1),) + scheduler.heap[0][1:]]
+    asyncio.run(scheduler.fire_due())
+    assert scheduler.heap[0][0] >= before + timedelta(
+        seconds=2 * notification_scheduler.SEND_RETRY_DELAY
+    )
+
+
+def test_release_keeps_claim_of_newer_leader():
+    notifications = mongomock.MongoClient().clash.notifications
+    notification_id = insert_due(notifications, 1)
+    scheduler = NotificationScheduler(notifications, FlakySender(0), lambda: 2)
+
+    assert scheduler.claim(notification_id, 2)
+    scheduler.release([notification_id], 1)
+    assert notifications.find_one({"_id": notification_id})["notified"] is True
+
+
+def test_only_failed_clashes_are_retried(monkeypatch):
+    monkeypatch.setattr(notification_scheduler, "SEND_RETRY_DELAY", 0)
+    notifications = mongomock.MongoClient().clash.notifications
+    sent_id = insert_due(notifications, 1)
+    failed_id = insert_due(notifications, 2)
+    sent = []
+
+    async def send(clash_ids):
+        sent.append(sorted(clash_ids))
+        return {2} if len(sent) == 1 else set()
+
+    scheduler = NotificationScheduler(notifications, send, lambda: 1)
+    asyncio.run(scheduler.load())
+
+    asyncio.run(scheduler.fire_due())
+    assert notifications.find_one({"_id": sent_id})["notified"] is True
+    assert notifications.find_one({"_id": failed_id})["notified"] is False
+    assert [entry[1] for entry in scheduler.heap] == [failed_id]
+
+    asyncio.run(scheduler.fire_due())
+    assert sent == [[1, 2], [2]]
+    assert scheduler.heap == []
+
+
+def test_missing_lease_is_warned_once(caplog):
+    notifications = mongomock.MongoClient().clash.notifications
+    insert_due(notifications, 1)
+    sender = FlakySender(0)
+    scheduler = NotificationScheduler(notifications, sender, lambda: None)
+    scheduler.heap = [(datetime(2024, 1, 1), None, 1)]
+
+    asyncio.run(scheduler.fire_due())
+    asyncio.run(scheduler.fire_due())
+    assert scheduler.waiting_for_lease
+    assert sender.sent == []
+    assert len([r for r in caplog.records if r.levelname == "WARNING"]) == 1
@@ -0,0 +1,64 @@
+"""Tests of storing uploaded sounds in the local cache and the database."""
+import io
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("discord")
+
+from mundobot import playback  # noqa: E402
+from mundobot.playback import PlaybackManager  # noqa: E402
+
+GUILD_ID = 1
+
+
+class FakeBucket:
+    """GridFS bucket keeping files in memory."""
+
+    def __init__(self, *_, **__) -> None:
+        self.files = {}
+
+    def upload_from_stream(self, _, source) -> int:
+        file_id = len(self.files) + 1
+        self.files[file_id] = source.read()
+        return file_id
+
+    def delete(self, file_id: int) -> None:
+        del self.files[file_id]
+
+
+@pytest.fixture(name="manager")
+def fixture_manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(playback, "peaks_of_file", lambda _: None)
+    monkeypatch.setattr(playback.gridfs, "GridFSBucket", FakeBucket)
+    client = mongomock.MongoClient()
+    client.bot.sounds_data.create_index([("guild_id", 1), ("name", 1)], unique=True)
+    return PlaybackManager(client, str(tmp_path), [])
+
+
+def temporary_files(manager: PlaybackManager):
+    return list(manager.local_cache_path("x", GUILD_ID).parent.glob("*.tmp"))
+
+
+def test_upload_is_cached(manager):
+    assert manager.save_upload("mundo", GUILD_ID, io.BytesIO(b"sound"))
+    assert manager.local_cache_path("mundo", GUILD_ID).read_bytes() == b"sound"
+    assert temporary_files(manager) == []
+
+
+def test_duplicate_upload_leaves_no_temporary_file(manager):
+    assert manager.save_upload("mundo", GUILD_ID, io.BytesIO(b"first"))
+    assert not manager.save_upload("mundo", GUILD_ID, io.BytesIO(b"second"))
+
+    assert manager.local_cache_path("mundo", GUILD_ID).read_bytes() == b"first"
+    assert temporary_files(manager) == []
+    assert list(manager.sound_files.files.values()) == [b"first"]
+
+
+def test_too_large_upload_leaves_no_temporary_file(manager, monkeypatch):
+    monkeypatch.setattr(playback, "MAX_LENGTH", 3)
+    with pytest.raises(ValueError):
+        manager.save_upload("mundo", GUILD_ID, io.BytesIO(b"sound"))
+
+    assert not manager.local_cache_path("mundo", GUILD_ID).exists()
+    assert temporary_files(manager) == []
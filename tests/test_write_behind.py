@@ -0,0 +1,114 @@
+"""Tests of journaling and flushing of WriteBehindClashManager."""
+from datetime import datetime
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("discord")
+
+from mundobot.clash.clash import Clash  # noqa: E402
+from mundobot.clash.position import Position  # noqa: E402
+from mundobot.clash.write_behind import WriteBehindClashManager  # noqa: E402
+
+GUILD_ID = 1
+
+
+@pytest.fixture(name="manager")
+def fixture_manager(tmp_path):
+    return WriteBehindClashManager(mongomock.MongoClient(), str(tmp_path / "journal"))
+
+
+@pytest.fixture(name="bulk_writes")
+def fixture_bulk_writes(monkeypatch):
+    """Records requests of every bulk write, the first failures of them fail."""
+    writes = {"requests": [], "failures": 0}
+    bulk_write = mongomock.collection.Collection.bulk_write
+
+    def recording_bulk_write(self, requests, *args, **kwargs):
+        if writes["failures"] > 0:
+            writes["failures"] -= 1
+            raise ServerSelectionTimeoutError("MongoDB is down")
+        writes["requests"].append((self.name, list(requests)))
+        return bulk_write(self, requests, *args, **kwargs)
+
+    monkeypatch.setattr(
+        mongomock.collection.Collection, "bulk_write", recording_bulk_write
+    )
+    return writes
+
+
+def add_clash(manager: WriteBehindClashManager) -> object:
+    return manager.add_clash(
+        Clash("Clash Cup", "20.01.2024", GUILD_ID, 2, 3, 4, 5, 6, date=datetime.now())
+    )
+
+
+def stored_players(manager: WriteBehindClashManager, clash_id) -> list:
+    document = manager.positions.find_one({"clash_id": clash_id})
+    return [x["player_id"] for x in document["players"]] if document else None
+
+
+def test_journal_is_replayed_after_crash(manager, tmp_path):
+    clash_id = add_clash(manager)
+    manager.register_player(clash_id, 10, "first", Position.MID)
+    manager.register_player(clash_id, 11, "second", Position.TOP)
+    assert stored_players(manager, clash_id) == []
+
+    # The crashed manager is dropped without flushing, a new one replays its journal
+    restarted = WriteBehindClashManager(manager.client, str(tmp_path / "journal"))
+    assert stored_players(restarted, clash_id) == [10, 11]
+    assert restarted.pending == []
+    assert (tmp_path / "journal").read_text(encoding="utf-8") == ""
+
+
+def test_writes_of_document_are_coalesced(manager, bulk_writes):
+    clash_id = add_clash(manager)
+    for player_id in range(3):
+        name = f"player {player_id}"
+        manager.register_player(clash_id, player_id, name, Position.MID)
+    manager.flush()
+
+    positions_writes = [x for name, x in bulk_writes["requests"] if name == "positions"]
+    assert [len(requests) for requests in positions_writes] == [1]
+    assert stored_players(manager, clash_id) == [0, 1, 2]
+
+
+def test_failed_flush_keeps_writes_pending(manager, bulk_writes, tmp_path):
+    clash_id = add_clash(manager)
+    manager.register_player(clash_id, 10, "first", Position.MID)
+    pending = list(manager.pending)
+    bulk_writes["failures"] = 1
+
+    with pytest.raises(ServerSelectionTimeoutError):
+        manager.flush()
+    manager.register_player(clash_id, 11, "second", Position.TOP)
+    assert manager.pending[: len(pending)] == pending
+    journal = (tmp_path / "journal").read_text(encoding="utf-8")
+    assert len(journal.splitlines()) == len(manager.pending)
+
+    manager.flush()
+    assert stored_players(manager, clash_id) == [10, 11]
+    assert manager.pending == []
+
+
+def test_removed_clash_is_not_recreated_by_pending_write(manager):
+    clash_id = add_clash(manager)
+    manager.register_player(clash_id, 10, "first", Position.MID)
+    manager.remove_clash("Clash Cup", GUILD_ID)
+    manager.register_player(clash_id, 11, "second", Position.TOP)
+    manager.flush()
+
+    assert manager.positions.find_one({"clash_id": clash_id}) is None
+    assert manager.clashes.find_one({"_id": clash_id}) is None
+
+
+def test_attendance_flushes_only_its_player(manager):
+    clash_id = add_clash(manager)
+    manager.register_player(clash_id, 10, "first", Position.MID)
+    manager.register_player(clash_id, 11, "second", Position.TOP)
+
+    assert manager.get_attendance(GUILD_ID, 10).positions == {"MID": 1}
+    pending = [x["filter"] for x in manager.pending if x["collection"] == "attendance"]
+    assert pending == [{"guild_id": GUILD_ID, "player_id": 11}]
+    assert stored_players(manager, clash_id) == []